@@ -1,22 +1,36 @@
+// Load environment variables before any module reads them
+import 'dotenv/config';
 import express from 'express';
 import cors from 'cors';
-import dotenv from 'dotenv';
-import axios from 'axios';
-
-// Load environment variables
-dotenv.config();
+import { PYTHON_SERVICE_URL, forward, python, streamTo } from './services/proxy.js';
+import pythonService from './services/pythonService.js';
 
 const app = express();
 const PORT = process.env.PORT || 3000;
-const PYTHON_SERVICE_URL = process.env.PYTHON_SERVICE_URL || 'http://localhost:5005';
+
+// Routes whose bodies (JSON with base64 images, multipart or raw uploads, up to 50 MB)
+// are streamed to the Python service unparsed; Python validates them
+const STREAMED_ROUTES = [
+    { route: '/api/images', path: '/images', timeout: 30000, label: 'Image registration' },
+    { route: '/api/pipeline', path: '/pipeline', timeout: 120000, label: 'Pipeline' },
+    { route: '/api/remove-background', path: '/remove-background', timeout: 30000, label: 'Background removal' },
+    { route: '/api/upscale-image', path: '/upscale-image', timeout: 30000, label: 'Image upscaling' },
+    { route: '/api/caption-image', path: '/caption-image', timeout: 30000, label: 'Image captioning' },
+    { route: '/api/image-to-text', path: '/image-to-text', timeout: 30000, label: 'Text extraction' }
+];
+const streamedPaths = new Set(STREAMED_ROUTES.map(({ route }) => route));
+
+// Parse bodies only where Express itself reads them
+const unlessStreamed = (parser) => (req, res, next) => (streamedPaths.has(req.path) ? next() : parser(req, res, next));
 
 // Middleware
 app.use(cors({
     origin: process.env.FRONTEND_URL || 'http://localhost:5174',
-    credentials: true
+    credentials: true,
+    exposedHeaders: ['Retry-After']
 }));
-app.use(express.json({ limit: '50mb' }));
-app.use(express.urlencoded({ limit: '50mb', extended: true }));
+app.use(unlessStreamed(express.json({ limit: '1mb' })));
+app.use(unlessStreamed(express.urlencoded({ limit: '1mb', extended: true })));
 
 // Logging middleware
 app.use((req, res, next) => {
@@ -24,17 +38,52 @@ app.use((req, res, next) => {
     next();
 });
 
+// Event streams stay open for the whole generation; progress events keep the socket busy
+const STREAM_TIMEOUT = 600000;
+
+const imageRequest = ({
+    prompt,
+    model = 'runware:101@1',
+    width = 1024,
+    height = 1024,
+    steps = 20,
+    cfgScale = 7,
+    seed,
+    progressive
+}) => ({ prompt, model, width, height, steps, cfgScale, seed, progressive });
+
+const videoRequest = ({
+    prompt,
+    model = 'bytedance:1@1',
+    duration = 10,
+    width = 1920,
+    height = 1088,
+    outputFormat = 'mp4',
+    outputQuality = 95
+}) => ({ prompt, model, duration, width, height, outputFormat, outputQuality });
+
+const requirePrompt = (req, res) => {
+    if (!req.body?.prompt) {
+        res.status(400).json({
+            success: false,
+            error: 'Prompt is required'
+        });
+        return false;
+    }
+    return true;
+};
+
 // Health check endpoint
 app.get('/api/health', async (req, res) => {
     try {
-        // Check Python service health
-        const pythonHealth = await axios.get(`${PYTHON_SERVICE_URL}/health`);
+        // Python's health (cached briefly; Python itself answers from its background prober)
+        const pythonHealth = await pythonService.healthCheck();
 
         res.json({
             status: 'healthy',
             service: 'runware-demo-backend',
             timestamp: new Date().toISOString(),
-            pythonService: pythonHealth.data
+            pythonService: pythonHealth
         });
     } catch (error) {
         res.status(500).json({
@@ -48,347 +97,153 @@ app.get('/api/health', async (req, res) => {
 
 // Image generation endpoint
 app.post('/api/generate/image', async (req, res) => {
-    try {
-        const {
-            prompt,
-            model = 'runware:101@1',
-            width = 1024,
-            height = 1024,
-            steps = 20,
-            cfgScale = 7
-        } = req.body;
-
-        if (!prompt) {
-            return res.status(400).json({
-                success: false,
-                error: 'Prompt is required'
-            });
-        }
-
-        console.log(`Generating image: "${prompt}"`);
-
-        // Forward request to Python service
-        const response = await axios.post(`${PYTHON_SERVICE_URL}/generate/image`, {
-            prompt,
-            model,
-            width,
-            height,
-            steps,
-            cfgScale
-        }, {
-            timeout: 30000 // 30 second timeout
-        });
-
-        console.log(`Image generated successfully in ${response.data.metadata?.processingTime}s`);
-
-        res.json(response.data);
-
-    } catch (error) {
-        console.error('Image generation error:', error.message);
+    if (!requirePrompt(req, res)) {
+        return;
+    }
 
-        if (error.code === 'ECONNREFUSED') {
-            return res.status(503).json({
-                success: false,
-                error: 'Python service unavailable. Please ensure the Python service is running.'
-            });
-        }
+    console.log(`Generating image: "${req.body.prompt}"`);
 
-        if (error.response) {
-            return res.status(error.response.status).json(error.response.data);
-        }
+    await forward(req, res, {
+        path: '/generate/image',
+        data: imageRequest(req.body),
+        timeout: 30000,
+        label: 'Image generation'
+    });
+});
 
-        res.status(500).json({
-            success: false,
-            error: 'Internal server error'
-        });
+// Image generation with progress as server-sent events (queued, started, preview, progress, completed)
+app.post('/api/generate/image/stream', async (req, res) => {
+    if (!requirePrompt(req, res)) {
+        return;
     }
+
+    await forward(req, res, {
+        path: '/generate/image/stream',
+        data: imageRequest(req.body),
+        timeout: STREAM_TIMEOUT,
+        label: 'Image generation stream'
+    });
 });
 
+// Bulk image generation; each item is streamed back as a server-sent event when it finishes
+app.post('/api/generate/image/batch', (req, res) => forward(req, res, {
+    path: '/generate/image/batch',
+    data: req.body,
+    timeout: STREAM_TIMEOUT,
+    label: 'Bulk image generation'
+}));
+
 // Video generation endpoint
 app.post('/api/generate/video', async (req, res) => {
-    try {
-        const {
-            prompt,
-            model = 'bytedance:1@1',
-            duration = 10,
-            width = 1920,
-            height = 1088,
-            outputFormat = 'mp4',
-            outputQuality = 95
-        } = req.body;
-
-        if (!prompt) {
-            return res.status(400).json({
-                success: false,
-                error: 'Prompt is required'
-            });
-        }
-
-        console.log(`Video generation request: "${prompt}" with model ${model}`);
-
-        // Forward request to Python service
-        const response = await axios.post(`${PYTHON_SERVICE_URL}/generate/video`, {
-            prompt,
-            model,
-            duration,
-            width,
-            height,
-            outputFormat,
-            outputQuality
-        }, {
-            timeout: 60000 // 60 second timeout for video generation
-        });
-
-        res.json(response.data);
-
-    } catch (error) {
-        console.error('Video generation error:', error.message);
-
-        if (error.code === 'ECONNREFUSED') {
-            return res.status(503).json({
-                success: false,
-                error: 'Python service unavailable. Please ensure the Python service is running.'
-            });
-        }
+    if (!requirePrompt(req, res)) {
+        return;
+    }
 
-        if (error.response) {
-            return res.status(error.response.status).json(error.response.data);
-        }
+    const data = videoRequest(req.body);
+    console.log(`Video generation request: "${data.prompt}" with model ${data.model}`);
 
-        res.status(500).json({
-            success: false,
-            error: 'Internal server error'
-        });
-    }
+    await forward(req, res, {
+        path: '/generate/video',
+        data,
+        timeout: 60000,
+        label: 'Video generation'
+    });
 });
 
-// Get available models
-app.get('/api/models', async (req, res) => {
-    try {
-        const response = await axios.get(`${PYTHON_SERVICE_URL}/models`);
-        res.json(response.data);
-    } catch (error) {
-        console.error('Models fetch error:', error.message);
-        res.status(500).json({
-            success: false,
-            error: 'Failed to fetch models'
-        });
+// Video generation with progress as server-sent events, so long renders are not cut off by timeouts
+app.post('/api/generate/video/stream', async (req, res) => {
+    if (!requirePrompt(req, res)) {
+        return;
     }
-});
-
-// Test Runware connection
-app.get('/api/test-connection', async (req, res) => {
-    try {
-        console.log('Testing Runware connection...');
-        const response = await axios.get(`${PYTHON_SERVICE_URL}/test-connection`);
 
-        if (response.data.success) {
-            console.log('Runware connection test successful');
-        } else {
-            console.log('Runware connection test failed');
-        }
-
-        res.json(response.data);
-    } catch (error) {
-        console.error('Connection test error:', error.message);
-        res.status(500).json({
-            success: false,
-            error: 'Failed to test connection'
-        });
-    }
+    await forward(req, res, {
+        path: '/generate/video/stream',
+        data: videoRequest(req.body),
+        timeout: STREAM_TIMEOUT,
+        label: 'Video generation stream'
+    });
 });
 
-// Background removal endpoint
-app.post('/api/remove-background', async (req, res) => {
-    try {
-        const { image } = req.body;
-
-        if (!image) {
-            return res.status(400).json({
-                success: false,
-                error: 'Image data is required'
-            });
-        }
-
-        console.log('Processing background removal...');
-
-        // Forward request to Python service
-        const response = await axios.post(`${PYTHON_SERVICE_URL}/remove-background`, {
-            image
-        }, {
-            timeout: 30000 // 30 second timeout
-        });
-
-        console.log(`Background removal completed in ${response.data.metadata?.processingTime}s`);
-
-        res.json(response.data);
-
-    } catch (error) {
-        console.error('Background removal error:', error.message);
-
-        if (error.code === 'ECONNREFUSED') {
-            return res.status(503).json({
-                success: false,
-                error: 'Python service unavailable. Please ensure the Python service is running.'
-            });
-        }
-
-        if (error.response) {
-            return res.status(error.response.status).json(error.response.data);
-        }
-
-        res.status(500).json({
-            success: false,
-            error: 'Internal server error'
-        });
+// Video generation job endpoint (returns a job id immediately)
+app.post('/api/jobs/video', async (req, res) => {
+    if (!requirePrompt(req, res)) {
+        return;
     }
-});
-
-// Image upscaling endpoint
-app.post('/api/upscale-image', async (req, res) => {
-    try {
-        const { image, scaleFactor = 2 } = req.body;
-
-        if (!image) {
-            return res.status(400).json({
-                success: false,
-                error: 'Image data is required'
-            });
-        }
-
-        console.log(`Processing image upscaling with factor ${scaleFactor}...`);
-
-        // Forward request to Python service
-        const response = await axios.post(`${PYTHON_SERVICE_URL}/upscale-image`, {
-            image,
-            scaleFactor
-        }, {
-            timeout: 30000 // 30 second timeout
-        });
-
-        console.log(`Image upscaling completed in ${response.data.metadata?.processingTime}s`);
-
-        res.json(response.data);
 
-    } catch (error) {
-        console.error('Image upscaling error:', error.message);
-
-        if (error.code === 'ECONNREFUSED') {
-            return res.status(503).json({
-                success: false,
-                error: 'Python service unavailable. Please ensure the Python service is running.'
-            });
-        }
+    console.log(`Queueing video generation job: "${req.body.prompt}"`);
 
-        if (error.response) {
-            return res.status(error.response.status).json(error.response.data);
-        }
-
-        res.status(500).json({
-            success: false,
-            error: 'Internal server error'
-        });
-    }
+    // Short timeout, the job runs in the background
+    await forward(req, res, { path: '/jobs/video', data: req.body, timeout: 10000, label: 'Video job' });
 });
 
-// Image caption endpoint
-app.post('/api/caption-image', async (req, res) => {
-    try {
-        const { image } = req.body;
-
-        if (!image) {
-            return res.status(400).json({
-                success: false,
-                error: 'Image data is required'
-            });
-        }
-
-        console.log('Processing image captioning...');
-
-        // Forward request to Python service
-        const response = await axios.post(`${PYTHON_SERVICE_URL}/caption-image`, {
-            image
-        }, {
-            timeout: 30000 // 30 second timeout
-        });
-
-        console.log(`Caption generated in ${response.data.metadata?.processingTime}s`);
+// Job status endpoint
+app.get('/api/jobs/:id', (req, res) => forward(req, res, {
+    method: 'get',
+    path: `/jobs/${encodeURIComponent(req.params.id)}`,
+    timeout: 10000,
+    label: 'Job status'
+}));
 
-        res.json(response.data);
+// Generation history, newest first (q, model, operation, cursor and limit pass through)
+app.get('/api/history', (req, res) => forward(req, res, {
+    method: 'get',
+    path: `/history${new URL(req.originalUrl, 'http://localhost').search}`,
+    timeout: 10000,
+    label: 'History'
+}));
 
-    } catch (error) {
-        console.error('Image captioning error:', error.message);
+app.delete('/api/history/:uuid', (req, res) => forward(req, res, {
+    method: 'delete',
+    path: `/history/${encodeURIComponent(req.params.uuid)}`,
+    timeout: 10000,
+    label: 'History delete'
+}));
 
-        if (error.code === 'ECONNREFUSED') {
-            return res.status(503).json({
-                success: false,
-                error: 'Python service unavailable. Please ensure the Python service is running.'
-            });
-        }
+// Cached media, thumbnails and previews; conditional and range headers pass through so
+// browsers revalidate with 304s and videos seek with 206s
+const MEDIA_REQUEST_HEADERS = ['range', 'if-range', 'if-none-match', 'if-modified-since'];
 
-        if (error.response) {
-            return res.status(error.response.status).json(error.response.data);
-        }
+app.get(['/api/media/:uuid', '/api/media/:uuid/:variant'], (req, res) => forward(req, res, {
+    method: 'get',
+    path: `/media/${encodeURIComponent(req.params.uuid)}${req.params.variant ? `/${encodeURIComponent(req.params.variant)}` : ''}`,
+    timeout: 60000,
+    label: 'Media',
+    passHeaders: MEDIA_REQUEST_HEADERS
+}));
 
-        res.status(500).json({
-            success: false,
-            error: 'Internal server error'
-        });
-    }
-});
+// Input image registration, pipelines and the image tools
+for (const { route, path, timeout, label } of STREAMED_ROUTES) {
+    app.post(route, streamTo(path, timeout, label));
+}
 
-// Image to text endpoint
-app.post('/api/image-to-text', async (req, res) => {
+// Get available models
+app.get('/api/models', async (req, res) => {
     try {
-        const { image } = req.body;
-
-        if (!image) {
-            return res.status(400).json({
-                success: false,
-                error: 'Image data is required'
-            });
-        }
-
-        console.log('Processing text extraction...');
-
-        // Forward request to Python service
-        const response = await axios.post(`${PYTHON_SERVICE_URL}/image-to-text`, {
-            image
-        }, {
-            timeout: 30000 // 30 second timeout
-        });
-
-        console.log(`Text extracted in ${response.data.metadata?.processingTime}s`);
-
+        const response = await python.get('/models', { timeout: 10000 });
         res.json(response.data);
-
     } catch (error) {
-        console.error('Text extraction error:', error.message);
-
-        if (error.code === 'ECONNREFUSED') {
-            return res.status(503).json({
-                success: false,
-                error: 'Python service unavailable. Please ensure the Python service is running.'
-            });
-        }
-
-        if (error.response) {
-            return res.status(error.response.status).json(error.response.data);
-        }
-
+        console.error('Models fetch error:', error.message);
         res.status(500).json({
             success: false,
-            error: 'Internal server error'
+            error: 'Failed to fetch models'
         });
     }
 });
 
+// Test Runware connection: cached probe state, or ?inference=true for a real (rate-limited) generation
+app.get('/api/test-connection', (req, res) => forward(req, res, {
+    method: 'get',
+    path: `/test-connection${new URL(req.originalUrl, 'http://localhost').search}`,
+    timeout: 60000,
+    label: 'Connection test'
+}));
+
 // Error handling middleware
 app.use((error, req, res, next) => {
     console.error('Unhandled error:', error);
-    res.status(500).json({
+    res.status(error.status || 500).json({
         success: false,
-        error: 'Internal server error'
+        error: error.status === 413 ? 'Request body too large' : 'Internal server error'
     });
 });
 
@@ -411,7 +266,17 @@ app.listen(PORT, () => {
     console.log('   GET  /api/models');
     console.log('   GET  /api/test-connection');
     console.log('   POST /api/generate/image');
+    console.log('   POST /api/generate/image/stream');
+    console.log('   POST /api/generate/image/batch');
     console.log('   POST /api/generate/video');
+    console.log('   POST /api/generate/video/stream');
+    console.log('   POST /api/jobs/video');
+    console.log('   GET  /api/jobs/:id');
+    console.log('   GET  /api/history');
+    console.log('   DELETE /api/history/:uuid');
+    console.log('   GET  /api/media/:uuid[/thumbnail|/preview]');
+    console.log('   POST /api/images');
+    console.log('   POST /api/pipeline');
     console.log('   POST /api/remove-background');
     console.log('   POST /api/upscale-image');
     console.log('   POST /api/caption-image');
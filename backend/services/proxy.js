@@ -0,0 +1,136 @@
+import http from 'http';
+import axios from 'axios';
+
+export const PYTHON_SERVICE_URL = process.env.PYTHON_SERVICE_URL || 'http://localhost:5005';
+
+// One keep-alive pool to the Python service, so forwarded requests reuse warm
+// connections instead of paying a TCP handshake each; sockets are bounded so a
+// burst queues here rather than flooding Flask with connections
+export const pythonAgent = new http.Agent({
+    keepAlive: true,
+    maxSockets: Number(process.env.PYTHON_MAX_SOCKETS || 64),
+    maxFreeSockets: Number(process.env.PYTHON_MAX_FREE_SOCKETS || 16)
+});
+
+export const python = axios.create({
+    baseURL: PYTHON_SERVICE_URL,
+    httpAgent: pythonAgent,
+    maxBodyLength: Infinity,
+    maxContentLength: Infinity,
+    // Redirects (e.g. media not cached yet) and 304s are the browser's to follow
+    maxRedirects: 0,
+    validateStatus: (status) => status >= 200 && status < 400
+});
+
+// Upstream headers relayed back to the browser along with the status and body
+const RELAYED_HEADERS = [
+    'content-type', 'content-length', 'retry-after', 'cache-control', 'x-accel-buffering',
+    'etag', 'last-modified', 'accept-ranges', 'content-range', 'location'
+];
+
+// Headroom so the Python service gives up before our own axios timeout fires
+const DEADLINE_MARGIN_MS = 500;
+
+// Identify the calling client to the Python service, whose admission queue is fair per client
+export const clientHeaders = (req) => ({ 'X-Client-Id': req.get('X-Client-Id') || req.ip });
+
+// Per-request upstream options: the client id, an absolute deadline the Python service
+// enforces (X-Request-Deadline, epoch ms) and a signal that aborts the upstream call when
+// the browser disconnects, so abandoned work is cancelled instead of run to completion
+export const upstreamOptions = (req, res, timeout) => {
+    const controller = new AbortController();
+    res.on('close', () => {
+        if (!res.writableFinished) {
+            controller.abort();
+        }
+    });
+
+    return {
+        headers: {
+            ...clientHeaders(req),
+            'X-Request-Deadline': String(Date.now() + timeout - DEADLINE_MARGIN_MS)
+        },
+        timeout,
+        signal: controller.signal
+    };
+};
+
+// Pipe a streamed upstream response to the browser without buffering or re-serializing it
+const relay = (res, upstream) => {
+    res.status(upstream.status);
+    for (const name of RELAYED_HEADERS) {
+        if (upstream.headers[name]) {
+            res.set(name, upstream.headers[name]);
+        }
+    }
+    // A reset from Flask mid-body must end this response, not crash the process
+    upstream.data.on('error', (error) => res.destroy(error));
+    upstream.data.pipe(res);
+};
+
+const relayError = (res, error, label) => {
+    if (axios.isCancel(error)) {
+        return;
+    }
+
+    console.error(`${label} error:`, error.message);
+
+    if (res.headersSent) {
+        return res.destroy(error);
+    }
+
+    if (error.code === 'ECONNREFUSED') {
+        return res.status(503).json({
+            success: false,
+            error: 'Python service unavailable. Please ensure the Python service is running.'
+        });
+    }
+
+    // Python's own error responses (400, 429 and 503 with Retry-After, 504, ...) pass through
+    if (error.response) {
+        return relay(res, error.response);
+    }
+
+    res.status(500).json({
+        success: false,
+        error: 'Internal server error'
+    });
+};
+
+// Forward one request to the Python service and relay its answer. With stream set the
+// browser's body (JSON, multipart or raw bytes, up to 50 MB) is piped through unparsed;
+// otherwise data is sent as JSON. Request headers named in passHeaders are sent along
+export const forward = async (req, res, { method = 'post', path, data, timeout, label, stream = false, passHeaders = [] }) => {
+    try {
+        const options = upstreamOptions(req, res, timeout);
+        const config = { ...options, method, url: path, responseType: 'stream' };
+        for (const name of passHeaders) {
+            if (req.headers[name]) {
+                config.headers[name] = req.headers[name];
+            }
+        }
+
+        if (stream) {
+            config.url += new URL(req.originalUrl, 'http://localhost').search;
+            config.data = req;
+            config.headers['content-type'] = req.headers['content-type'] || 'application/octet-stream';
+            if (req.headers['content-length']) {
+                config.headers['content-length'] = req.headers['content-length'];
+            }
+        } else if (data !== undefined) {
+            config.data = data;
+        }
+
+        relay(res, await python.request(config));
+    } catch (error) {
+        relayError(res, error, label);
+    }
+};
+
+// Route handler that streams the request body to a Python endpoint untouched
+export const streamTo = (path, timeout, label) => (req, res) => forward(req, res, {
+    path,
+    timeout,
+    label,
+    stream: true
+});
@@ -1,22 +1,27 @@
-import axios from 'axios';
+import { PYTHON_SERVICE_URL, python } from './proxy.js';
 
-const PYTHON_SERVICE_URL = process.env.PYTHON_SERVICE_URL || 'http://localhost:5005';
+// How long a Python /health answer is reused before asking again
+const HEALTH_CACHE_MS = Number(process.env.HEALTH_CACHE_MS || 5000);
 
 class PythonService {
     constructor() {
         this.baseURL = PYTHON_SERVICE_URL;
+        this.health = null;
+        this.healthAt = 0;
+        this.healthRequest = null;
     }
 
     async makeRequest(endpoint, data = null, method = 'GET') {
         try {
             const config = {
                 method,
-                url: `${this.baseURL}${endpoint}`,
+                url: endpoint,
                 timeout: 30000,
                 ...(data && { data })
             };
 
-            const response = await axios(config);
+            // Shares the keep-alive connection pool with the proxy routes
+            const response = await python.request(config);
             return response.data;
         } catch (error) {
             if (error.code === 'ECONNREFUSED') {
@@ -29,8 +34,25 @@ class PythonService {
         }
     }
 
+    // Dashboards and uptime checks polling /api/health share one cached answer, and callers
+    // arriving while it is being refreshed wait on the same request instead of each calling Flask
     async healthCheck() {
-        return this.makeRequest('/health');
+        if (this.health && Date.now() - this.healthAt < HEALTH_CACHE_MS) {
+            return this.health;
+        }
+
+        if (!this.healthRequest) {
+            this.healthRequest = this.makeRequest('/health')
+                .then((health) => {
+                    this.health = health;
+                    this.healthAt = Date.now();
+                    return health;
+                })
+                .finally(() => {
+                    this.healthRequest = null;
+                });
+        }
+        return this.healthRequest;
     }
 
     async generateImage(imageRequest) {
@@ -41,6 +63,14 @@ class PythonService {
         return this.makeRequest('/generate/video', videoRequest, 'POST');
     }
 
+    async createVideoJob(videoRequest) {
+        return this.makeRequest('/jobs/video', videoRequest, 'POST');
+    }
+
+    async getJob(jobId) {
+        return this.makeRequest(`/jobs/${encodeURIComponent(jobId)}`);
+    }
+
     async removeBackground(imageData) {
         return this.makeRequest('/remove-background', { image: imageData }, 'POST');
     }
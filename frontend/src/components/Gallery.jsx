@@ -1,18 +1,60 @@
 import React, { useState, useEffect } from 'react'
-import { Download, Trash2, Grid, Calendar, Clock } from 'lucide-react'
+import { Download, Trash2, Grid, Calendar, Clock, Search, Loader } from 'lucide-react'
 import runwareLogo from '../assets/runware-logo.png'
 
+const PAGE_SIZE = 24
+
+// Cached renditions served by the backend; until one is ready it redirects to the original
+const mediaURL = (image, variant) => `http://localhost:3000/api/media/${encodeURIComponent(image.uuid)}/${variant}`
+
+// Fall back to the original URL if the media cache does not know the image
+const fallBackToOriginal = (image) => (e) => {
+  if (e.currentTarget.src !== image.url) {
+    e.currentTarget.src = image.url
+  }
+}
+
 const Gallery = () => {
   const [images, setImages] = useState([])
   const [selectedImage, setSelectedImage] = useState(null)
+  const [query, setQuery] = useState('')
+  const [nextCursor, setNextCursor] = useState(null)
+  const [isLoading, setIsLoading] = useState(false)
+  const [error, setError] = useState(null)
 
   useEffect(() => {
-    loadImages()
-  }, [])
+    // Debounce so typing a search does not fire a request per keystroke
+    const timer = setTimeout(() => loadImages(), query ? 300 : 0)
+    return () => clearTimeout(timer)
+  }, [query])
+
+  const loadImages = async (cursor = null) => {
+    setIsLoading(true)
+    setError(null)
+
+    try {
+      const params = new URLSearchParams({ operation: 'imageInference', limit: PAGE_SIZE })
+      if (query.trim()) {
+        params.set('q', query.trim())
+      }
+      if (cursor) {
+        params.set('cursor', cursor)
+      }
+
+      const response = await fetch(`http://localhost:3000/api/history?${params}`)
+      const data = await response.json()
 
-  const loadImages = () => {
-    const savedImages = JSON.parse(localStorage.getItem('generatedImages') || '[]')
-    setImages(savedImages)
+      if (data.success) {
+        setImages(previous => cursor ? [...previous, ...data.items] : data.items)
+        setNextCursor(data.nextCursor)
+      } else {
+        setError(data.error || 'Failed to load gallery')
+      }
+    } catch (error) {
+      setError('Network error: ' + error.message)
+    } finally {
+      setIsLoading(false)
+    }
   }
 
   const handleDownload = (image) => {
@@ -22,26 +64,55 @@ const Gallery = () => {
     link.click()
   }
 
-  const handleDelete = (imageToDelete) => {
-    const updatedImages = images.filter(img => img.uuid !== imageToDelete.uuid)
-    setImages(updatedImages)
-    localStorage.setItem('generatedImages', JSON.stringify(updatedImages))
+  const handleDelete = async (imageToDelete) => {
+    try {
+      const response = await fetch(
+        `http://localhost:3000/api/history/${encodeURIComponent(imageToDelete.uuid)}`,
+        { method: 'DELETE' }
+      )
+      if (!response.ok && response.status !== 404) {
+        setError('Failed to delete image')
+        return
+      }
+    } catch (error) {
+      setError('Network error: ' + error.message)
+      return
+    }
+
+    setImages(previous => previous.filter(img => img.uuid !== imageToDelete.uuid))
 
     if (selectedImage?.uuid === imageToDelete.uuid) {
       setSelectedImage(null)
     }
   }
 
-  const clearAllImages = () => {
-    if (window.confirm('Are you sure you want to delete all images?')) {
-      setImages([])
+  // Deletes only the images listed here, one by one, so nothing outside this view is touched
+  const clearAllImages = async () => {
+    const listed = images
+    if (!window.confirm(`Are you sure you want to delete these ${listed.length} images?`)) {
+      return
+    }
+
+    const results = await Promise.allSettled(listed.map(image => fetch(
+      `http://localhost:3000/api/history/${encodeURIComponent(image.uuid)}`,
+      { method: 'DELETE' }
+    )))
+    const deleted = new Set(listed
+      .filter((_, index) => results[index].status === 'fulfilled' &&
+        (results[index].value.ok || results[index].value.status === 404))
+      .map(image => image.uuid))
+
+    if (deleted.size < listed.length) {
+      setError(`Failed to delete ${listed.length - deleted.size} of ${listed.length} images`)
+    }
+    setImages(previous => previous.filter(img => !deleted.has(img.uuid)))
+    if (selectedImage && deleted.has(selectedImage.uuid)) {
       setSelectedImage(null)
-      localStorage.removeItem('generatedImages')
     }
   }
 
-  const formatDate = (timestamp) => {
-    return new Date(timestamp).toLocaleDateString('en-US', {
+  const formatDate = (createdAt) => {
+    return new Date(createdAt * 1000).toLocaleDateString('en-US', {
       month: 'short',
       day: 'numeric',
       hour: '2-digit',
@@ -59,22 +130,50 @@ const Gallery = () => {
             Generated Images
           </h1>
           <p className="text-gray-600 mt-1">
-            {images.length} image{images.length !== 1 ? 's' : ''} in your gallery
+            {images.length}{nextCursor ? '+' : ''} image{images.length !== 1 ? 's' : ''} in your gallery
           </p>
         </div>
 
-        {images.length > 0 && (
-          <button
-            onClick={clearAllImages}
-            className="btn-secondary flex items-center space-x-2"
-          >
-            <Trash2 className="w-4 h-4" />
-            <span>Clear All</span>
-          </button>
-        )}
+        <div className="flex items-center space-x-3">
+          <div className="relative w-64">
+            <Search className="w-4 h-4 text-gray-400 absolute left-3 top-1/2 -translate-y-1/2" />
+            <input
+              type="text"
+              value={query}
+              onChange={(e) => setQuery(e.target.value)}
+              placeholder="Search prompts"
+              className="input-field pl-9"
+            />
+          </div>
+
+          {images.length > 0 && (
+            <button
+              onClick={clearAllImages}
+              className="btn-secondary flex items-center space-x-2"
+            >
+              <Trash2 className="w-4 h-4" />
+              <span>Clear All</span>
+            </button>
+          )}
+        </div>
       </div>
 
-      {images.length === 0 ? (
+      {error && (
+        <div className="p-3 bg-red-50 border border-red-200 rounded-lg">
+          <p className="text-red-600 text-sm">{error}</p>
+        </div>
+      )}
+
+      {images.length === 0 && isLoading ? (
+        <div className="card text-center py-12">
+          <Loader className="w-8 h-8 mx-auto text-gray-400 animate-spin" />
+        </div>
+      ) : images.length === 0 && query.trim() ? (
+        <div className="card text-center py-12">
+          <Search className="w-12 h-12 mx-auto text-gray-400 mb-4" />
+          <p className="text-gray-600">No images match "{query.trim()}"</p>
+        </div>
+      ) : images.length === 0 ? (
         <div className="card text-center py-12">
           <Grid className="w-16 h-16 mx-auto text-gray-400 mb-4" />
           <h3 className="text-xl font-semibold text-gray-900 mb-2">
@@ -110,8 +209,10 @@ const Gallery = () => {
                   onClick={() => setSelectedImage(image)}
                 >
                   <img
-                    src={image.url}
+                    src={mediaURL(image, 'thumbnail')}
+                    onError={fallBackToOriginal(image)}
                     alt={image.prompt}
+                    loading="lazy"
                     className="w-full h-48 object-cover"
                   />
 
@@ -152,6 +253,19 @@ const Gallery = () => {
                 </div>
               ))}
             </div>
+
+            {nextCursor && (
+              <div className="mt-6 text-center">
+                <button
+                  onClick={() => loadImages(nextCursor)}
+                  disabled={isLoading}
+                  className="btn-secondary inline-flex items-center space-x-2"
+                >
+                  {isLoading && <Loader className="w-4 h-4 animate-spin" />}
+                  <span>Load More</span>
+                </button>
+              </div>
+            )}
           </div>
 
           {/* Image Details */}
@@ -161,7 +275,8 @@ const Gallery = () => {
                 {/* Selected Image */}
                 <div className="card">
                   <img
-                    src={selectedImage.url}
+                    src={mediaURL(selectedImage, 'preview')}
+                    onError={fallBackToOriginal(selectedImage)}
                     alt={selectedImage.prompt}
                     className="w-full h-auto rounded-lg"
                   />
@@ -206,7 +321,7 @@ const Gallery = () => {
                         <strong className="text-gray-700">Generated:</strong>
                         <p className="text-gray-600 flex items-center">
                           <Calendar className="w-3 h-3 mr-1" />
-                          {formatDate(selectedImage.timestamp)}
+                          {formatDate(selectedImage.createdAt)}
                         </p>
                       </div>
                       <div>
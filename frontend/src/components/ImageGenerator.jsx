@@ -1,5 +1,6 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { Download, Loader, Zap, Settings, Image as ImageIcon } from 'lucide-react'
+import { readEvents } from '../utils/sse'
 
 const ImageGenerator = () => {
   const [prompt, setPrompt] = useState('')
@@ -8,14 +9,20 @@ const ImageGenerator = () => {
   const [height, setHeight] = useState(1024)
   const [steps, setSteps] = useState(20)
   const [cfgScale, setCfgScale] = useState(7)
+  const [progressive, setProgressive] = useState(false)
   const [isGenerating, setIsGenerating] = useState(false)
   const [generatedImage, setGeneratedImage] = useState(null)
+  const [previewImage, setPreviewImage] = useState(null)
   const [generationTime, setGenerationTime] = useState(null)
+  const [qualityTier, setQualityTier] = useState(null)
   const [error, setError] = useState(null)
   const [models, setModels] = useState([])
+  const requestRef = useRef(null)
 
   useEffect(() => {
     fetchModels()
+    // Leaving the page closes the stream, which cancels the render server-side
+    return () => requestRef.current?.abort()
   }, [])
 
   const fetchModels = async () => {
@@ -36,14 +43,23 @@ const ImageGenerator = () => {
       return
     }
 
+    // A new prompt supersedes whatever is still rendering
+    requestRef.current?.abort()
+    const controller = new AbortController()
+    requestRef.current = controller
+
     setIsGenerating(true)
     setError(null)
     setGeneratedImage(null)
+    setPreviewImage(null)
+    setQualityTier(null)
 
     try {
       const startTime = Date.now()
 
-      const response = await fetch('http://localhost:3000/api/generate/image', {
+      // Progressive mode sends a quick low-step preview first, then the full render; the
+      // preview is a second upstream task, so it is only requested when switched on
+      const response = await fetch('http://localhost:3000/api/generate/image/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -55,31 +71,47 @@ const ImageGenerator = () => {
           height,
           steps,
           cfgScale,
+          progressive,
         }),
+        signal: controller.signal,
       })
 
-      const data = await response.json()
-      const endTime = Date.now()
+      if (!response.ok) {
+        const data = await response.json()
+        setError(data.error || 'Failed to generate image')
+        return
+      }
 
-      if (data.success) {
-        setGeneratedImage(data.image)
-        setGenerationTime((endTime - startTime) / 1000)
+      let finished = false
+      await readEvents(response, (event, data) => {
+        if (event === 'preview') {
+          setPreviewImage(data.image)
+        } else if (event === 'completed') {
+          finished = true
+          setGeneratedImage(data.image)
+          setGenerationTime((Date.now() - startTime) / 1000)
+          // The server lowers steps and size while it is under heavy load
+          setQualityTier(data.metadata?.requested ? data.metadata.qualityTier : null)
+          // The gallery is read from the server-side history, which records this image
+        } else if (event === 'error') {
+          finished = true
+          setError(data.error || 'Failed to generate image')
+        }
+      })
 
-        // Save to local storage for gallery
-        const savedImages = JSON.parse(localStorage.getItem('generatedImages') || '[]')
-        savedImages.unshift({
-          ...data.image,
-          timestamp: Date.now(),
-          frontendGenerationTime: (endTime - startTime) / 1000
-        })
-        localStorage.setItem('generatedImages', JSON.stringify(savedImages.slice(0, 20))) // Keep last 20
-      } else {
-        setError(data.error || 'Failed to generate image')
+      if (!finished) {
+        setError('Connection closed before the image was ready')
       }
     } catch (error) {
-      setError('Network error: ' + error.message)
+      if (error.name !== 'AbortError') {
+        setError('Network error: ' + error.message)
+      }
     } finally {
-      setIsGenerating(false)
+      if (requestRef.current === controller) {
+        requestRef.current = null
+        setIsGenerating(false)
+        setPreviewImage(null)
+      }
     }
   }
 
@@ -241,6 +273,17 @@ const ImageGenerator = () => {
                   />
                 </div>
               </div>
+
+              {/* Progressive preview */}
+              <label className="flex items-center space-x-2 text-sm text-gray-700">
+                <input
+                  type="checkbox"
+                  checked={progressive}
+                  onChange={(e) => setProgressive(e.target.checked)}
+                  disabled={isGenerating}
+                />
+                <span>Quick preview first (runs an extra low-step generation)</span>
+              </label>
             </div>
           </div>
 
@@ -278,7 +321,19 @@ const ImageGenerator = () => {
             <h3 className="text-lg font-semibold mb-4">Generated Image</h3>
 
             <div className="flex-1 flex items-center justify-center">
-              {isGenerating ? (
+              {isGenerating && previewImage ? (
+                <div className="w-full">
+                  <img
+                    src={previewImage.url}
+                    alt={previewImage.prompt}
+                    className="w-full h-auto rounded-lg shadow-md opacity-80"
+                  />
+                  <div className="mt-4 flex items-center justify-center text-gray-600">
+                    <Loader className="w-4 h-4 animate-spin mr-2" />
+                    <span>Refining...</span>
+                  </div>
+                </div>
+              ) : isGenerating ? (
                 <div className="text-center">
                   <Loader className="w-12 h-12 animate-spin text-blue-600 mx-auto mb-4" />
                   <p className="text-gray-600">Creating your image...</p>
@@ -301,6 +356,11 @@ const ImageGenerator = () => {
                       {generationTime && (
                         <p><strong>Generation Time:</strong> {generationTime.toFixed(2)}s</p>
                       )}
+                      {qualityTier && (
+                        <p className="text-amber-700">
+                          <strong>Quality:</strong> {qualityTier} (the service is busy, so steps or size were lowered)
+                        </p>
+                      )}
                     </div>
 
                     <button
@@ -50,16 +50,13 @@ const ImageTools = () => {
     setError(null)
 
     try {
-      const base64Image = await convertToBase64(selectedImage)
+      // Upload the file as binary; the browser streams it without base64 inflation
+      const formData = new FormData()
+      formData.append('image', selectedImage)
 
       const response = await fetch('http://localhost:3000/api/remove-background', {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          image: base64Image
-        }),
+        body: formData,
       })
 
       const data = await response.json()
@@ -88,17 +85,13 @@ const ImageTools = () => {
     setError(null)
 
     try {
-      const base64Image = await convertToBase64(selectedImage)
+      const formData = new FormData()
+      formData.append('image', selectedImage)
+      formData.append('scaleFactor', scaleFactor)
 
       const response = await fetch('http://localhost:3000/api/upscale-image', {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          image: base64Image,
-          scaleFactor: scaleFactor
-        }),
+        body: formData,
       })
 
       const data = await response.json()
@@ -127,16 +120,12 @@ const ImageTools = () => {
     setError(null)
 
     try {
-      const base64Image = await convertToBase64(selectedImage)
+      const formData = new FormData()
+      formData.append('image', selectedImage)
 
       const response = await fetch('http://localhost:3000/api/caption-image', {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          image: base64Image
-        }),
+        body: formData,
       })
 
       const data = await response.json()
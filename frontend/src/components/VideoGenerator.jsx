@@ -1,5 +1,12 @@
 import React, { useState } from 'react'
 import { Video, Loader, Info } from 'lucide-react'
+import { readEvents } from '../utils/sse'
+
+const STATUS_MESSAGES = {
+  queued: 'Waiting for a free generation slot...',
+  started: 'Rendering your video...',
+  retrying: 'Runware hiccup, retrying...'
+}
 
 const VideoGenerator = () => {
   const [prompt, setPrompt] = useState('')
@@ -9,6 +16,8 @@ const VideoGenerator = () => {
   const [isGenerating, setIsGenerating] = useState(false)
   const [generatedVideo, setGeneratedVideo] = useState(null)
   const [error, setError] = useState(null)
+  const [status, setStatus] = useState(null)
+  const [elapsed, setElapsed] = useState(0)
 
   const handleGenerate = async () => {
     if (!prompt.trim()) {
@@ -19,6 +28,8 @@ const VideoGenerator = () => {
     setIsGenerating(true)
     setError(null)
     setGeneratedVideo(null)
+    setStatus(STATUS_MESSAGES.queued)
+    setElapsed(0)
 
     try {
       // Convert quality to supported dimensions for bytedance model
@@ -26,7 +37,8 @@ const VideoGenerator = () => {
                         quality === '1080p' ? { width: 1920, height: 1088 } :
                         { width: 960, height: 960 }
 
-      const response = await fetch('http://localhost:3000/api/generate/video', {
+      // The stream variant reports progress and is not cut off while a long video renders
+      const response = await fetch('http://localhost:3000/api/generate/video/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -42,18 +54,36 @@ const VideoGenerator = () => {
         }),
       })
 
-      const data = await response.json()
-
-      if (data.success) {
-        setGeneratedVideo(data.video)
-        console.log('Video generation response:', data)
-      } else {
+      if (!response.ok) {
+        const data = await response.json()
         setError(data.error || 'Failed to generate video')
+        return
+      }
+
+      let finished = false
+      await readEvents(response, (event, data) => {
+        if (event === 'completed') {
+          finished = true
+          setGeneratedVideo(data.video)
+          console.log('Video generation response:', data)
+        } else if (event === 'error') {
+          finished = true
+          setError(data.error || 'Failed to generate video')
+        } else if (event === 'progress') {
+          setElapsed(Math.round(data.elapsed))
+        } else if (STATUS_MESSAGES[event]) {
+          setStatus(STATUS_MESSAGES[event])
+        }
+      })
+
+      if (!finished) {
+        setError('Connection closed before the video was ready')
       }
     } catch (error) {
       setError('Network error: ' + error.message)
     } finally {
       setIsGenerating(false)
+      setStatus(null)
     }
   }
 
@@ -218,7 +248,8 @@ const VideoGenerator = () => {
               {isGenerating ? (
                 <div className="text-center">
                   <Loader className="w-12 h-12 animate-spin text-purple-600 mx-auto mb-4" />
-                  <p className="text-gray-600">Creating your video...</p>
+                  <p className="text-gray-600">{status || 'Creating your video...'}</p>
+                  {elapsed > 0 && <p className="text-sm text-gray-500 mt-1">{elapsed}s elapsed</p>}
                   <p className="text-sm text-gray-500 mt-2">This may take a moment</p>
                 </div>
               ) : generatedVideo ? (
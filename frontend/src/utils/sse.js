@@ -0,0 +1,23 @@
+// Read a server-sent event stream from a fetch response, calling onEvent(name, data) per event
+export const readEvents = async (response, onEvent) => {
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      const event = block.match(/^event: (.*)$/m)
+      const data = block.match(/^data: (.*)$/m)
+      if (event && data) {
+        onEvent(event[1], JSON.parse(data[1]))
+      }
+    }
+  }
+}
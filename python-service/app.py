@@ -2,7 +2,7 @@ import logging
 import os
 
 from dotenv import load_dotenv
-from flask import Flask
+from flask import Flask, has_request_context, jsonify, request
 from flask_cors import CORS
 
 # Load environment variables
@@ -13,19 +13,59 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Import routes
+from services.deadlines import ClientDisconnected, DeadlineExceeded, guard_request
+from services.event_loop import event_loop
 from routes.health import health_bp
 from routes.generation import generation_bp
 from routes.processing import processing_bp
+from routes.jobs import jobs_bp
+from routes.pipeline import pipeline_bp
+from routes.history import history_bp
+from routes.media import media_bp
+from routes.metrics import metrics_bp
+
+class RunwareFlask(Flask):
+    """Flask app whose async views run on the shared event loop.
+
+    The default implementation wraps each coroutine in a fresh loop via asgiref.
+    Here every in-flight view shares one loop (and one Runware connection), and
+    the WSGI thread only waits on the result, so a threaded worker can keep many
+    upstream tasks in flight at once. Each view runs as a task that is cancelled
+    when its X-Request-Deadline passes or its client disconnects.
+    """
+
+    def async_to_sync(self, func):
+        def wrapper(*args, **kwargs):
+            if not has_request_context():
+                return event_loop.run(func(*args, **kwargs))
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            return event_loop.run(guard_request(func(*args, **kwargs), request.environ, endpoint))
+        return wrapper
 
 def create_app():
     """Application factory"""
-    app = Flask(__name__)
+    app = RunwareFlask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
     CORS(app)
 
     # Register blueprints
     app.register_blueprint(health_bp)
     app.register_blueprint(generation_bp)
     app.register_blueprint(processing_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(pipeline_bp)
+    app.register_blueprint(history_bp)
+    app.register_blueprint(media_bp)
+    app.register_blueprint(metrics_bp)
+
+    @app.errorhandler(DeadlineExceeded)
+    def deadline_exceeded(e):
+        return jsonify({'success': False, 'error': str(e)}), 504
+
+    @app.errorhandler(ClientDisconnected)
+    def client_disconnected(e):
+        # Nobody reads this response; 499 only marks the request in logs and metrics
+        return jsonify({'success': False, 'error': str(e)}), 499
 
     return app
 
@@ -37,9 +77,10 @@ if __name__ == '__main__':
     api_key = os.getenv('RUNWARE_API_KEY')
     print(f"API Key configured: {'YES' if api_key else 'NO'}")
 
-    # Run the Flask app
+    # Development server; use gunicorn -c gunicorn.conf.py wsgi:app in production
     app.run(
         host='0.0.0.0',
         port=int(os.getenv('FLASK_PORT', 5005)),
-        debug=os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+        debug=os.getenv('FLASK_DEBUG', 'False').lower() == 'true',
+        threaded=True
     )
\ No newline at end of file
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Concurrent throughput benchmark for the async serving path
+
+Compares async views on the shared event loop (one persistent Runware
+connection per process) against the previous behaviour of asyncio.run() plus
+a fresh connection in every request. The Runware client is replaced by an
+in-process stand-in with fixed connect and task latency, so no API key or
+credits are needed.
+
+Usage (from python-service/):
+    python -m benchmarks.async_serving --requests 64 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+os.environ.setdefault('RUNWARE_API_KEY', 'benchmark')
+
+from werkzeug.serving import make_server
+
+import app as app_module
+from services.runware_client import RunwareClientService, runware_service
+
+class FakeRunware:
+    """Stand-in for the Runware SDK client with configurable latency"""
+    connect_latency = 0.3
+    task_latency = 0.5
+
+    def __init__(self, api_key):
+        self._open = False
+
+    async def connect(self):
+        await asyncio.sleep(self.connect_latency)
+        self._open = True
+
+    def connected(self):
+        return self._open
+
+    def isAuthenticated(self):
+        return self._open
+
+    async def disconnect(self):
+        self._open = False
+
+    async def imageInference(self, requestImage):
+        await asyncio.sleep(self.task_latency)
+        return [
+            SimpleNamespace(imageURL=f"https://example.com/{uuid.uuid4()}.png", imageUUID=str(uuid.uuid4()))
+            for _ in range(requestImage.numberResults)
+        ]
+
+@contextlib.contextmanager
+def legacy_mode():
+    """Temporarily restore asyncio.run() per request and reconnect per call"""
+    original_async_to_sync = app_module.RunwareFlask.async_to_sync
+    original_connection = RunwareClientService.connection
+
+    def async_to_sync(self, func):
+        def wrapper(*args, **kwargs):
+            return asyncio.run(func(*args, **kwargs))
+        return wrapper
+
+    @contextlib.asynccontextmanager
+    async def connection(self, operation='unknown', model=''):
+        client = await self._open_client()
+        if client is None:
+            raise RuntimeError("Failed to establish connection to Runware")
+        yield client
+
+    app_module.RunwareFlask.async_to_sync = async_to_sync
+    RunwareClientService.connection = connection
+    try:
+        yield
+    finally:
+        app_module.RunwareFlask.async_to_sync = original_async_to_sync
+        RunwareClientService.connection = original_connection
+
+def post_json(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        body = json.loads(response.read())
+    return time.perf_counter() - start, body.get('success', False)
+
+def run_load(base_url, total, concurrency):
+    payload = {'prompt': 'benchmark prompt', 'width': 512, 'height': 512}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: post_json(f"{base_url}/generate/image", payload), range(total)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': total,
+        'errors': sum(1 for _, ok in results if not ok),
+        'wall_s': round(wall, 2),
+        'throughput_rps': round(total / wall, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--connect-latency', type=float, default=FakeRunware.connect_latency)
+    parser.add_argument('--task-latency', type=float, default=FakeRunware.task_latency)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    FakeRunware.connect_latency = args.connect_latency
+    FakeRunware.task_latency = args.task_latency
+    runware_service.client_factory = FakeRunware
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        with legacy_mode():
+            legacy = run_load(base_url, args.requests, args.concurrency)
+        shared = run_load(base_url, args.requests, args.concurrency)
+    finally:
+        server.shutdown()
+
+    print(f"{'mode':<22}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for name, result in (('asyncio.run/reconnect', legacy), ('shared loop', shared)):
+        print(f"{name:<22}{result['throughput_rps']:>8}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
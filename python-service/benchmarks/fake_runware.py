@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Runware WebSocket API
+
+Speaks enough of the Runware protocol for the SDK to run unmodified:
+authentication, ping/pong, imageInference, imageUpload,
+imageBackgroundRemoval, imageUpscale, imageCaption, and videoInference
+with getResponse polling. Every task waits a configurable latency, fails
+at a configurable rate, and can pad its results to a given payload size,
+so the service can be measured without an API key or credits.
+
+Point the service at it with RUNWARE_WS_URL:
+    python -m benchmarks.fake_runware --port 8765 --latency 0.5
+    RUNWARE_WS_URL=ws://127.0.0.1:8765 python app.py
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+
+from websockets.asyncio.server import serve
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TASKS = ('imageInference', 'imageBackgroundRemoval', 'imageUpscale')
+
+def parse_tasks(raw):
+    """Tasks in one message: a list, or a single {'newTask': {...}} object (used by imageInference)"""
+    message = json.loads(raw)
+    if isinstance(message, dict):
+        return [message.get('newTask', message)]
+    return message
+
+class FakeRunwareServer:
+    """Runware-compatible websocket server with injectable latency and failures"""
+
+    def __init__(self, host='127.0.0.1', port=8765, latency=0.5, latencies=None,
+                 error_rate=0.0, payload_bytes=0, api_key=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        # Per task type overrides, e.g. {'videoInference': 5.0}
+        self.latencies = dict(latencies or {})
+        self.error_rate = error_rate
+        self.payload_bytes = payload_bytes
+        self.api_key = api_key
+        self._random = random.Random(seed)
+        self._videos = {}
+        self._server = None
+        self._thread = None
+        self._loop = None
+        self.tasks = {}
+        self.errors = 0
+        self.connections = 0
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def stats(self):
+        """Tasks handled per type, injected errors and connections opened"""
+        return {'tasks': dict(self.tasks), 'errors': self.errors, 'connections': self.connections}
+
+    def _latency_for(self, task_type):
+        return self.latencies.get(task_type, self.latency)
+
+    def _padding(self):
+        return 'A' * self.payload_bytes if self.payload_bytes else None
+
+    def _image(self, task, **extra):
+        image_uuid = str(uuid.uuid4())
+        result = {
+            'taskType': task['taskType'],
+            'taskUUID': task['taskUUID'],
+            'imageUUID': image_uuid,
+            'imageURL': f"https://im.runware.ai/image/fake/{image_uuid}.png",
+            'cost': 0.0
+        }
+        padding = self._padding()
+        if padding:
+            result['imageBase64Data'] = padding
+        result.update(extra)
+        return result
+
+    def _results(self, task):
+        """Successful response items for one task"""
+        task_type = task['taskType']
+        if task_type == 'imageInference':
+            return [
+                self._image(task, seed=task.get('seed', self._random.randint(1, 2 ** 31)))
+                for _ in range(int(task.get('numberResults', 1)))
+            ]
+        if task_type in IMAGE_TASKS:
+            return [self._image(task)]
+        if task_type == 'imageUpload':
+            return [self._image(task)]
+        if task_type == 'imageCaption':
+            return [{
+                'taskType': task_type,
+                'taskUUID': task['taskUUID'],
+                'text': 'a fake caption for benchmarking',
+                'cost': 0.0
+            }]
+        return None
+
+    def _error(self, task, message='Injected failure from fake Runware server', code='fakeError'):
+        self.errors += 1
+        return {'errors': [{
+            'code': code,
+            'message': message,
+            'taskType': task.get('taskType'),
+            'taskUUID': task.get('taskUUID')
+        }]}
+
+    async def _send(self, websocket, message):
+        await websocket.send(json.dumps(message))
+
+    async def _run_task(self, websocket, task):
+        task_type = task.get('taskType')
+        self.tasks[task_type] = self.tasks.get(task_type, 0) + 1
+
+        if task_type == 'videoInference':
+            # Video is asynchronous: acknowledge now and let getResponse polls pick up the result
+            self._videos[task['taskUUID']] = {
+                'readyAt': time.monotonic() + self._latency_for(task_type),
+                'failed': self._random.random() < self.error_rate,
+                'task': task
+            }
+            await self._send(websocket, {'data': [{'taskType': task_type, 'taskUUID': task['taskUUID']}]})
+            return
+
+        if task_type == 'getResponse':
+            await self._send(websocket, self._poll_video(task))
+            return
+
+        await asyncio.sleep(self._latency_for(task_type))
+        if self._random.random() < self.error_rate:
+            await self._send(websocket, self._error(task))
+            return
+
+        results = self._results(task)
+        if results is None:
+            await self._send(websocket, self._error(task, f"Unsupported taskType '{task_type}'", 'unsupportedTaskType'))
+            return
+        await self._send(websocket, {'data': results})
+
+    def _poll_video(self, task):
+        video = self._videos.get(task.get('taskUUID'))
+        if video is None:
+            return self._error(task, 'Unknown taskUUID', 'taskNotFound')
+
+        task_uuid = task['taskUUID']
+        if time.monotonic() < video['readyAt']:
+            return {'data': [{'taskType': 'videoInference', 'taskUUID': task_uuid, 'status': 'processing'}]}
+
+        del self._videos[task_uuid]
+        if video['failed']:
+            return self._error(video['task'])
+        video_uuid = str(uuid.uuid4())
+        return {'data': [{
+            'taskType': 'videoInference',
+            'taskUUID': task_uuid,
+            'status': 'success',
+            'videoUUID': video_uuid,
+            'videoURL': f"https://vm.runware.ai/video/fake/{video_uuid}.mp4",
+            'cost': 0.0
+        }]}
+
+    async def _handle(self, websocket):
+        self.connections += 1
+        pending = set()
+        try:
+            async for raw in websocket:
+                for task in parse_tasks(raw):
+                    task_type = task.get('taskType')
+                    if task_type == 'authentication':
+                        if self.api_key and task.get('apiKey') != self.api_key:
+                            await self._send(websocket, {'errors': [{
+                                'code': 'invalidApiKey',
+                                'message': 'Invalid API key',
+                                'taskType': 'authentication'
+                            }]})
+                            continue
+                        session = task.get('connectionSessionUUID') or str(uuid.uuid4())
+                        await self._send(websocket, {'data': [{'taskType': 'authentication', 'connectionSessionUUID': session}]})
+                    elif task_type == 'ping':
+                        await self._send(websocket, {'data': [{'taskType': 'ping', 'pong': True}]})
+                    else:
+                        # Tasks on one connection run concurrently, like the real API
+                        job = asyncio.ensure_future(self._run_task(websocket, task))
+                        pending.add(job)
+                        job.add_done_callback(pending.discard)
+        except Exception as e:
+            logger.debug(f"Fake Runware connection closed: {str(e)}")
+        finally:
+            for job in pending:
+                job.cancel()
+
+    async def serve_forever(self, ready=None):
+        async with serve(self._handle, self.host, self.port, max_size=None) as server:
+            self._server = server
+            self.port = list(server.sockets)[0].getsockname()[1]
+            if ready is not None:
+                ready.set()
+            await server.serve_forever()
+
+    def start(self):
+        """Run the server on a background thread and return once it is listening"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.serve_forever(ready))
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='fake-runware', daemon=True)
+        self._thread.start()
+        if not ready.wait(10):
+            raise RuntimeError("Fake Runware server did not start")
+        return self
+
+    def stop(self):
+        if self._server is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+def parse_latencies(values):
+    """Turn ['videoInference=5', ...] into {'videoInference': 5.0}"""
+    latencies = {}
+    for value in values or []:
+        task_type, _, seconds = value.partition('=')
+        latencies[task_type] = float(seconds)
+    return latencies
+
+def add_server_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds per task')
+    parser.add_argument('--task-latency', action='append', metavar='TASK=SECONDS',
+                        help='per task type latency, e.g. videoInference=5 (repeatable)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of tasks that fail')
+    parser.add_argument('--payload-bytes', type=int, default=0, help='padding added to each image result')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for repeatable failures')
+
+def server_from_args(args, **kwargs):
+    return FakeRunwareServer(
+        latency=args.latency,
+        latencies=parse_latencies(args.task_latency),
+        error_rate=args.error_rate,
+        payload_bytes=args.payload_bytes,
+        seed=args.seed,
+        **kwargs
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--api-key', default=None, help='reject any other key (default: accept all)')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = server_from_args(args, host=args.host, port=args.port, api_key=args.api_key)
+    print(f"Fake Runware listening on {server.url}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
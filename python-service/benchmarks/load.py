@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for every Flask route
+
+Starts benchmarks/fake_runware.py in-process, launches the service
+(python app.py) as a subprocess pointed at it through RUNWARE_WS_URL, and
+drives /generate/image, /generate/video, /remove-background, /upscale-image
+and /caption-image at a fixed concurrency. For each route it reports
+p50/p95/p99 latency, throughput, errors and the service's resident memory.
+No API key or credits are needed, so runs are repeatable offline.
+
+When both generate routes run, it also checks load shedding stays scoped
+to images: with videos queued past their admission cap and no other load,
+an image must still come back at the full quality tier, or the run fails.
+
+Every request carries a distinct prompt/image unless --repeat-input is
+given, so the result cache and in-flight deduplication do not hide the
+serving cost. Note the SDK itself polls for results every 350 ms and for
+video every 3 s, which sets a floor under the measured latency.
+
+Usage (from python-service/):
+    python -m benchmarks.load --requests 200 --concurrency 32 --latency 0.5
+    python -m benchmarks.load --routes caption-image --error-rate 0.05 --json
+    python -m benchmarks.load --service-url http://127.0.0.1:5005 --service-pid 1234
+"""
+
+import argparse
+import base64
+import io
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from benchmarks.fake_runware import add_server_arguments, server_from_args
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ('generate/image', 'generate/video', 'remove-background', 'upscale-image', 'caption-image')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def noise_png(seed, size):
+    """A real PNG of random pixels, about size bytes since noise does not compress"""
+    side = max(8, math.isqrt(size // 3))
+    image = Image.frombytes('RGB', (side, side), random.Random(seed).randbytes(side * side * 3))
+    output = io.BytesIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+def fake_image(index, size):
+    """A decodable PNG that differs per request, as a data URI"""
+    return 'data:image/png;base64,' + base64.b64encode(noise_png(index, size)).decode('ascii')
+
+def build_payload(route, index, image_size):
+    if route == 'generate/image':
+        return {'prompt': f'benchmark prompt {index}', 'width': 512, 'height': 512, 'steps': 20, 'seed': index + 1}
+    if route == 'generate/video':
+        return {'prompt': f'benchmark video {index}', 'duration': 5}
+    payload = {'image': fake_image(index, image_size)}
+    if route == 'upscale-image':
+        payload['scaleFactor'] = 2
+    return payload
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+def to_mb(value):
+    return round(value / 1048576, 1) if value is not None else None
+
+def read_rss(pid):
+    """Resident set size of a process in bytes (Linux /proc), or None"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+class RSSSampler:
+    """Samples a process's RSS on a background thread and keeps the peak"""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_rss = read_rss(self.pid) if self.pid else None
+        self.peak = self.start_rss
+        if self.pid:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = read_rss(self.pid)
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.end_rss = read_rss(self.pid) if self.pid else None
+
+def request_json(url, payload=None, timeout=10):
+    """GET url, or POST payload to it as JSON, and return the decoded body"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode() if payload is not None else None,
+        headers={'Content-Type': 'application/json'},
+        method='POST' if payload is not None else 'GET'
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def post_json(url, payload, timeout):
+    start = time.perf_counter()
+    try:
+        ok = request_json(url, payload, timeout).get('success', False)
+    except (urllib.error.URLError, OSError, ValueError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+def run_route(base_url, route, args, pid, offset):
+    payloads = [
+        build_payload(route, 0 if args.repeat_input else offset + index, args.image_kb * 1024)
+        for index in range(args.requests)
+    ]
+    url = f"{base_url}/{route}"
+    with RSSSampler(pid) as rss, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda payload: post_json(url, payload, args.timeout), payloads))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'route': f'/{route}',
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'wall_s': round(wall, 2),
+        'throughput_rps': round(len(results) / wall, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'rss_start_mb': to_mb(rss.start_rss),
+        'rss_peak_mb': to_mb(rss.peak),
+        'rss_end_mb': to_mb(rss.end_rss),
+    }
+
+def check_shedding(base_url, timeout):
+    """Queue videos past their admission cap, then render one image; returns what the check saw"""
+    admission = request_json(f"{base_url}/health")['admission']
+    videos = admission['operationLimits'].get('videoInference', 2) + 2
+    with ThreadPoolExecutor(max_workers=videos) as pool:
+        pending = [
+            pool.submit(post_json, f"{base_url}/generate/video", build_payload('generate/video', 10 ** 6 + index, 0), timeout)
+            for index in range(videos)
+        ]
+        stop = time.monotonic() + 10
+        while request_json(f"{base_url}/health")['admission']['waiting'] == 0 and time.monotonic() < stop:
+            time.sleep(0.05)
+        queued = request_json(f"{base_url}/health")['admission']['waiting']
+        # Let the queued videos age past the first tier's queue wait threshold
+        time.sleep(1)
+        try:
+            image = request_json(f"{base_url}/generate/image", build_payload('generate/image', 10 ** 6, 0), timeout)
+            tier = image.get('metadata', {}).get('qualityTier') if image.get('success') else None
+        except (urllib.error.URLError, OSError, ValueError):
+            tier = None
+        for future in pending:
+            future.result()
+    return {'videos_queued': queued, 'image_tier': tier, 'passed': bool(queued) and tier == 'full'}
+
+def wait_for_health(base_url, process, deadline=30):
+    stop = time.monotonic() + deadline
+    while time.monotonic() < stop:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Service did not become healthy")
+
+def start_service(ws_url, port, extra_env):
+    env = dict(os.environ)
+    env.update({
+        'RUNWARE_API_KEY': env.get('RUNWARE_API_KEY') or 'benchmark',
+        'RUNWARE_WS_URL': ws_url,
+        'FLASK_PORT': str(port),
+        'FLASK_DEBUG': 'False',
+    })
+    env.update(extra_env)
+    return subprocess.Popen(
+        [sys.executable, 'app.py'],
+        cwd=SERVICE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+def print_table(results):
+    columns = ('route', 'requests', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'rss_peak_mb')
+    headers = ('route', 'reqs', 'errors', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'peak RSS MB')
+    widths = (20, 6, 8, 9, 9, 9, 9, 13)
+    print(''.join(f"{header:<{width}}" if i == 0 else f"{header:>{width}}" for i, (header, width) in enumerate(zip(headers, widths))))
+    for result in results:
+        cells = [result[column] if result[column] is not None else 'n/a' for column in columns]
+        print(''.join(f"{cell:<{width}}" if i == 0 else f"{cell:>{width}}" for i, (cell, width) in enumerate(zip(cells, widths))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(ROUTES))
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--image-kb', type=int, default=256, help='input image size for the image tools')
+    parser.add_argument('--repeat-input', action='store_true', help='send identical inputs (exercises caching)')
+    parser.add_argument('--timeout', type=float, default=120, help='per request timeout in seconds')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='extra environment for the spawned service (repeatable)')
+    parser.add_argument('--service-url', default=None, help='benchmark an already running service instead')
+    parser.add_argument('--service-pid', type=int, default=None, help='pid to sample RSS from with --service-url')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--skip-shedding-check', action='store_true',
+                        help='do not check that queued videos leave image quality at the full tier')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    fake = None
+    process = None
+    if args.service_url:
+        base_url = args.service_url.rstrip('/')
+        pid = args.service_pid
+    else:
+        fake = server_from_args(args, port=0).start()
+        port = free_port()
+        extra_env = dict(value.split('=', 1) for value in args.env)
+        process = start_service(fake.url, port, extra_env)
+        base_url = f"http://127.0.0.1:{port}"
+        pid = process.pid
+
+    try:
+        wait_for_health(base_url, process)
+        results = [
+            run_route(base_url, route, args, pid, offset=position * args.requests)
+            for position, route in enumerate(args.routes)
+        ]
+        shedding = None
+        if not args.skip_shedding_check and {'generate/image', 'generate/video'} <= set(args.routes):
+            shedding = check_shedding(base_url, args.timeout)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if fake is not None:
+            fake.stop()
+
+    if args.json:
+        print(json.dumps({'results': results, 'shedding': shedding, 'upstream': fake.stats() if fake else None}, indent=2))
+    else:
+        print_table(results)
+        if fake is not None:
+            print(f"upstream tasks: {fake.stats()['tasks']}")
+        if shedding is not None:
+            print(f"image tier with {shedding['videos_queued']} video(s) queued: {shedding['image_tier']}")
+
+    if shedding is not None and not shedding['passed']:
+        sys.exit('Load shedding check failed: queued videos should leave images at the full tier')
+
+if __name__ == '__main__':
+    main()
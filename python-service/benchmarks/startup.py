@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Python service
+
+Starts the service against benchmarks/fake_runware.py and measures the time
+from spawning the server until /health answers, until the first
+/generate/image succeeds (connect included), and the resident memory of
+every process once it is up. Compares the development server (python
+app.py) with the production gunicorn setup (gunicorn.conf.py), whose master
+preloads the app before forking its workers.
+
+Usage (from python-service/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modes gunicorn --workers 4 --runs 5 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.fake_runware import FakeRunwareServer
+from benchmarks.load import SERVICE_DIR, free_port, read_rss, to_mb
+
+MODES = ('dev', 'gunicorn')
+
+def child_pids(pid):
+    """Direct children of a process (Linux /proc), i.e. gunicorn's workers"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+def command(mode):
+    if mode == 'dev':
+        return [sys.executable, 'app.py']
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+
+def wait_until(check, process, deadline):
+    stop = time.monotonic() + deadline
+    while time.monotonic() < stop:
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        if check():
+            return
+        time.sleep(0.01)
+    raise RuntimeError("Service did not come up in time")
+
+def healthy(base_url):
+    try:
+        with urllib.request.urlopen(f"{base_url}/health", timeout=1):
+            return True
+    except (urllib.error.URLError, OSError):
+        return False
+
+def first_image(base_url):
+    request = urllib.request.Request(
+        f"{base_url}/generate/image",
+        data=json.dumps({'prompt': 'startup benchmark', 'width': 512, 'height': 512}).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read()).get('success', False)
+
+def measure(mode, ws_url, workers):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'RUNWARE_API_KEY': env.get('RUNWARE_API_KEY') or 'benchmark',
+        'RUNWARE_WS_URL': ws_url,
+        'FLASK_PORT': str(port),
+        'FLASK_HOST': '127.0.0.1',
+        'FLASK_DEBUG': 'False',
+        'GUNICORN_WORKERS': str(workers),
+    })
+    base_url = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command(mode), cwd=SERVICE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until(lambda: healthy(base_url), process, deadline=30)
+        ready = time.perf_counter() - start
+        ok = first_image(base_url)
+        first = time.perf_counter() - start
+        pids = [process.pid] + child_pids(process.pid)
+        rss = [read_rss(pid) or 0 for pid in pids]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    return {
+        'mode': mode,
+        'processes': len(pids),
+        'ready_ms': round(ready * 1000, 1),
+        'first_image_ms': round(first * 1000, 1),
+        'first_image_ok': ok,
+        'rss_total_mb': to_mb(sum(rss)),
+    }
+
+def summarize(runs):
+    summary = dict(runs[0])
+    for field in ('ready_ms', 'first_image_ms', 'rss_total_mb'):
+        summary[field] = round(statistics.median(run[field] for run in runs), 1)
+    summary['first_image_ok'] = all(run['first_image_ok'] for run in runs)
+    summary['runs'] = len(runs)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--runs', type=int, default=3, help='starts per mode (the median is reported)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    fake = FakeRunwareServer(port=0, latency=0.05).start()
+    try:
+        results = [
+            summarize([measure(mode, fake.url, args.workers) for _ in range(args.runs)])
+            for mode in args.modes
+        ]
+    finally:
+        fake.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<10}{'procs':>6}{'ready ms':>11}{'first image ms':>16}{'RSS MB':>9}")
+    for result in results:
+        print(f"{result['mode']:<10}{result['processes']:>6}{result['ready_ms']:>11}"
+              f"{result['first_image_ms']:>16}{result['rss_total_mb']:>9}")
+
+if __name__ == '__main__':
+    main()
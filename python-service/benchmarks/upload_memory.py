@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Peak memory benchmark for image tool uploads
+
+Sends the same image to /caption-image as base64-in-JSON, as a
+multipart/form-data upload and as a raw binary body, and reports the peak
+Python heap allocated while each request is handled. The Runware client is
+replaced by an in-process stand-in, so no API key or credits are needed.
+
+Usage (from python-service/):
+    python -m benchmarks.upload_memory --size-mb 20
+"""
+
+import argparse
+import base64
+import gc
+import io
+import json
+import logging
+import os
+import tracemalloc
+from types import SimpleNamespace
+
+os.environ.setdefault('RUNWARE_API_KEY', 'benchmark')
+os.environ.setdefault('RESULT_CACHE_ENABLED', 'False')
+
+from werkzeug.test import EnvironBuilder
+
+import app as app_module
+from benchmarks.async_serving import FakeRunware
+from benchmarks.load import noise_png
+from services.runware_client import runware_service
+
+MODES = ('json', 'multipart', 'raw')
+
+class CaptioningFakeRunware(FakeRunware):
+    task_latency = 0.0
+
+    async def imageCaption(self, requestImageToText):
+        return SimpleNamespace(text='benchmark caption')
+
+def build_environ(mode, image):
+    if mode == 'json':
+        payload = 'data:image/png;base64,' + base64.b64encode(image).decode('ascii')
+        builder = EnvironBuilder(
+            path='/caption-image', method='POST',
+            data=json.dumps({'image': payload}), content_type='application/json'
+        )
+    elif mode == 'multipart':
+        builder = EnvironBuilder(
+            path='/caption-image', method='POST',
+            data={'image': (io.BytesIO(image), 'image.png', 'image/png')}
+        )
+    else:
+        builder = EnvironBuilder(
+            path='/caption-image', method='POST',
+            data=image, content_type='application/octet-stream'
+        )
+    environ = builder.get_environ()
+    # Materialize the body up front so only server-side allocations are measured
+    body = environ['wsgi.input'].read()
+    environ['wsgi.input'] = io.BytesIO(body)
+    return environ, len(body)
+
+def measure(client, mode, image):
+    environ, body_size = build_environ(mode, image)
+    gc.collect()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    response = client.open(environ)
+    _, peak = tracemalloc.get_traced_memory()
+    assert response.json.get('success'), response.json
+    return body_size, peak - baseline
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=20)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    runware_service.client_factory = CaptioningFakeRunware
+    client = app_module.app.test_client()
+
+    # Real images, since the tools decode and validate their input; one per mode so that
+    # each request is a first use and sends its image inline instead of registering it
+    images = {mode: noise_png(seed, int(args.size_mb * 1024 * 1024)) for seed, mode in enumerate(MODES)}
+    size = len(images['json'])
+
+    tracemalloc.start()
+    # Warm up the event loop and connection pool outside the measurement
+    measure(client, 'raw', noise_png(len(MODES), 1024))
+
+    print(f"image size: {size / 1048576:.1f} MB")
+    print(f"{'mode':<12}{'body MB':>10}{'peak MB':>10}{'peak/image':>12}")
+    for mode in MODES:
+        body_size, peak = measure(client, mode, images[mode])
+        print(f"{mode:<12}{body_size / 1048576:>10.1f}{peak / 1048576:>10.1f}{peak / size:>12.2f}")
+    tracemalloc.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for the Python service in production
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker is a process with a thread pool (gthread) in front of its own
+shared event loop, so one worker already keeps many Runware tasks in flight;
+extra workers add CPU headroom for request parsing and encoding. Admission
+caps, caches and metrics are per worker.
+"""
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5005)}"
+
+workers = int(os.getenv('GUNICORN_WORKERS', min(4, multiprocessing.cpu_count())))
+worker_class = 'gthread'
+
+# A job is polled through whichever worker takes the request, so several workers need the shared store
+if workers > 1:
+    if os.getenv('JOB_STORE', '').lower() == 'memory':
+        raise RuntimeError('JOB_STORE=memory keeps jobs per worker; use JOB_STORE=sqlite when GUNICORN_WORKERS > 1')
+    if not os.getenv('JOB_STORE'):
+        os.environ['JOB_STORE'] = 'sqlite'
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+
+# Import create_app once in the master so workers fork with it already loaded
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Recycle workers after this many requests (with jitter so they do not restart together)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Seconds a worker gets on SIGTERM to finish in-flight requests and background jobs
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# Idle keep-alive for the Express proxy's pooled connections
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 75))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def post_worker_init(worker):
+    from wsgi import warm_up
+    warm_up()
+
+def worker_exit(server, worker):
+    from wsgi import shutdown
+    # Leave part of the graceful window for failing leftover jobs and closing connections
+    shutdown(timeout=max(1, graceful_timeout - 10))
@@ -1,67 +1,134 @@
-import asyncio
-
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
+from services.admission import AdmissionRejected
+from services.bulk import bulk_generator
+from services.event_loop import run_blocking
 from services.image_service import ImageService
+from services.streaming import SSE_HEADERS, event_stream
 
 generation_bp = Blueprint('generation', __name__)
 
+def _image_params(data):
+    """Positional ImageService.generate_image arguments from a request body"""
+    return (
+        data.get('prompt', ''),
+        data.get('model', 'runware:101@1'),
+        data.get('width', 1024),
+        data.get('height', 1024),
+        data.get('steps', 20),
+        data.get('cfgScale', 7),
+        data.get('seed')
+    )
+
+def _video_params(data):
+    """Positional ImageService.generate_video arguments from a request body"""
+    return (
+        data.get('prompt', ''),
+        data.get('model', 'klingai:5@3'),
+        data.get('duration', 10),
+        data.get('width', 1920),
+        data.get('height', 1080),
+        data.get('outputFormat', 'mp4'),
+        data.get('outputQuality', 95)
+    )
+
+def _stream(coro, operation):
+    return Response(
+        event_stream(coro, operation, request.environ, request.url_rule.rule),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
 @generation_bp.route('/generate/image', methods=['POST'])
-def generate_image():
+async def generate_image():
     """Generate image using Runware API"""
     try:
-        data = request.get_json()
+        # Read and parse the body off the shared loop, so a slow upload never stalls other requests
+        data = await run_blocking(request.get_json)
 
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Extract parameters
-        prompt = data.get('prompt', '')
-        model = data.get('model', 'runware:101@1')
-        width = data.get('width', 1024)
-        height = data.get('height', 1024)
-        steps = data.get('steps', 20)
-        cfg_scale = data.get('cfgScale', 7)
-
-        if not prompt:
+        params = _image_params(data)
+        if not params[0]:
             return jsonify({'error': 'Prompt is required'}), 400
 
         # Run async generation
-        result = asyncio.run(ImageService.generate_image(
-            prompt, model, width, height, steps, cfg_scale
-        ))
+        result = await ImageService.generate_image(*params)
 
         return jsonify(result)
 
+    except AdmissionRejected as e:
+        return jsonify({'error': str(e), 'retryAfter': e.retry_after}), e.status_code, {'Retry-After': str(e.retry_after)}
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @generation_bp.route('/generate/video', methods=['POST'])
-def generate_video():
+async def generate_video():
     """Generate video using Runware API"""
     try:
-        data = request.get_json()
+        data = await run_blocking(request.get_json)
 
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Extract parameters
-        prompt = data.get('prompt', '')
-        model = data.get('model', 'klingai:5@3')
-        duration = data.get('duration', 10)
-        width = data.get('width', 1920)
-        height = data.get('height', 1080)
-        output_format = data.get('outputFormat', 'mp4')
-        output_quality = data.get('outputQuality', 95)
-
-        if not prompt:
+        params = _video_params(data)
+        if not params[0]:
             return jsonify({'error': 'Prompt is required'}), 400
 
         # Run async generation
-        result = asyncio.run(ImageService.generate_video(
-            prompt, model, duration, width, height, output_format, output_quality
-        ))
+        result = await ImageService.generate_video(*params)
 
         return jsonify(result)
 
+    except AdmissionRejected as e:
+        return jsonify({'error': str(e), 'retryAfter': e.retry_after}), e.status_code, {'Retry-After': str(e.retry_after)}
+
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@generation_bp.route('/generate/image/stream', methods=['POST'])
+def generate_image_stream():
+    """Generate image, streaming progress as server-sent events"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    params = _image_params(data)
+    if not params[0]:
+        return jsonify({'error': 'Prompt is required'}), 400
+
+    # Progressive mode streams a quick low-step preview before the full render
+    generate = ImageService.generate_progressive if data.get('progressive') else ImageService.generate_image
+    return _stream(generate(*params), 'imageInference')
+
+@generation_bp.route('/generate/video/stream', methods=['POST'])
+def generate_video_stream():
+    """Generate video, streaming progress as server-sent events"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    params = _video_params(data)
+    if not params[0]:
+        return jsonify({'error': 'Prompt is required'}), 400
+
+    return _stream(ImageService.generate_video(*params), 'videoInference')
+
+@generation_bp.route('/generate/image/batch', methods=['POST'])
+def generate_image_batch():
+    """Generate a list of images, streaming each item as server-sent events as it finishes"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    try:
+        items = bulk_generator.normalize(data)
+        parallelism = int(data.get('parallelism') or 0)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return _stream(bulk_generator.generate(items, parallelism), 'imageInference')
@@ -1,28 +1,71 @@
-import asyncio
 import time
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify, request
+from services.admission import admission
+from services.batching import image_batcher
+from services.bulk import bulk_generator
+from services.health_prober import InferenceCheckLimited, health_prober
+from services.history import history
+from services.image_registry import image_registry
+from services.load_shedding import load_shedder
+from services.media_store import media_store
+from services.preprocess import preprocessor
+from services.result_cache import result_cache
 from services.runware_client import runware_service
-from services.image_service import ImageService
+from services.single_flight import single_flight
 
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint, served from cached state without calling Runware"""
+    health_prober.ensure_started()
     return jsonify({
         'status': 'healthy',
         'service': 'runware-python-service',
         'runware_connected': runware_service.connected,
+        'upstream': health_prober.stats(),
+        'runware_pool': runware_service.stats(),
+        'runware_resilience': runware_service.resilience.stats(),
+        'image_batching': image_batcher.stats(),
+        'bulk_generation': bulk_generator.stats(),
+        'history': history.stats(),
+        'media_cache': media_store.stats(),
+        'result_cache': result_cache.stats(),
+        'single_flight': single_flight.stats(),
+        'image_registry': image_registry.stats(),
+        'preprocessing': preprocessor.stats(),
+        'admission': admission.stats(),
+        'load_shedding': load_shedder.stats(),
         'timestamp': time.time()
     })
 
 @health_bp.route('/test-connection', methods=['GET'])
 def test_connection():
-    """Test Runware API connection"""
+    """Report the prober's view of the Runware connection; ?inference=true runs a real, rate-limited generation"""
     try:
-        result = asyncio.run(ImageService.test_connection())
-        return jsonify(result)
+        health_prober.ensure_started()
+        if request.args.get('inference', 'false').lower() == 'true':
+            return jsonify(current_app.ensure_sync(health_prober.inference_check)())
+
+        upstream = health_prober.stats()
+        return jsonify({
+            'success': upstream['status'] == 'up',
+            'connection': 'active' if upstream['status'] == 'up' else upstream['status'],
+            'responseTime': upstream['latencyP50'],
+            'lastSuccess': upstream['lastSuccess'],
+            'error': upstream['lastError'],
+            'testImage': (upstream['inferenceCheck'] or {}).get('testImage')
+        })
+
+    except InferenceCheckLimited as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'retryAfter': e.retry_after,
+            'lastCheck': health_prober.last_inference
+        }), 429, {'Retry-After': str(e.retry_after)}
+
     except Exception as e:
         return jsonify({
             'success': False,
@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify, request
+from services.event_loop import run_blocking
+from services.history import history
+
+history_bp = Blueprint('history', __name__)
+
+@history_bp.route('/history', methods=['GET'])
+async def list_history():
+    """Page through generated media, newest first, optionally searching prompts"""
+    try:
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+
+        # SQLite reads run off the shared loop so they never stall in-flight generations
+        items, next_cursor = await run_blocking(
+            history.query,
+            request.args.get('q'),
+            request.args.get('model'),
+            request.args.get('operation'),
+            request.args.get('cursor'),
+            limit
+        )
+        return jsonify({'success': True, 'items': items, 'nextCursor': next_cursor})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@history_bp.route('/history/<uuid>', methods=['DELETE'])
+async def delete_history(uuid):
+    """Remove one entry from the history"""
+    try:
+        if not await run_blocking(history.delete, uuid):
+            return jsonify({'success': False, 'error': 'Entry not found'}), 404
+
+        return jsonify({'success': True})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,55 @@
+from flask import Blueprint, jsonify, request
+from services.event_loop import run_blocking
+from services.jobs import CallbackRejected, job_manager
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/video', methods=['POST'])
+async def create_video_job():
+    """Queue a video generation job and return its id immediately"""
+    try:
+        data = await run_blocking(request.get_json)
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Extract parameters
+        params = {
+            'prompt': data.get('prompt', ''),
+            'model': data.get('model', 'klingai:5@3'),
+            'duration': data.get('duration', 10),
+            'width': data.get('width', 1920),
+            'height': data.get('height', 1080),
+            'outputFormat': data.get('outputFormat', 'mp4'),
+            'outputQuality': data.get('outputQuality', 95)
+        }
+        callback_url = data.get('callbackUrl')
+
+        if not params['prompt']:
+            return jsonify({'error': 'Prompt is required'}), 400
+
+        if callback_url:
+            try:
+                await run_blocking(job_manager.check_callback_url, callback_url)
+            except CallbackRejected as e:
+                return jsonify({'error': str(e)}), 400
+
+        job = await job_manager.submit('video', params, callback_url)
+        return jsonify({'success': True, 'job': job}), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+async def get_job(job_id):
+    """Report job status and, once finished, its result"""
+    try:
+        job = await job_manager.get(job_id)
+
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+        return jsonify({'success': True, 'job': job})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
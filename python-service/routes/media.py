@@ -0,0 +1,51 @@
+from flask import Blueprint, jsonify, redirect, send_file
+from services.media_store import VARIANT_SIZES, media_store
+
+media_bp = Blueprint('media', __name__)
+
+# Cached files are named by content hash, so a given ETag never changes
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def _serve(uuid, variant=None):
+    location = media_store.lookup(uuid, variant)
+    if location is None:
+        return jsonify({'success': False, 'error': 'Media not found'}), 404
+
+    if 'url' in location:
+        # Not downloaded yet (or evicted): send the client upstream for now
+        response = redirect(location['url'], 302)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    # conditional=True answers If-None-Match with 304 and Range with 206, so videos seek
+    response = send_file(
+        location['path'],
+        mimetype=location['mimetype'],
+        etag=location['etag'],
+        conditional=True,
+        max_age=IMMUTABLE_MAX_AGE
+    )
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+@media_bp.route('/media/<uuid>', methods=['GET'])
+def get_media(uuid):
+    """Serve a generated image or video from the local cache, with ETag and Range support"""
+    try:
+        return _serve(uuid)
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Media not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@media_bp.route('/media/<uuid>/<variant>', methods=['GET'])
+def get_media_variant(uuid, variant):
+    """Serve a WebP thumbnail or preview of a generated image"""
+    if variant not in VARIANT_SIZES:
+        return jsonify({'error': f"Unknown variant '{variant}'"}), 404
+    try:
+        return _serve(uuid, variant)
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Media not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,67 @@
+import time
+
+from flask import Blueprint, Response, g, request
+from services.admission import admission
+from services.batching import image_batcher
+from services.bulk import bulk_generator
+from services.health_prober import health_prober
+from services.history import history
+from services.image_registry import image_registry
+from services.load_shedding import load_shedder
+from services.media_store import media_store
+from services.preprocess import preprocessor
+from services.metrics import (
+    HTTP_IN_FLIGHT, HTTP_REQUEST_BYTES, HTTP_REQUESTS, HTTP_RESPONSE_BYTES, HTTP_SECONDS, metrics
+)
+from services.result_cache import result_cache
+from services.runware_client import runware_service
+from services.single_flight import single_flight
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Component counters already shown on /health, exported as gauges on every scrape
+metrics.add_collector('runware_pool', runware_service.stats)
+metrics.add_collector('upstream_health', health_prober.stats)
+metrics.add_collector('runware_resilience', runware_service.resilience.stats)
+metrics.add_collector('image_batching', image_batcher.stats)
+metrics.add_collector('bulk_generation', bulk_generator.stats)
+metrics.add_collector('history', history.stats)
+metrics.add_collector('media_cache', media_store.stats)
+metrics.add_collector('result_cache', result_cache.stats)
+metrics.add_collector('single_flight', single_flight.stats)
+metrics.add_collector('image_registry', image_registry.stats)
+metrics.add_collector('preprocessing', preprocessor.stats)
+metrics.add_collector('admission', admission.stats)
+metrics.add_collector('load_shedding', load_shedder.stats)
+
+def _endpoint():
+    # The route pattern keeps label cardinality bounded (e.g. /jobs/<job_id>)
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@metrics_bp.before_app_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_endpoint = _endpoint()
+    HTTP_IN_FLIGHT.inc(g.metrics_endpoint)
+    HTTP_REQUEST_BYTES.inc(g.metrics_endpoint, amount=request.content_length or 0)
+
+@metrics_bp.after_app_request
+def record_request_metrics(response):
+    endpoint = g.get('metrics_endpoint', _endpoint())
+    HTTP_REQUESTS.inc(endpoint, request.method, response.status_code)
+    if 'metrics_start' in g:
+        HTTP_SECONDS.observe(endpoint, request.method, value=time.perf_counter() - g.metrics_start)
+    if response.content_length is not None:
+        HTTP_RESPONSE_BYTES.inc(endpoint, amount=response.content_length)
+    return response
+
+@metrics_bp.teardown_app_request
+def finish_request_metrics(error=None):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None:
+        HTTP_IN_FLIGHT.dec(endpoint)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of request, stage and component metrics"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
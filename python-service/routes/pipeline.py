@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify, request
+from services.event_loop import run_blocking
+from services.pipeline import PipelineError, PipelineService
+
+pipeline_bp = Blueprint('pipeline', __name__)
+
+@pipeline_bp.route('/pipeline', methods=['POST'])
+async def run_pipeline():
+    """Run a chain of image operations server-side, feeding each output into the next step"""
+    try:
+        # The body can carry a large base64 image, so it is parsed off the shared loop
+        data = await run_blocking(request.get_json)
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        result = await PipelineService.run(data.get('steps'), data.get('image'))
+        return jsonify(result)
+
+    except PipelineError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,67 +1,109 @@
-import asyncio
-from flask import Blueprint, request, jsonify
-from services.image_service import ImageService
+from flask import Blueprint, jsonify
+from services.admission import AdmissionRejected
+from services.event_loop import run_blocking
+from services.image_service import ImageService, parse_scale_factor
+from services.preprocess import ImageRejected
+from utils.uploads import read_image_request
 
 processing_bp = Blueprint('processing', __name__)
 
+@processing_bp.route('/images', methods=['POST'])
+async def register_image():
+    """Upload an input image once; tools accept the returned uuid as 'image'"""
+    try:
+        image_data, data = await run_blocking(read_image_request)
+
+        if data is None:
+            return jsonify({'error': 'No data provided'}), 400
+
+        if not image_data:
+            return jsonify({'error': 'Image data is required'}), 400
+
+        result = await ImageService.register_image(image_data)
+        return jsonify(result), 201 if result['success'] else 500
+
+    except ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @processing_bp.route('/remove-background', methods=['POST'])
-def remove_background():
+async def remove_background():
     """Remove background from image using Runware API"""
     try:
-        data = request.get_json()
+        image_data, data = await run_blocking(read_image_request)
 
-        if not data:
+        if data is None:
             return jsonify({'error': 'No data provided'}), 400
 
-        image_data = data.get('image', '')
         if not image_data:
             return jsonify({'error': 'Image data is required'}), 400
 
         # Run async background removal
-        result = asyncio.run(ImageService.remove_background(image_data))
+        result = await ImageService.remove_background(image_data)
         return jsonify(result)
 
+    except AdmissionRejected as e:
+        return jsonify({'error': str(e), 'retryAfter': e.retry_after}), e.status_code, {'Retry-After': str(e.retry_after)}
+
+    except ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status_code
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @processing_bp.route('/upscale-image', methods=['POST'])
-def upscale_image():
+async def upscale_image():
     """Upscale image using Runware API"""
     try:
-        data = request.get_json()
+        image_data, data = await run_blocking(read_image_request)
 
-        if not data:
+        if data is None:
             return jsonify({'error': 'No data provided'}), 400
 
-        image_data = data.get('image', '')
-        scale_factor = data.get('scaleFactor', 2)
+        try:
+            scale_factor = parse_scale_factor(data.get('scaleFactor', 2))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         if not image_data:
             return jsonify({'error': 'Image data is required'}), 400
 
         # Run async upscaling
-        result = asyncio.run(ImageService.upscale_image(image_data, scale_factor))
+        result = await ImageService.upscale_image(image_data, scale_factor)
         return jsonify(result)
 
+    except AdmissionRejected as e:
+        return jsonify({'error': str(e), 'retryAfter': e.retry_after}), e.status_code, {'Retry-After': str(e.retry_after)}
+
+    except ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status_code
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @processing_bp.route('/caption-image', methods=['POST'])
-def caption_image():
+async def caption_image():
     """Generate caption for image using Runware API"""
     try:
-        data = request.get_json()
+        image_data, data = await run_blocking(read_image_request)
 
-        if not data:
+        if data is None:
             return jsonify({'error': 'No data provided'}), 400
 
-        image_data = data.get('image', '')
         if not image_data:
             return jsonify({'error': 'Image data is required'}), 400
 
         # Run async caption generation
-        result = asyncio.run(ImageService.caption_image(image_data))
+        result = await ImageService.caption_image(image_data)
         return jsonify(result)
 
+    except AdmissionRejected as e:
+        return jsonify({'error': str(e), 'retryAfter': e.retry_after}), e.status_code, {'Retry-After': str(e.retry_after)}
+
+    except ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status_code
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
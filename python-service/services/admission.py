@@ -0,0 +1,318 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from flask import has_request_context, request
+
+from .metrics import STAGE_SECONDS, model_label
+from .progress import emit
+
+logger = logging.getLogger(__name__)
+
+# Concurrent units per operation; one unit is one 1024x1024 image or one other task
+DEFAULT_OPERATION_LIMITS = (
+    'imageInference=16,videoInference=2,imageBackgroundRemoval=8,imageUpscale=8,imageCaption=16'
+)
+
+# Typical seconds each operation holds its slot, until real holds are measured; seeds Retry-After
+DEFAULT_HOLD_SECONDS = (
+    'imageInference=3,videoInference=60,imageBackgroundRemoval=3,imageUpscale=5,imageCaption=2'
+)
+
+# Seconds over which an operation's recent queue wait average halves while none of it is admitted
+QUEUE_WAIT_HALF_LIFE = 2.0
+
+# Set while a background job runs: it waits for a slot instead of being rejected
+_background = contextvars.ContextVar('admission_background', default=False)
+
+# Client that work continued outside its request's context (e.g. a shared call) is queued as
+_client = contextvars.ContextVar('admission_client', default=None)
+
+def parse_limits(value, cast=int):
+    """Parse 'name=limit,name=limit' into a dict"""
+    limits = {}
+    for item in (value or '').split(','):
+        name, _, limit = item.strip().rpartition('=')
+        if name:
+            limits[name] = cast(limit)
+    return limits
+
+def current_client():
+    """The API client a request belongs to, for fair queueing"""
+    client = _client.get()
+    if client is not None:
+        return client
+    if has_request_context():
+        return request.headers.get('X-Client-Id') or request.remote_addr or 'anonymous'
+    return 'internal'
+
+def image_weight(width, height):
+    """Admission units for an image request, so large renders count for more"""
+    try:
+        return max(1, math.ceil(int(width) * int(height) / (1024 * 1024)))
+    except (TypeError, ValueError):
+        return 1
+
+def in_background():
+    """True while running inside admission.background()"""
+    return _background.get()
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be queued; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class Waiter:
+    def __init__(self, operation, model, weight, client):
+        self.operation = operation
+        self.model = model
+        self.weight = weight
+        self.client = client
+        self.future = None
+        self.admitted = False
+        self.queued_at = time.perf_counter()
+
+class AdmissionController:
+    """Concurrency caps per operation and per model, with a bounded fair queue.
+
+    Work that fits under its caps starts immediately. Otherwise it waits in a
+    per-client queue; freed capacity goes to clients in round-robin order, so
+    one client's burst of videos cannot starve another client's captions.
+    A client over its queue share gets 429, a full queue or a queue wait past
+    ADMISSION_QUEUE_TIMEOUT gets 503, both with a Retry-After estimate.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+        self.operation_limits = parse_limits(DEFAULT_OPERATION_LIMITS)
+        self.operation_limits.update(parse_limits(os.getenv('ADMISSION_OPERATION_LIMITS', '')))
+        self.model_limits = parse_limits(os.getenv('ADMISSION_MODEL_LIMITS', ''))
+        self.max_queue = int(os.getenv('ADMISSION_MAX_QUEUE', 64))
+        self.max_queue_per_client = int(os.getenv('ADMISSION_MAX_QUEUE_PER_CLIENT', 16))
+        self.queue_timeout = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 10))
+        self._loop = None
+        self._queues = OrderedDict()
+        self._active_operations = {}
+        self._active_models = {}
+        self._waiting = 0
+        self._hold_time = parse_limits(DEFAULT_HOLD_SECONDS, float)
+        self._hold_time.update(parse_limits(os.getenv('ADMISSION_HOLD_SECONDS', ''), float))
+        self._queue_waits = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def stats(self):
+        """Active units, queue depth and rejection counters for /health"""
+        return {
+            'enabled': self.enabled,
+            'waiting': self._waiting,
+            'queueWait': {operation: round(self._recent_queue_wait(operation), 4) for operation in self._queue_waits},
+            'queuedClients': len(self._queues),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timedOut': self.timed_out,
+            'active': dict(self._active_operations),
+            'activeModels': dict(self._active_models),
+            'operationLimits': self.operation_limits,
+            'modelLimits': self.model_limits
+        }
+
+    def _bind_loop(self):
+        """Drop queued waiters from another loop (e.g. after a fork)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queues = OrderedDict()
+            self._active_operations = {}
+            self._active_models = {}
+            self._waiting = 0
+
+    def _fits(self, waiter):
+        limit = self.operation_limits.get(waiter.operation, 0)
+        if limit and self._active_operations.get(waiter.operation, 0) + waiter.weight > limit:
+            return False
+        limit = self.model_limits.get(waiter.model, 0)
+        if limit and self._active_models.get(waiter.model, 0) + waiter.weight > limit:
+            return False
+        return True
+
+    def _take(self, waiter):
+        waiter.admitted = True
+        self.admitted += 1
+        self._active_operations[waiter.operation] = self._active_operations.get(waiter.operation, 0) + waiter.weight
+        if waiter.model:
+            self._active_models[waiter.model] = self._active_models.get(waiter.model, 0) + waiter.weight
+
+    def pressure(self, operation):
+        """(utilization, queue wait) for an operation.
+
+        Utilization is its active plus queued units over its limit, so it
+        passes 1.0 once requests queue. Queue wait is the longer of how long
+        its oldest queued request has waited and its recent average wait.
+        Both only count this operation, so videos queued behind their own
+        cap do not read as image load.
+        """
+        self._bind_loop()
+        queued = [
+            w for queue in self._queues.values() for w in queue
+            if w.operation == operation and not w.future.done()
+        ]
+        limit = self.operation_limits.get(operation, 0)
+        utilization = 0.0
+        if limit:
+            units = self._active_operations.get(operation, 0) + sum(w.weight for w in queued)
+            utilization = units / limit
+        oldest = max((time.perf_counter() - w.queued_at for w in queued), default=0.0)
+        return utilization, max(oldest, self._recent_queue_wait(operation))
+
+    def _recent_queue_wait(self, operation):
+        # Decays while idle, so a burst's waits do not outlive it
+        average, updated_at = self._queue_waits.get(operation, (0.0, 0.0))
+        idle = time.perf_counter() - updated_at
+        return average * 0.5 ** (idle / QUEUE_WAIT_HALF_LIFE)
+
+    def _release(self, waiter, held):
+        self._active_operations[waiter.operation] -= waiter.weight
+        if waiter.model:
+            self._active_models[waiter.model] -= waiter.weight
+            # Model names come from clients, so idle ones are dropped rather than kept at zero
+            if not self._active_models[waiter.model]:
+                del self._active_models[waiter.model]
+        # Moving average of how long this operation holds its slot, for Retry-After
+        previous = self._hold_time.get(waiter.operation, held)
+        self._hold_time[waiter.operation] = previous * 0.8 + held * 0.2
+        self._dispatch()
+
+    def _dequeue(self, waiter):
+        queue = self._queues.get(waiter.client)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._waiting -= 1
+            if not queue:
+                del self._queues[waiter.client]
+
+    def _dispatch(self):
+        """Admit queued waiters that now fit, taking clients in round-robin order"""
+        admitted = True
+        while admitted and self._queues:
+            admitted = False
+            for client, queue in self._queues.items():
+                waiter = next((w for w in queue if not w.future.done() and self._fits(w)), None)
+                if waiter is None:
+                    continue
+                self._dequeue(waiter)
+                self._take(waiter)
+                waiter.future.set_result(None)
+                if client in self._queues:
+                    self._queues.move_to_end(client)
+                admitted = True
+                break
+
+    def retry_after(self, operation):
+        """Seconds until the queue ahead for this operation has likely drained"""
+        limit = self.operation_limits.get(operation) or 1
+        queued = sum(1 for queue in self._queues.values() for w in queue if w.operation == operation)
+        estimate = self._hold_time.get(operation, 1.0) * (queued / limit + 1)
+        return max(1, min(120, math.ceil(estimate)))
+
+    def _reject(self, message, status_code, operation):
+        self.rejected += 1
+        retry_after = self.retry_after(operation)
+        logger.warning(f"Admission rejected {operation}: {message} (retry after {retry_after}s)")
+        return AdmissionRejected(message, status_code, retry_after)
+
+    async def _acquire(self, operation, model, weight, client):
+        self._bind_loop()
+        background = _background.get()
+        # Work bigger than a cap runs alone under it rather than waiting for room that never comes
+        limits = [self.operation_limits.get(operation, 0), self.model_limits.get(model or '', 0)]
+        weight = min([weight] + [limit for limit in limits if limit])
+        waiter = Waiter(operation, model or '', weight, client)
+
+        if not self._queues and self._fits(waiter):
+            self._take(waiter)
+            return waiter
+
+        if not background:
+            if len(self._queues.get(client, ())) >= self.max_queue_per_client:
+                raise self._reject('Too many queued requests for this client', 429, operation)
+            if self._waiting >= self.max_queue:
+                raise self._reject('Service is at capacity, admission queue is full', 503, operation)
+
+        waiter.future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._waiting += 1
+        self._dispatch()
+        if not waiter.future.done():
+            emit('queued', operation=operation, waiting=self._waiting)
+
+        try:
+            await asyncio.wait_for(waiter.future, None if background else self.queue_timeout)
+        except BaseException as e:
+            if waiter.admitted:
+                # Admitted just as we gave up; hand the slot straight back
+                self._release(waiter, 0.0)
+            else:
+                self._dequeue(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise self._reject('Timed out waiting in the admission queue', 503, operation)
+            raise
+        return waiter
+
+    @contextlib.asynccontextmanager
+    async def slot(self, operation, model='', weight=1):
+        """Hold one admission slot for an upstream operation"""
+        if not self.enabled:
+            yield
+            return
+
+        client = 'jobs' if _background.get() else current_client()
+        start = time.perf_counter()
+        waiter = await self._acquire(operation, model, weight, client)
+        admitted = time.perf_counter()
+        # Moving average per operation, so it decays once its requests stop queueing
+        average = self._recent_queue_wait(operation) * 0.8 + (admitted - start) * 0.2
+        self._queue_waits[operation] = (average, admitted)
+        STAGE_SECONDS.observe(operation, model_label(model), 'admission_wait', value=admitted - start)
+        try:
+            yield
+        finally:
+            self._release(waiter, time.perf_counter() - admitted)
+
+    def identity(self):
+        """(client, background) of the work running here, to carry into another context"""
+        return current_client(), _background.get()
+
+    @contextlib.contextmanager
+    def acting_for(self, identity):
+        """Queue work started in this block as the client identity() was taken from"""
+        client, background = identity
+        client_token = _client.set(client)
+        background_token = _background.set(background)
+        try:
+            yield
+        finally:
+            _background.reset(background_token)
+            _client.reset(client_token)
+
+    @contextlib.contextmanager
+    def background(self):
+        """Mark work as a background job: it queues without limits and is never rejected"""
+        token = _background.set(True)
+        try:
+            yield
+        finally:
+            _background.reset(token)
+
+# Global instance
+admission = AdmissionController()
@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+from .deadlines import DeadlineExceeded, current_deadline
+from .progress import current_listener, listen
+from .runware_client import runware_service
+
+logger = logging.getLogger(__name__)
+
+class BatchWaiter:
+    """One caller's share of a batch, with the deadline and progress listener of its own request"""
+
+    def __init__(self, future):
+        self.future = future
+        self.deadline = current_deadline.get()
+        self.listener = current_listener()
+
+class PendingBatch:
+    """Requests waiting to share one multi-result imageInference call"""
+
+    def __init__(self, params):
+        self.params = params
+        self.waiters = []
+        self.timer = None
+
+class ImageBatcher:
+    """Coalesces compatible image generation requests into numberResults batches.
+
+    Requests with the same prompt, model, size, steps and CFG scale that arrive
+    within the batching window are sent as one IImageInference with
+    numberResults=N, and each caller receives one of the returned images. A
+    longer window or larger batch saves more upstream tasks at the cost of
+    added latency for the first request in each batch.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('RUNWARE_BATCH_ENABLED', 'False').lower() == 'true'
+        self.window = float(os.getenv('RUNWARE_BATCH_WINDOW_MS', 50)) / 1000
+        self.max_size = max(1, int(os.getenv('RUNWARE_BATCH_MAX_SIZE', 4)))
+        self._pending = {}
+        self.requests = 0
+        self.batched_requests = 0
+        self.upstream_calls = 0
+
+    def stats(self):
+        """Batching counters and hit rate for /health"""
+        return {
+            'enabled': self.enabled,
+            'windowMs': round(self.window * 1000, 1),
+            'maxBatchSize': self.max_size,
+            'requests': self.requests,
+            'upstreamCalls': self.upstream_calls,
+            'batchedRequests': self.batched_requests,
+            'hitRate': round(self.batched_requests / self.requests, 4) if self.requests else 0.0,
+            'avgBatchSize': round(self.requests / self.upstream_calls, 2) if self.upstream_calls else 0.0
+        }
+
+    async def generate(self, prompt, model, width, height, steps, cfg_scale, seed=None):
+        """Generate one image, sharing the upstream task with compatible requests"""
+        # Seeded requests expect one exact image, so they are never batched
+        if not self.enabled or seed is not None:
+            return await runware_service.generate_image(prompt, model, width, height, steps, cfg_scale, seed=seed)
+
+        self.requests += 1
+        key = (prompt, model, width, height, steps, cfg_scale)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = PendingBatch((prompt, model, width, height, steps, cfg_scale))
+            # Scheduled outside the first caller's context, so its deadline and stream stay its own
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.window, self._flush, key, context=contextvars.Context()
+            )
+            self._pending[key] = batch
+
+        waiter = asyncio.get_running_loop().create_future()
+        batch.waiters.append(BatchWaiter(waiter))
+        if len(batch.waiters) >= self.max_size:
+            self._flush(key)
+
+        image = await waiter
+        return [image] if image is not None else []
+
+    def _flush(self, key):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        # A fresh context: the caller that filled the batch must not lend it its deadline or stream
+        contextvars.Context().run(asyncio.get_running_loop().create_task, self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        # Each waiter's deadline applies to that waiter only; expired or abandoned ones drop out here
+        now = time.monotonic()
+        waiters = []
+        for waiter in batch.waiters:
+            if waiter.future.done():
+                continue
+            if waiter.deadline is not None and now >= waiter.deadline:
+                waiter.future.set_exception(DeadlineExceeded("Request deadline exceeded"))
+                continue
+            waiters.append(waiter)
+        if not waiters:
+            return
+
+        size = len(waiters)
+        self.upstream_calls += 1
+        if size > 1:
+            self.batched_requests += size
+            logger.info(f"Dispatching batched image generation with numberResults={size}")
+
+        # The shared call is bounded by the longest-lived waiter and reports progress to every waiter's stream
+        deadlines = [waiter.deadline for waiter in waiters]
+        current_deadline.set(None if None in deadlines else max(deadlines))
+        listeners = [waiter.listener for waiter in waiters if waiter.listener is not None]
+
+        def fan_out(event, fields):
+            for listener in listeners:
+                listener(event, fields)
+
+        try:
+            with listen(fan_out):
+                images = await runware_service.generate_image(*batch.params, number_results=size)
+        except Exception as e:
+            for waiter in waiters:
+                if not waiter.future.done():
+                    waiter.future.set_exception(e)
+            return
+
+        images = list(images or [])
+        for index, waiter in enumerate(waiters):
+            if not waiter.future.done():
+                waiter.future.set_result(images[index] if index < len(images) else None)
+
+# Global instance
+image_batcher = ImageBatcher()
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import time
+
+from .admission import AdmissionRejected, admission, image_weight
+from .image_service import ImageService
+from .load_shedding import load_shedder
+from .metrics import SERVICE_ERRORS
+from .progress import emit
+from .runware_client import runware_service
+
+logger = logging.getLogger(__name__)
+
+# Item fields and their defaults, matching /generate/image
+ITEM_DEFAULTS = {
+    'model': 'runware:101@1',
+    'width': 1024,
+    'height': 1024,
+    'steps': 20,
+    'cfgScale': 7,
+    'seed': None
+}
+
+class BulkGenerator:
+    """Generates a list of image requests with bounded fan-out.
+
+    Unseeded items with identical parameters (e.g. variations of one prompt)
+    collapse into one multi-result imageInference of up to
+    BULK_MAX_RESULTS_PER_CALL images; everything else runs as a normal
+    cached, deduplicated generation. At most BULK_PARALLELISM upstream calls
+    per request run at once, each taking its admission slot. Every item is
+    reported as soon as it finishes, with its own success or error.
+    """
+
+    def __init__(self):
+        self.max_items = int(os.getenv('BULK_MAX_ITEMS', 32))
+        self.parallelism = max(1, int(os.getenv('BULK_PARALLELISM', 4)))
+        self.max_results_per_call = max(1, int(os.getenv('BULK_MAX_RESULTS_PER_CALL', 4)))
+        self.requests = 0
+        self.items = 0
+        self.calls = 0
+
+    def stats(self):
+        """Request, item and call counters for /health (a call may be a cache hit)"""
+        return {
+            'maxItems': self.max_items,
+            'parallelism': self.parallelism,
+            'requests': self.requests,
+            'items': self.items,
+            'calls': self.calls
+        }
+
+    def normalize(self, data):
+        """Validate a batch body into a list of item parameter dicts; raises ValueError"""
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            raise ValueError('items must be a non-empty list')
+        if len(items) > self.max_items:
+            raise ValueError(f'At most {self.max_items} items per batch')
+
+        # Top-level fields are defaults for every item
+        defaults = {field: data.get(field, default) for field, default in ITEM_DEFAULTS.items()}
+        normalized = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('prompt'):
+                raise ValueError(f'Item {index}: prompt is required')
+            normalized.append({'prompt': item['prompt'], **{
+                field: item.get(field, defaults[field]) for field in ITEM_DEFAULTS
+            }})
+        return normalized
+
+    def _groups(self, items):
+        """Index lists to run as one upstream call each"""
+        groups = []
+        open_groups = {}
+        for index, item in enumerate(items):
+            if item['seed'] is not None:
+                groups.append([index])
+                continue
+            key = (item['prompt'], item['model'], item['width'], item['height'], item['steps'], item['cfgScale'])
+            group = open_groups.get(key)
+            if group is None or len(group) >= self.max_results_per_call:
+                group = open_groups[key] = []
+                groups.append(group)
+            group.append(index)
+        return groups
+
+    async def _generate_group(self, item, count):
+        """One multi-result imageInference under a single admission slot"""
+        tier, width, height, steps, requested = load_shedder.image(item['width'], item['height'], item['steps'])
+        item = {**item, 'width': width, 'height': height, 'steps': steps}
+        weight = image_weight(item['width'], item['height']) * count
+        with load_shedder.hold(weight):
+            async with admission.slot('imageInference', item['model'], weight):
+                start_time = time.perf_counter()
+                images = await runware_service.generate_image(
+                    item['prompt'], item['model'], item['width'], item['height'], item['steps'], item['cfgScale'],
+                    number_results=count
+                )
+                generation_time = time.perf_counter() - start_time
+        results = [
+            ImageService.image_response(
+                image, item['prompt'], item['model'], item['width'], item['height'], item['steps'],
+                item['cfgScale'], None, generation_time
+            )
+            for image in list(images or [])[:count]
+        ]
+        for result in results:
+            ImageService.record_result('imageInference', result)
+        return [load_shedder.finish('imageInference', result, tier, requested) for result in results]
+
+    async def _run_group(self, items, group, limit, report):
+        async with limit:
+            item = items[group[0]]
+            self.calls += 1
+            try:
+                if len(group) == 1:
+                    results = [await ImageService.generate_image(
+                        item['prompt'], item['model'], item['width'], item['height'], item['steps'],
+                        item['cfgScale'], item['seed']
+                    )]
+                else:
+                    results = await self._generate_group(item, len(group))
+            except AdmissionRejected as e:
+                results = [{'success': False, 'error': str(e), 'retryAfter': e.retry_after}]
+            except Exception as e:
+                logger.error(f"Bulk image generation error: {str(e)}")
+                SERVICE_ERRORS.inc('imageInference', type(e).__name__)
+                results = [{'success': False, 'error': str(e)}]
+
+        for position, index in enumerate(group):
+            if position < len(results):
+                result = results[position]
+            elif len(results) == 1 and not results[0].get('success'):
+                result = results[0]
+            else:
+                result = {'success': False, 'error': 'No images generated'}
+            report(index, result)
+
+    async def generate(self, items, parallelism=None):
+        """Generate every item, emitting an 'item' progress event as each one finishes"""
+        self.requests += 1
+        self.items += len(items)
+        start_time = time.perf_counter()
+        results = [None] * len(items)
+
+        def report(index, result):
+            results[index] = result
+            emit('item', index=index, **result)
+
+        # Callers may ask for less fan-out than the configured limit, never more
+        limit = asyncio.Semaphore(max(1, min(self.parallelism, parallelism or self.parallelism)))
+        groups = self._groups(items)
+        await asyncio.gather(*(self._run_group(items, group, limit, report) for group in groups))
+
+        succeeded = sum(1 for result in results if result.get('success'))
+        processing_time = time.perf_counter() - start_time
+        return {
+            'success': succeeded > 0,
+            'items': results,
+            'succeeded': succeeded,
+            'failed': len(items) - succeeded,
+            'metadata': {
+                'timestamp': time.time(),
+                'processingTime': round(processing_time, 2),
+                'calls': len(groups)
+            }
+        }
+
+# Global instance
+bulk_generator = BulkGenerator()
@@ -0,0 +1,113 @@
+import asyncio
+import contextvars
+import logging
+import os
+import socket
+import time
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Absolute deadline in Unix epoch milliseconds, set by the Express proxy
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+# Upper bound for requests that arrive without a deadline header (0 disables it)
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 600))
+
+# How often an in-flight request checks whether its client has gone away
+DISCONNECT_POLL_INTERVAL = float(os.getenv('DISCONNECT_POLL_INTERVAL', 0.25))
+
+# Monotonic deadline of the request being served, None when unbounded
+current_deadline = contextvars.ContextVar('current_deadline', default=None)
+
+REQUESTS_CANCELLED = metrics.counter(
+    'http_requests_cancelled_total', 'Requests cancelled because the client disconnected', ('endpoint',)
+)
+REQUESTS_EXPIRED = metrics.counter(
+    'http_requests_expired_total', 'Requests cancelled because their deadline passed', ('endpoint',)
+)
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before its work finished"""
+
+class ClientDisconnected(Exception):
+    """The client closed the connection while its request was in flight"""
+
+def request_timeout(environ):
+    """Seconds left for a request, from its deadline header or REQUEST_TIMEOUT"""
+    timeout = REQUEST_TIMEOUT or None
+    header = environ.get('HTTP_' + DEADLINE_HEADER.upper().replace('-', '_'))
+    if header:
+        try:
+            remaining = float(header) / 1000 - time.time()
+        except ValueError:
+            logger.warning(f"Ignoring malformed {DEADLINE_HEADER} header: {header!r}")
+        else:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+def client_disconnected(environ):
+    """True once the client's socket has been closed (peeks without consuming data)"""
+    sock = environ.get('werkzeug.socket') or environ.get('gunicorn.socket')
+    if sock is None:
+        return False
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+    except (BlockingIOError, InterruptedError):
+        return False
+    except ValueError:
+        # TLS sockets do not support peeking
+        return False
+    except OSError:
+        return True
+
+def check_deadline():
+    """Raise before starting upstream work the caller can no longer use"""
+    deadline = current_deadline.get()
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+def clear_deadline():
+    """Detach background work (e.g. jobs) from the request that started it"""
+    current_deadline.set(None)
+
+async def guard_request(coro, environ, endpoint):
+    """Run a view coroutine as a task cancelled on deadline expiry or client disconnect"""
+    timeout = request_timeout(environ)
+    if timeout is not None and timeout <= 0:
+        coro.close()
+        REQUESTS_EXPIRED.inc(endpoint)
+        raise DeadlineExceeded("Request deadline exceeded before it started")
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    current_deadline.set(deadline)
+    task = asyncio.ensure_future(coro)
+    while True:
+        wait = DISCONNECT_POLL_INTERVAL
+        if deadline is not None:
+            wait = max(0, min(wait, deadline - time.monotonic()))
+        done, _ = await asyncio.wait({task}, timeout=wait)
+        if done:
+            return task.result()
+
+        if deadline is not None and time.monotonic() >= deadline:
+            error, counter = DeadlineExceeded("Request deadline exceeded"), REQUESTS_EXPIRED
+        elif client_disconnected(environ):
+            error, counter = ClientDisconnected("Client disconnected"), REQUESTS_CANCELLED
+        else:
+            continue
+
+        task.cancel()
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Error while cancelling {endpoint}: {str(e)}")
+        else:
+            # Finished before the cancellation landed
+            return result
+        counter.inc(endpoint)
+        logger.warning(f"Cancelled {endpoint}: {str(error)}")
+        raise error
@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+class EventLoopThread:
+    """Long-lived asyncio event loop running in a daemon thread.
+
+    The Runware SDK binds its websocket, locks and background tasks to the loop
+    that created them, so every coroutine that touches the shared client is
+    scheduled here instead of on a throwaway loop per request.
+    """
+
+    def __init__(self, name='runware-event-loop'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """Return the running loop, starting it on first use (and again after a fork)"""
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._start()
+            return self._loop
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, name=self.name, daemon=True)
+        thread.start()
+        ready.wait()
+
+        self._loop = loop
+        self._thread = thread
+        self._pid = os.getpid()
+        logger.info(f"Started event loop thread '{self.name}' in process {self._pid}")
+
+    def submit(self, coro):
+        """Schedule a coroutine on the shared loop and return a concurrent future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the shared loop and block until it finishes"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        """Stop the loop thread, used on shutdown"""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+            self._pid = None
+
+async def run_blocking(func, *args):
+    """Run blocking work (request body parsing, file I/O) off the shared loop.
+
+    The current context is copied so Flask's request context stays available.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, func, *args)
+
+# Global instance
+event_loop = EventLoopThread()
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from .event_loop import event_loop
+from .image_service import ImageService
+from .runware_client import runware_service
+
+logger = logging.getLogger(__name__)
+
+class InferenceCheckLimited(Exception):
+    """Raised when a real inference check was run too recently"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Inference check rate limited, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class HealthProber:
+    """Keeps upstream health current in the background, so health checks only read it.
+
+    Every HEALTH_PROBE_INTERVAL seconds the prober makes sure the pool is
+    connected and pings each connection, recording the last success and a
+    rolling window of round-trip latencies. /health and /test-connection serve
+    that state without touching Runware. A real inference check costs a task
+    and a credit, so it only runs when asked for, at most once per
+    HEALTH_INFERENCE_MIN_INTERVAL seconds per worker.
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv('HEALTH_PROBE_INTERVAL', 15))
+        self.timeout = float(os.getenv('HEALTH_PROBE_TIMEOUT', 5))
+        self.inference_min_interval = float(os.getenv('HEALTH_INFERENCE_MIN_INTERVAL', 300))
+        # A success older than this many intervals counts as stale
+        self.stale_after = self.interval * 3
+        self._latencies = deque(maxlen=int(os.getenv('HEALTH_LATENCY_WINDOW', 20)))
+        self._lock = threading.Lock()
+        self._future = None
+        self._pid = None
+        self._inference_task = None
+        self._inference_at = None
+        self.probes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_probe = None
+        self.last_success = None
+        self.last_error = None
+        self.last_inference = None
+
+    def ensure_started(self):
+        """Start the probe loop on the shared event loop unless this process already runs it"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._future is not None and not self._future.done():
+                return
+            self._future = event_loop.submit(self._run())
+            self._pid = os.getpid()
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    async def probe(self):
+        """Connect if the whole pool is down, then time a ping on every connection"""
+        self.probes += 1
+        self.last_probe = time.time()
+        try:
+            await asyncio.wait_for(runware_service.ensure_connected(), self.timeout)
+            latencies = [latency for latency in await runware_service.ping(self.timeout) if latency is not None]
+            if not latencies:
+                raise ConnectionError("No Runware connection answered a ping")
+        except Exception as e:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(e) or type(e).__name__
+            logger.warning(f"Runware health probe failed: {self.last_error}")
+            return
+
+        self._latencies.extend(latencies)
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_success = time.time()
+
+    @property
+    def status(self):
+        if self.last_probe is None:
+            return 'unknown'
+        if self.consecutive_failures:
+            return 'down'
+        if self.last_success is None or time.time() - self.last_success > self.stale_after:
+            return 'stale'
+        return 'up'
+
+    def _latency(self, percentile):
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return round(ordered[max(1, math.ceil(percentile * len(ordered))) - 1], 4)
+
+    def stats(self):
+        """Cached upstream state for /health and /test-connection; never calls Runware"""
+        return {
+            'status': self.status,
+            'up': self.status == 'up',
+            'connected': runware_service.connected,
+            'lastProbe': self.last_probe,
+            'lastSuccess': self.last_success,
+            'lastError': self.last_error,
+            'probes': self.probes,
+            'failures': self.failures,
+            'consecutiveFailures': self.consecutive_failures,
+            'latencyP50': self._latency(0.5),
+            'latencyP95': self._latency(0.95),
+            'inferenceCheck': self.last_inference
+        }
+
+    async def inference_check(self):
+        """Run a real generation, at most once per HEALTH_INFERENCE_MIN_INTERVAL; concurrent callers share it"""
+        if self._inference_task is None or self._inference_task.done():
+            if self._inference_at is not None:
+                wait = self._inference_at + self.inference_min_interval - time.monotonic()
+                if wait > 0:
+                    raise InferenceCheckLimited(math.ceil(wait))
+            self._inference_at = time.monotonic()
+            self._inference_task = asyncio.get_running_loop().create_task(self._run_inference_check())
+        # A caller that gives up must not cancel the check for the others
+        return await asyncio.shield(self._inference_task)
+
+    async def _run_inference_check(self):
+        result = await ImageService.test_connection()
+        self.last_inference = {**result, 'checkedAt': time.time()}
+        if result.get('success'):
+            self.last_success = time.time()
+        return result
+
+# Global instance
+health_prober = HealthProber()
@@ -0,0 +1,264 @@
+import base64
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Result key holding the generated media, per response shape
+OUTPUT_KEYS = ('image', 'video')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS history ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, uuid TEXT UNIQUE, operation TEXT NOT NULL, '
+    'prompt TEXT, model TEXT, url TEXT NOT NULL, parameters TEXT NOT NULL, '
+    'generation_time REAL, cost REAL, created_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS history_created ON history (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS history_model ON history (model, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS history_operation ON history (operation, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS history_prompt ON history (prompt)'
+)
+
+# Full-text index over prompts, kept in step with the history table by triggers
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(prompt, content='history', content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN '
+    'INSERT INTO history_fts (rowid, prompt) VALUES (new.id, new.prompt); END',
+    'CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN '
+    "INSERT INTO history_fts (history_fts, rowid, prompt) VALUES ('delete', old.id, old.prompt); END"
+)
+
+COLUMNS = 'id, uuid, operation, prompt, model, url, parameters, generation_time, cost, created_at'
+
+def _connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    try:
+        for statement in FTS_SCHEMA:
+            conn.execute(statement)
+        fts = True
+    except sqlite3.OperationalError as e:
+        # SQLite builds without FTS5 fall back to substring search
+        logger.warning(f"History full-text search unavailable, using LIKE: {str(e)}")
+        fts = False
+    return conn, fts
+
+def _match_query(text):
+    """Quote each search term so user input is never parsed as FTS5 syntax"""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+def encode_cursor(created_at, row_id):
+    return base64.urlsafe_b64encode(f'{created_at!r}:{row_id}'.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(created_at, id) from an opaque page cursor; raises ValueError when malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split(':')
+        return float(created_at), int(row_id)
+    except (UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def history_entry(operation, result):
+    """Row values for a successful result with a media URL, None for anything else"""
+    if not result.get('success'):
+        return None
+    output = next((result[key] for key in OUTPUT_KEYS if isinstance(result.get(key), dict)), None)
+    if output is None or not output.get('url'):
+        return None
+    parameters = output.get('parameters') or {key: output[key] for key in ('scaleFactor',) if key in output}
+    return (
+        output.get('uuid'),
+        operation,
+        output.get('prompt'),
+        output.get('model'),
+        output['url'],
+        json.dumps(parameters),
+        output.get('generationTime', output.get('processingTime')),
+        output.get('cost'),
+        result.get('metadata', {}).get('timestamp', time.time())
+    )
+
+class HistoryStore:
+    """Server-side record of generated media, kept in SQLite.
+
+    record() only appends to a queue, so saving a result costs the request
+    nothing; a writer thread per process drains the queue every
+    HISTORY_FLUSH_INTERVAL seconds and inserts up to HISTORY_BATCH_SIZE rows
+    per transaction. Queries page newest-first with a (created_at, id)
+    keyset cursor, so a page costs the same however deep it is.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('HISTORY_ENABLED', 'True').lower() == 'true'
+        self.path = os.getenv('HISTORY_DB_PATH', 'history.sqlite3')
+        self.flush_interval = float(os.getenv('HISTORY_FLUSH_INTERVAL', 0.5))
+        self.batch_size = max(1, int(os.getenv('HISTORY_BATCH_SIZE', 100)))
+        self.max_page = max(1, int(os.getenv('HISTORY_MAX_PAGE_SIZE', 100)))
+        self._queue = queue.Queue(maxsize=int(os.getenv('HISTORY_QUEUE_SIZE', 10000)))
+        self._lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._conn = None
+        self._fts = False
+        self._writer = None
+        self._pid = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def stats(self):
+        """Write queue and batch counters for /health"""
+        return {
+            'enabled': self.enabled,
+            'fullTextSearch': self._fts,
+            'queued': self._queue.qsize(),
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches
+        }
+
+    @property
+    def conn(self):
+        """Connection for queries, opened on first use"""
+        if self._conn is None:
+            self._conn, self._fts = _connect(self.path)
+        return self._conn
+
+    def _ensure_writer(self):
+        # A forked worker inherits the thread object but not the thread
+        if self._pid != os.getpid() or self._writer is None or not self._writer.is_alive():
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def record(self, operation, result):
+        """Queue a result for the writer thread; never blocks the caller"""
+        if not self.enabled:
+            return
+        entry = history_entry(operation, result)
+        if entry is None:
+            return
+        with self._writer_lock:
+            self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("History write queue full, dropping entry")
+
+    def _write_loop(self):
+        try:
+            conn, _ = _connect(self.path)
+        except sqlite3.Error as e:
+            logger.error(f"History store disabled: {str(e)}")
+            self.enabled = False
+            return
+
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Let results arriving in the same burst share one transaction
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [entry for entry in batch if entry is not None]
+            if batch:
+                self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn, batch):
+        try:
+            with conn:
+                conn.execute('BEGIN')
+                conn.executemany(
+                    'INSERT OR IGNORE INTO history (uuid, operation, prompt, model, url, parameters, '
+                    'generation_time, cost, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    batch
+                )
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.dropped += len(batch)
+            logger.error(f"History batch of {len(batch)} lost: {str(e)}")
+
+    def close(self, timeout=5):
+        """Flush queued entries and stop the writer thread, used on shutdown"""
+        writer = self._writer
+        if writer is None or self._pid != os.getpid() or not writer.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("History write queue full at shutdown, entries lost")
+            return
+        writer.join(timeout)
+
+    def query(self, text=None, model=None, operation=None, cursor=None, limit=20):
+        """One newest-first page of entries and the cursor for the next, if any"""
+        limit = max(1, min(int(limit), self.max_page))
+        clauses, args = [], []
+        with self._lock:
+            conn = self.conn
+            if text and text.strip():
+                if self._fts:
+                    clauses.append('id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)')
+                    args.append(_match_query(text))
+                else:
+                    clauses.append('prompt LIKE ?')
+                    args.append(f'%{text.strip()}%')
+            if model:
+                clauses.append('model = ?')
+                args.append(model)
+            if operation:
+                clauses.append('operation = ?')
+                args.append(operation)
+            if cursor:
+                clauses.append('(created_at, id) < (?, ?)')
+                args.extend(decode_cursor(cursor))
+
+            where = f"WHERE {' AND '.join(clauses)} " if clauses else ''
+            rows = conn.execute(
+                f'SELECT {COLUMNS} FROM history {where}ORDER BY created_at DESC, id DESC LIMIT ?',
+                (*args, limit + 1)
+            ).fetchall()
+
+        next_cursor = encode_cursor(rows[limit - 1][9], rows[limit - 1][0]) if len(rows) > limit else None
+        return [self._item(row) for row in rows[:limit]], next_cursor
+
+    def delete(self, uuid):
+        """Remove an entry by media UUID; True if it existed"""
+        with self._lock:
+            return self.conn.execute('DELETE FROM history WHERE uuid = ?', (uuid,)).rowcount > 0
+
+    @staticmethod
+    def _item(row):
+        return {
+            'id': row[0],
+            'uuid': row[1],
+            'operation': row[2],
+            'prompt': row[3],
+            'model': row[4],
+            'url': row[5],
+            'parameters': json.loads(row[6]),
+            'generationTime': row[7],
+            'cost': row[8],
+            'createdAt': row[9]
+        }
+
+# Global instance
+history = HistoryStore()
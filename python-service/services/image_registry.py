@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from PIL import Image, UnidentifiedImageError
+
+from utils.uploads import ImageRejected, is_image_reference
+
+from .preprocess import preprocessor
+from .result_cache import image_digest
+from .runware_client import runware_service
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+def image_size(path):
+    """(width, height) from an image file's header, or None if it cannot be read"""
+    try:
+        with Image.open(path) as image:
+            return image.size
+    except (UnidentifiedImageError, OSError):
+        return None
+
+class ImageRegistry:
+    """Content-addressed registry of input images already uploaded to Runware.
+
+    Images are keyed by the hash of the bytes the client sent, before any
+    per-operation preprocessing, and each is uploaded once as one canonical
+    copy (preprocessed for 'imageUpload') that every tool shares; its Runware
+    image UUID is kept with LRU/TTL eviction. Later tool calls on the same
+    image send the UUID instead of re-transmitting it, whichever tool made
+    the upload.
+
+    The upload is an extra round trip, so a tool call only registers an image
+    the second time its hash is seen; a one-off call sends its own
+    preprocessed copy inline. Clients that know they will reuse an image
+    register it up front via POST /images.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('IMAGE_REGISTRY_ENABLED', 'True').lower() == 'true'
+        self.ttl = float(os.getenv('IMAGE_REGISTRY_TTL', 3600))
+        self.max_entries = int(os.getenv('IMAGE_REGISTRY_MAX_ENTRIES', 1024))
+        self._entries = OrderedDict()
+        self._seen = OrderedDict()
+        self._uploads = SingleFlight()
+        self.hits = 0
+        self.inline = 0
+        self.uploads = 0
+        self.bytes_saved = 0
+
+    def stats(self):
+        """Registry size and reuse counters for /health"""
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'inline': self.inline,
+            'uploads': self.uploads,
+            'bytesSaved': self.bytes_saved
+        }
+
+    def _lookup(self, digest):
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        if entry['expiresAt'] < time.time():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return entry
+
+    def _first_use(self, digest):
+        """Note a hash seen by a tool call; True unless it was already seen within the TTL"""
+        now = time.time()
+        expires_at = self._seen.pop(digest, None)
+        if expires_at is not None and expires_at >= now:
+            return False
+        self._seen[digest] = now + self.ttl
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return True
+
+    async def register(self, image_data):
+        """Upload an image once and return its handle: id (content hash), uuid, url, reused"""
+        digest = image_digest(image_data)
+        entry, reused = await self._register(digest, image_data)
+        if reused:
+            self._count_hit(image_data)
+        return {'id': digest, 'uuid': entry['uuid'], 'url': entry['url'], 'reused': reused}
+
+    async def _register(self, digest, image_data):
+        """(entry, reused) for an image, uploading its canonical copy unless already registered"""
+        entry = self._lookup(digest)
+        if entry is not None:
+            return entry, True
+        return await self._uploads.do(digest, lambda: self._upload(digest, image_data)), False
+
+    def _count_hit(self, image_data):
+        self.hits += 1
+        self.bytes_saved += len(image_data)
+
+    async def _upload(self, digest, image_data):
+        # A binary upload that needs no preprocessing goes to Runware straight from its temp file
+        prepared = await preprocessor.prepare_file('imageUpload', image_data)
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(None, image_size, prepared.path)
+            uploaded = await runware_service.upload_image(prepared.path)
+        finally:
+            if prepared is not image_data:
+                await loop.run_in_executor(None, prepared.close)
+
+        if not uploaded or not uploaded.imageUUID:
+            raise RuntimeError("Image upload failed")
+
+        self.uploads += 1
+        entry = {
+            'uuid': uploaded.imageUUID,
+            'url': uploaded.imageURL,
+            'size': size,
+            # True when the client's own bytes were uploaded rather than a lossy re-encode
+            'exact': prepared.digest == digest,
+            'expiresAt': time.time() + self.ttl
+        }
+        self._entries[digest] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.info(f"Registered input image {digest[:12]} as {uploaded.imageUUID}")
+        return entry
+
+    async def resolve(self, image_data, prepare, digest=None, fits=None):
+        """Return what to send as inputImage for one tool call.
+
+        That is the registered UUID, or prepare()'s copy of the image sized
+        for this operation on first use, when the upload fails, or when
+        fits(entry) says the registered copy does not suit this call.
+        """
+        if is_image_reference(image_data):
+            return image_data
+        if self.enabled:
+            digest = digest or image_digest(image_data)
+            if self._lookup(digest) is not None or not self._first_use(digest):
+                try:
+                    entry, reused = await self._register(digest, image_data)
+                    if fits is None or fits(entry):
+                        if reused:
+                            self._count_hit(image_data)
+                        return entry['uuid']
+                except ImageRejected:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Image registry upload failed, sending image inline: {str(e)}")
+            self.inline += 1
+        return await prepare()
+
+# Global instance
+image_registry = ImageRegistry()
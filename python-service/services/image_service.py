@@ -1,43 +1,185 @@
+import asyncio
 import logging
+import os
+import random
 import time
 
+from .admission import admission, image_weight
+from .batching import image_batcher
+from .history import history
+from .load_shedding import fit_size, load_shedder
+from .image_registry import image_registry
+from .media_store import media_store
+from .metrics import SERVICE_ERRORS, STAGE_SECONDS, model_label
+from .preprocess import ImageRejected, preprocessor
+from .progress import emit
+from .result_cache import cache_key, image_digest, result_cache
 from .runware_client import runware_service
+from .single_flight import single_flight
 
 logger = logging.getLogger(__name__)
 
+# Progressive mode: the quick first render's step count and longest side
+PREVIEW_STEPS = int(os.getenv('PROGRESSIVE_PREVIEW_STEPS', 4))
+PREVIEW_MAX_SIDE = int(os.getenv('PROGRESSIVE_PREVIEW_MAX_SIDE', 512))
+
+# Upscale factors Runware accepts
+UPSCALE_FACTORS = (2, 3, 4)
+
+def parse_scale_factor(value):
+    """An upscale factor from a request field (form fields arrive as strings); raises ValueError"""
+    try:
+        factor = int(value)
+    except (TypeError, ValueError):
+        factor = None
+    if factor not in UPSCALE_FACTORS or isinstance(value, float) and value != factor:
+        raise ValueError(f"scaleFactor must be one of {', '.join(map(str, UPSCALE_FACTORS))}")
+    return factor
+
+def preview_size(width, height):
+    """Preview dimensions with the render's aspect ratio"""
+    return fit_size(width, height, PREVIEW_MAX_SIDE)
+
 class ImageService:
     @staticmethod
-    async def generate_image(prompt, model="runware:101@1", width=1024, height=1024, steps=20, cfg_scale=7):
+    async def _serve(key, produce, operation, model='', weight=1, record=True, prepare=None):
+        """Serve from the result cache, share identical in-flight calls, and cache successes.
+
+        Only work that reaches Runware takes an admission slot; cache hits and
+        callers sharing an in-flight result never queue. When given, prepare()
+        runs once per upstream call, before the slot, and its result is passed
+        to produce. Fresh results are recorded in the history unless record is
+        False. A shared upstream call queues for admission as the client that
+        started it.
+        """
+        if key is not None:
+            result = await result_cache.get(key)
+            if result is not None:
+                result['metadata']['cached'] = True
+                result['metadata']['timestamp'] = time.time()
+                return result
+
+        identity = admission.identity()
+
+        async def produce_and_store():
+            args = () if prepare is None else (await prepare(),)
+            with admission.acting_for(identity):
+                async with admission.slot(operation, model, weight):
+                    result = await produce(*args)
+            if record:
+                ImageService.record_result(operation, result)
+            if key is not None and result.get('success') and 'metadata' in result:
+                await result_cache.set(key, result)
+            return result
+
+        result = await single_flight.do(key, produce_and_store)
+        if result.get('success') and 'metadata' in result:
+            result['metadata']['cached'] = False
+        return result
+
+    @staticmethod
+    def record_result(operation, result):
+        """Hand a fresh result to the history and media cache; both work off the request path"""
+        history.record(operation, result)
+        if result.get('success'):
+            output = result.get('image') or result.get('video')
+            if isinstance(output, dict):
+                media_store.submit(output.get('uuid'), output.get('url'))
+
+    @staticmethod
+    async def generate_image(prompt, model="runware:101@1", width=1024, height=1024, steps=20, cfg_scale=7, seed=None, record=True):
+        """Generate image at the current quality tier, cached and deduplicated when the seed is fixed"""
+        tier, width, height, steps, requested = load_shedder.image(width, height, steps)
+        # Without a seed every call is expected to produce a new image
+        key = None
+        if seed is not None:
+            key = cache_key('imageInference', prompt=prompt, model=model, width=width, height=height,
+                            steps=steps, cfgScale=cfg_scale, seed=seed)
+        weight = image_weight(width, height)
+        with load_shedder.hold(weight):
+            result = await ImageService._serve(key, lambda: ImageService._generate_image(
+                prompt, model, width, height, steps, cfg_scale, seed
+            ), 'imageInference', model, weight, record)
+        return load_shedder.finish('imageInference', result, tier, requested)
+
+    @staticmethod
+    async def generate_progressive(prompt, model="runware:101@1", width=1024, height=1024, steps=20, cfg_scale=7, seed=None):
+        """Generate image with a quick preview first, reported as a 'preview' progress event.
+
+        The preview (PROGRESSIVE_PREVIEW_STEPS steps, longest side
+        PROGRESSIVE_PREVIEW_MAX_SIDE) and the full render share one seed and
+        start together, so the preview arrives in well under a second and the
+        full image follows. The preview is skipped if the full render wins
+        (e.g. a cache hit). Cancelling the caller cancels whatever is running.
+        """
+        # A fixed seed keeps the preview's composition close to the full render's
+        if seed is None:
+            seed = random.randint(1, 2 ** 31 - 1)
+        preview_width, preview_height = preview_size(width, height)
+
+        loop = asyncio.get_running_loop()
+        preview = loop.create_task(ImageService.generate_image(
+            prompt, model, preview_width, preview_height, min(PREVIEW_STEPS, steps), cfg_scale, seed, record=False
+        ))
+        refine = loop.create_task(ImageService.generate_image(
+            prompt, model, width, height, steps, cfg_scale, seed
+        ))
+        # A failed preview is only a missed head start; the full render decides the outcome
+        preview.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            await asyncio.wait({preview, refine}, return_when=asyncio.FIRST_COMPLETED)
+            if not refine.done() and not preview.cancelled() and preview.exception() is None:
+                result = preview.result()
+                if result.get('success'):
+                    emit('preview', **result)
+            return await refine
+        finally:
+            preview.cancel()
+            refine.cancel()
+
+    @staticmethod
+    def image_response(image, prompt, model, width, height, steps, cfg_scale, seed, generation_time):
+        """Response body for one generated image"""
+        return {
+            'success': True,
+            'image': {
+                'url': image.imageURL,
+                'uuid': image.imageUUID,
+                'prompt': prompt,
+                'model': model,
+                'parameters': {
+                    'width': width,
+                    'height': height,
+                    'steps': steps,
+                    'cfgScale': cfg_scale,
+                    'seed': seed if getattr(image, 'seed', None) is None else image.seed
+                },
+                'generationTime': round(generation_time, 2),
+                'cost': getattr(image, 'cost', None)
+            },
+            'metadata': {
+                'timestamp': time.time(),
+                'processingTime': round(generation_time, 2)
+            }
+        }
+
+    @staticmethod
+    async def _generate_image(prompt, model, width, height, steps, cfg_scale, seed):
         """Generate image with timing and error handling"""
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             logger.info(f"Starting image generation: '{prompt}'")
 
-            images = await runware_service.generate_image(prompt, model, width, height, steps, cfg_scale)
-            generation_time = time.time() - start_time
+            images = await image_batcher.generate(prompt, model, width, height, steps, cfg_scale, seed)
+            generation_time = time.perf_counter() - start_time
 
             if images and len(images) > 0:
                 logger.info(f"Image generated successfully in {generation_time:.2f}s")
-                return {
-                    'success': True,
-                    'image': {
-                        'url': images[0].imageURL,
-                        'uuid': images[0].imageUUID,
-                        'prompt': prompt,
-                        'model': model,
-                        'parameters': {
-                            'width': width,
-                            'height': height,
-                            'steps': steps,
-                            'cfgScale': cfg_scale
-                        },
-                        'generationTime': round(generation_time, 2)
-                    },
-                    'metadata': {
-                        'timestamp': time.time(),
-                        'processingTime': round(generation_time, 2)
-                    }
-                }
+                response = ImageService.image_response(
+                    images[0], prompt, model, width, height, steps, cfg_scale, seed, generation_time
+                )
+                STAGE_SECONDS.observe('imageInference', model_label(model), 'response_build', value=time.perf_counter() - start_time - generation_time)
+                return response
             else:
                 return {
                     'success': False,
@@ -46,6 +188,7 @@ class ImageService:
 
         except Exception as e:
             logger.error(f"Image generation error: {str(e)}")
+            SERVICE_ERRORS.inc('imageInference', type(e).__name__)
             return {
                 'success': False,
                 'error': str(e)
@@ -53,19 +196,30 @@ class ImageService:
 
     @staticmethod
     async def generate_video(prompt, model="bytedance:1@1", duration=10, width=1920, height=1088, output_format="mp4", output_quality=95):
+        """Generate video once an admission slot is free, unless videos are being shed"""
+        tier = load_shedder.video()
+        async with admission.slot('videoInference', model):
+            result = await ImageService._generate_video(
+                prompt, model, duration, width, height, output_format, output_quality
+            )
+        ImageService.record_result('videoInference', result)
+        return load_shedder.finish('videoInference', result, tier)
+
+    @staticmethod
+    async def _generate_video(prompt, model, duration, width, height, output_format, output_quality):
         """Generate video with timing and error handling"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
             logger.info(f"Starting video generation: '{prompt}' with model {model}")
 
             videos = await runware_service.generate_video(prompt, model, duration, width, height)
-            generation_time = time.time() - start_time
+            generation_time = time.perf_counter() - start_time
 
             if videos and len(videos) > 0:
                 video_result = videos[0]
                 logger.info(f"Video generated successfully in {generation_time:.2f}s")
 
-                return {
+                response = {
                     'success': True,
                     'video': {
                         'url': video_result.videoURL,
@@ -89,6 +243,8 @@ class ImageService:
                         'processingTime': round(generation_time, 2)
                     }
                 }
+                STAGE_SECONDS.observe('videoInference', model_label(model), 'response_build', value=time.perf_counter() - start_time - generation_time)
+                return response
             else:
                 return {
                     'success': False,
@@ -96,8 +252,9 @@ class ImageService:
                 }
 
         except Exception as e:
-            generation_time = time.time() - start_time
+            generation_time = time.perf_counter() - start_time
             logger.error(f"Video generation error: {str(e)}")
+            SERVICE_ERRORS.inc('videoInference', type(e).__name__)
 
             # Return demo response for specific errors
             if "videoInferenceInsufficientCredits" in str(e):
@@ -130,19 +287,31 @@ class ImageService:
 
     @staticmethod
     async def remove_background(image_data):
+        """Remove background from image, cached and deduplicated by input image"""
+        digest = image_digest(image_data)
+        key = cache_key('imageBackgroundRemoval', image=digest)
+        return await ImageService._serve(
+            key, ImageService._remove_background, 'imageBackgroundRemoval',
+            prepare=lambda: image_registry.resolve(
+                image_data, lambda: preprocessor.prepare('imageBackgroundRemoval', image_data), digest
+            )
+        )
+
+    @staticmethod
+    async def _remove_background(image_ref):
         """Remove background from image"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
             logger.info("Starting background removal...")
 
-            results = await runware_service.remove_background(image_data)
-            processing_time = time.time() - start_time
+            results = await runware_service.remove_background(image_ref)
+            processing_time = time.perf_counter() - start_time
 
             if results and len(results) > 0:
                 result = results[0]
                 logger.info(f"Background removed successfully in {processing_time:.2f}s")
 
-                return {
+                response = {
                     'success': True,
                     'image': {
                         'url': result.imageURL,
@@ -154,6 +323,8 @@ class ImageService:
                         'processingTime': round(processing_time, 2)
                     }
                 }
+                STAGE_SECONDS.observe('imageBackgroundRemoval', '', 'response_build', value=time.perf_counter() - start_time - processing_time)
+                return response
             else:
                 return {
                     'success': False,
@@ -161,8 +332,9 @@ class ImageService:
                 }
 
         except Exception as e:
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             logger.error(f"Background removal error: {str(e)}")
+            SERVICE_ERRORS.inc('imageBackgroundRemoval', type(e).__name__)
             return {
                 'success': False,
                 'error': str(e)
@@ -170,19 +342,37 @@ class ImageService:
 
     @staticmethod
     async def upscale_image(image_data, scale_factor=2):
+        """Upscale image, cached and deduplicated by input image"""
+        digest = image_digest(image_data)
+        key = cache_key('imageUpscale', image=digest, scaleFactor=scale_factor)
+        max_side = preprocessor.max_side('imageUpscale', scale_factor)
+
+        def fits(entry):
+            # The shared copy must keep the output in bounds and carry no lossy artifacts to upscale
+            return entry['exact'] and entry['size'] is not None and max(entry['size']) <= max_side
+
+        return await ImageService._serve(
+            key, lambda image_ref: ImageService._upscale_image(image_ref, scale_factor), 'imageUpscale',
+            prepare=lambda: image_registry.resolve(
+                image_data, lambda: preprocessor.prepare('imageUpscale', image_data, scale_factor), digest, fits
+            )
+        )
+
+    @staticmethod
+    async def _upscale_image(image_ref, scale_factor):
         """Upscale image"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
             logger.info(f"Starting image upscaling with factor {scale_factor}...")
 
-            results = await runware_service.upscale_image(image_data, scale_factor)
-            processing_time = time.time() - start_time
+            results = await runware_service.upscale_image(image_ref, scale_factor)
+            processing_time = time.perf_counter() - start_time
 
             if results and len(results) > 0:
                 result = results[0]
                 logger.info(f"Image upscaled successfully in {processing_time:.2f}s")
 
-                return {
+                response = {
                     'success': True,
                     'image': {
                         'url': result.imageURL,
@@ -195,6 +385,8 @@ class ImageService:
                         'processingTime': round(processing_time, 2)
                     }
                 }
+                STAGE_SECONDS.observe('imageUpscale', '', 'response_build', value=time.perf_counter() - start_time - processing_time)
+                return response
             else:
                 return {
                     'success': False,
@@ -202,8 +394,9 @@ class ImageService:
                 }
 
         except Exception as e:
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             logger.error(f"Image upscaling error: {str(e)}")
+            SERVICE_ERRORS.inc('imageUpscale', type(e).__name__)
             return {
                 'success': False,
                 'error': str(e)
@@ -211,18 +404,30 @@ class ImageService:
 
     @staticmethod
     async def caption_image(image_data):
+        """Generate caption for image, cached and deduplicated by input image"""
+        digest = image_digest(image_data)
+        key = cache_key('imageCaption', image=digest)
+        return await ImageService._serve(
+            key, ImageService._caption_image, 'imageCaption',
+            prepare=lambda: image_registry.resolve(
+                image_data, lambda: preprocessor.prepare('imageCaption', image_data), digest
+            )
+        )
+
+    @staticmethod
+    async def _caption_image(image_ref):
         """Generate caption for image"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
             logger.info("Starting image captioning...")
 
-            result = await runware_service.caption_image(image_data)
-            processing_time = time.time() - start_time
+            result = await runware_service.caption_image(image_ref)
+            processing_time = time.perf_counter() - start_time
 
             if result:
                 logger.info(f"Caption generated successfully in {processing_time:.2f}s")
 
-                return {
+                response = {
                     'success': True,
                     'caption': result.text,
                     'processingTime': round(processing_time, 2),
@@ -231,6 +436,8 @@ class ImageService:
                         'processingTime': round(processing_time, 2)
                     }
                 }
+                STAGE_SECONDS.observe('imageCaption', '', 'response_build', value=time.perf_counter() - start_time - processing_time)
+                return response
             else:
                 return {
                     'success': False,
@@ -238,8 +445,37 @@ class ImageService:
                 }
 
         except Exception as e:
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             logger.error(f"Caption generation error: {str(e)}")
+            SERVICE_ERRORS.inc('imageCaption', type(e).__name__)
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    @staticmethod
+    async def register_image(image_data):
+        """Upload an input image once and return a reusable handle"""
+        start_time = time.perf_counter()
+        try:
+            handle = await image_registry.register(image_data)
+            processing_time = time.perf_counter() - start_time
+
+            return {
+                'success': True,
+                'image': handle,
+                'metadata': {
+                    'timestamp': time.time(),
+                    'processingTime': round(processing_time, 2)
+                }
+            }
+
+        except ImageRejected:
+            raise
+
+        except Exception as e:
+            logger.error(f"Image registration error: {str(e)}")
+            SERVICE_ERRORS.inc('imageUpload', type(e).__name__)
             return {
                 'success': False,
                 'error': str(e)
@@ -248,10 +484,10 @@ class ImageService:
     @staticmethod
     async def test_connection():
         """Test Runware connection"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
             images = await runware_service.test_connection()
-            response_time = time.time() - start_time
+            response_time = time.perf_counter() - start_time
 
             return {
                 'success': True,
@@ -261,6 +497,7 @@ class ImageService:
             }
 
         except Exception as e:
+            SERVICE_ERRORS.inc('testConnection', type(e).__name__)
             return {
                 'success': False,
                 'error': str(e)
@@ -0,0 +1,311 @@
+import abc
+import asyncio
+import copy
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+from .admission import admission
+from .deadlines import clear_deadline
+from .image_service import ImageService
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = ('queued', 'running')
+
+# Seconds jobs cancelled at shutdown get to record that they were interrupted
+CANCEL_GRACE = 3
+
+class CallbackRejected(ValueError):
+    """Raised for a callbackUrl the service will not call"""
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point the callback at a host that was never checked
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def _host_allowed(host, allowed_hosts):
+    """Match a host against entries like 'hooks.example.com', '*.example.com' or '*'"""
+    host = host.lower().rstrip('.')
+    for allowed in allowed_hosts:
+        if allowed == '*' or host == allowed:
+            return True
+        if allowed.startswith('*.') and host.endswith(allowed[1:]):
+            return True
+    return False
+
+def _public_address(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+class JobStore(abc.ABC):
+    """Persistence interface for job records (plain dicts keyed by id)"""
+
+    @abc.abstractmethod
+    def save(self, job):
+        """Insert or replace a job record"""
+
+    @abc.abstractmethod
+    def get(self, job_id):
+        """The job record, or None"""
+
+    @abc.abstractmethod
+    def list_unfinished(self):
+        """Every queued or running job record"""
+
+class InMemoryJobStore(JobStore):
+    """Process-local store; jobs are lost when the worker restarts"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job['id']] = copy.deepcopy(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def list_unfinished(self):
+        with self._lock:
+            return [copy.deepcopy(job) for job in self._jobs.values() if job['status'] in UNFINISHED_STATUSES]
+
+class SQLiteJobStore(JobStore):
+    """Durable store shared by every worker, so job status survives restarts"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, type TEXT NOT NULL, status TEXT NOT NULL, '
+            'data TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+
+    def save(self, job):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, type, status, data, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job['id'], job['type'], job['status'], json.dumps(job), job['createdAt'], job['updatedAt'])
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT data FROM jobs WHERE status IN (?, ?)', UNFINISHED_STATUSES
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+def create_job_store():
+    """Build the store selected by JOB_STORE ('memory' or 'sqlite'; gunicorn.conf.py picks sqlite for several workers)"""
+    backend = (os.getenv('JOB_STORE') or 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteJobStore(os.getenv('JOB_STORE_PATH', 'jobs.sqlite3'))
+    if backend != 'memory':
+        logger.warning(f"Unknown JOB_STORE '{backend}', using in-memory job store")
+    return InMemoryJobStore()
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobManager:
+    """Runs long video generations in a bounded background worker pool"""
+
+    def __init__(self, store=None):
+        self._store = store
+        self.max_workers = max(1, int(os.getenv('JOB_WORKERS', 2)))
+        self.callback_timeout = float(os.getenv('JOB_CALLBACK_TIMEOUT', 10))
+        # Callbacks are off unless their hosts are listed; private addresses need a second opt-in
+        self.callback_hosts = [
+            host.strip().lower() for host in os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()
+        ]
+        self.callback_allow_private = os.getenv('JOB_CALLBACK_ALLOW_PRIVATE', 'False').lower() == 'true'
+        self._loop = None
+        self._slots = None
+        self._tasks = set()
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = create_job_store()
+        return self._store
+
+    @property
+    def worker_id(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    async def _call_store(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def _bind_loop(self):
+        """Per-loop setup; also fails jobs orphaned by a dead worker on this host"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._tasks = set()
+
+        hostname = socket.gethostname()
+        for job in await self._call_store(self.store.list_unfinished):
+            host, _, pid = job.get('worker', '').rpartition(':')
+            if host == hostname and pid.isdigit() and not _pid_alive(int(pid)):
+                job['status'] = 'failed'
+                job['error'] = 'Job interrupted by a worker restart'
+                job['updatedAt'] = time.time()
+                await self._call_store(self.store.save, job)
+                logger.warning(f"Marked orphaned job {job['id']} as failed")
+
+    async def submit(self, job_type, params, callback_url=None):
+        """Record a queued job and start it in the background"""
+        await self._bind_loop()
+        now = time.time()
+        job = {
+            'id': str(uuid.uuid4()),
+            'type': job_type,
+            'status': 'queued',
+            'params': params,
+            'callbackUrl': callback_url,
+            'result': None,
+            'error': None,
+            'worker': self.worker_id,
+            'createdAt': now,
+            'updatedAt': now
+        }
+        await self._call_store(self.store.save, job)
+
+        task = self._loop.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def get(self, job_id):
+        await self._bind_loop()
+        return await self._call_store(self.store.get, job_id)
+
+    async def drain(self, timeout):
+        """Wait up to timeout seconds for running jobs, e.g. before a worker exits.
+
+        Jobs still unfinished then are cancelled and marked failed while the
+        loop is alive, rather than left 'running' in the store until another
+        worker's orphan sweep notices.
+        """
+        tasks = set(self._tasks)
+        if not tasks:
+            return
+        logger.info(f"Waiting up to {timeout}s for {len(tasks)} background jobs")
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logger.warning(f"Cancelling {len(pending)} background jobs still running at shutdown")
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending, timeout=CANCEL_GRACE)
+
+    async def _update(self, job, **fields):
+        job.update(fields, updatedAt=time.time())
+        await self._call_store(self.store.save, job)
+
+    async def _run(self, job):
+        # The job outlives the request that submitted it, so it must not inherit its deadline
+        clear_deadline()
+        try:
+            async with self._slots:
+                await self._update(job, status='running', startedAt=time.time())
+                try:
+                    result = await self._execute(job['type'], job['params'])
+                    if result.get('success'):
+                        await self._update(job, status='completed', result=result)
+                    else:
+                        await self._update(job, status='failed', error=result.get('error', 'Job failed'))
+                except Exception as e:
+                    logger.error(f"Job {job['id']} error: {str(e)}")
+                    await self._update(job, status='failed', error=str(e))
+        except asyncio.CancelledError:
+            await self._update(job, status='failed', error='Job interrupted by a worker shutdown')
+            raise
+
+        if job.get('callbackUrl'):
+            await self._notify(job)
+
+    async def _execute(self, job_type, params):
+        if job_type == 'video':
+            # Jobs already wait in their own queue, so they are never rejected by admission control
+            with admission.background():
+                return await ImageService.generate_video(
+                    params['prompt'], params['model'], params['duration'], params['width'],
+                    params['height'], params['outputFormat'], params['outputQuality']
+                )
+        raise ValueError(f"Unknown job type '{job_type}'")
+
+    def check_callback_url(self, url):
+        """Raise CallbackRejected unless url is an http(s) URL on an allowed, public host (blocking: resolves DNS)"""
+        if not self.callback_hosts:
+            raise CallbackRejected('Job callbacks are disabled (set JOB_CALLBACK_ALLOWED_HOSTS to enable them)')
+        try:
+            parts = urllib.parse.urlsplit(url)
+            port = parts.port or (443 if parts.scheme == 'https' else 80)
+        except ValueError as e:
+            raise CallbackRejected(f'Invalid callbackUrl: {str(e)}') from e
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise CallbackRejected('callbackUrl must be an http(s) URL')
+        if not _host_allowed(parts.hostname, self.callback_hosts):
+            raise CallbackRejected(f"callbackUrl host '{parts.hostname}' is not allowed")
+        if self.callback_allow_private:
+            return
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)}
+        except OSError as e:
+            raise CallbackRejected(f"callbackUrl host '{parts.hostname}' does not resolve") from e
+        if not all(_public_address(address) for address in addresses):
+            raise CallbackRejected(f"callbackUrl host '{parts.hostname}' resolves to a private address")
+
+    async def _notify(self, job):
+        """POST the final job record to its callback URL"""
+        def post():
+            # Checked again at delivery, since DNS may have changed since the job was submitted
+            self.check_callback_url(job['callbackUrl'])
+            request = urllib.request.Request(
+                job['callbackUrl'],
+                data=json.dumps(job).encode(),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            with urllib.request.build_opener(_NoRedirect).open(request, timeout=self.callback_timeout) as response:
+                return response.status
+
+        try:
+            status = await asyncio.get_running_loop().run_in_executor(None, post)
+            logger.info(f"Job {job['id']} callback delivered ({status})")
+        except Exception as e:
+            logger.error(f"Job {job['id']} callback failed: {str(e)}")
+
+# Global instance
+job_manager = JobManager()
@@ -0,0 +1,208 @@
+import contextlib
+import logging
+import os
+import time
+
+from .admission import AdmissionRejected, admission, in_background
+from .metrics import metrics
+from .progress import emit
+
+logger = logging.getLogger(__name__)
+
+# Names by level; level 0 serves requests as asked
+TIER_NAMES = ('full', 'reduced', 'degraded', 'minimal')
+
+REQUESTS = metrics.counter(
+    'load_shedding_requests_total', 'Finished requests by the quality tier they were served at, or rejected',
+    ('operation', 'tier')
+)
+
+def parse_list(value, cast=float):
+    """Parse '1,2,3' into a list"""
+    return [cast(item) for item in (value or '').split(',') if item.strip()]
+
+def fit_size(width, height, max_side):
+    """Dimensions scaled down to max_side on the longest side, in Runware's multiples of 64 (min 128)"""
+    width, height = int(width), int(height)
+    if max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    return tuple(max(128, int(side * scale) // 64 * 64) for side in (width, height))
+
+class QualityTier:
+    """One rung of the degradation ladder: what it takes to reach it and what it caps"""
+
+    def __init__(self, level, utilization=None, queue_wait=None, max_steps=None, max_side=None, reject_video=False):
+        self.level = level
+        self.name = TIER_NAMES[level] if level < len(TIER_NAMES) else f'tier{level}'
+        self.utilization = utilization
+        self.queue_wait = queue_wait
+        self.max_steps = max_steps
+        self.max_side = max_side
+        self.reject_video = reject_video
+
+    def reached(self, utilization, queue_wait):
+        if self.level == 0:
+            return True
+        return utilization >= self.utilization or queue_wait >= self.queue_wait
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'utilization': self.utilization,
+            'queueWait': self.queue_wait,
+            'maxSteps': self.max_steps,
+            'maxSide': self.max_side,
+            'rejectVideo': self.reject_video
+        }
+
+class LoadShedder:
+    """Trades image quality for latency while the service is under pressure.
+
+    Before each generation it reads image utilization (active plus queued
+    admission units over the imageInference limit, or the image units it has
+    let through that have not finished yet, if more) and the image queue
+    wait, and picks the highest tier whose threshold either one crosses.
+    Degraded tiers cap steps and resolution so renders finish sooner, and
+    from LOAD_SHEDDING_REJECT_VIDEO_TIER on new videos get 503 with
+    Retry-After, since one video holds a slot for minutes. Tiers rise at once
+    and fall one level per LOAD_SHEDDING_RECOVERY_SECONDS since the load last
+    called for the current tier, so a burst does not make quality flap and an
+    idle service is back at full by its next request. Every response is
+    tagged with the tier it got.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('LOAD_SHEDDING_ENABLED', 'True').lower() == 'true'
+        self.recovery = float(os.getenv('LOAD_SHEDDING_RECOVERY_SECONDS', 3))
+        utilization = parse_list(os.getenv('LOAD_SHEDDING_UTILIZATION', '0.75,1.0,1.5'))
+        queue_wait = parse_list(os.getenv('LOAD_SHEDDING_QUEUE_WAIT', '0.5,2,5'))
+        max_steps = parse_list(os.getenv('LOAD_SHEDDING_MAX_STEPS', '20,12,6'), int)
+        max_side = parse_list(os.getenv('LOAD_SHEDDING_MAX_SIDE', '1536,1024,768'), int)
+        reject_video = int(os.getenv('LOAD_SHEDDING_REJECT_VIDEO_TIER', 2))
+        if not len(utilization) == len(queue_wait) == len(max_steps) == len(max_side):
+            raise ValueError('LOAD_SHEDDING_UTILIZATION, _QUEUE_WAIT, _MAX_STEPS and _MAX_SIDE need one value per tier')
+        self.tiers = [QualityTier(0)] + [
+            QualityTier(level, *limits, reject_video=0 < reject_video <= level)
+            for level, limits in enumerate(zip(utilization, queue_wait, max_steps, max_side), start=1)
+        ]
+        self.current = self.tiers[0]
+        # Last time the load reached the current tier; recovery counts from here
+        self._held_at = time.monotonic()
+        self._signals = (0.0, 0.0)
+        self._in_flight = 0
+        self.transitions = 0
+        self.served = 0
+        self.degraded = 0
+        self.rejected_videos = 0
+
+    def stats(self):
+        """Current tier, the load signals behind it (as of the last request) and the tier ladder for /health"""
+        utilization, queue_wait = self._signals
+        return {
+            'enabled': self.enabled,
+            'tier': self.current.name,
+            'level': self.current.level,
+            'utilization': round(utilization, 4),
+            'queueWait': round(queue_wait, 4),
+            'inFlight': self._in_flight,
+            'transitions': self.transitions,
+            'served': self.served,
+            'degraded': self.degraded,
+            'rejectedVideos': self.rejected_videos,
+            'tiers': [tier.stats() for tier in self.tiers[1:]]
+        }
+
+    def select(self):
+        """Re-evaluate the load and return the tier new work runs at"""
+        if not self.enabled:
+            return self.tiers[0]
+        utilization, queue_wait = admission.pressure('imageInference')
+        # A burst picks its tiers before any of it reaches admission, so count it here as well
+        limit = admission.operation_limits.get('imageInference', 0)
+        if limit:
+            utilization = max(utilization, self._in_flight / limit)
+        self._signals = (utilization, queue_wait)
+        target = max(tier.level for tier in self.tiers if tier.reached(*self._signals))
+        now = time.monotonic()
+        if target >= self.current.level:
+            if target > self.current.level:
+                self._move(target)
+            self._held_at = now
+        else:
+            # One level per recovery period, however long the service sat idle in between
+            recovered = int((now - self._held_at) // self.recovery) if self.recovery > 0 else self.current.level
+            level = max(target, self.current.level - recovered)
+            if level < self.current.level:
+                self._move(level)
+                self._held_at = now
+        return self.current
+
+    def _move(self, level):
+        utilization, queue_wait = self._signals
+        logger.warning(
+            f"Load shedding tier {self.current.name} -> {self.tiers[level].name} "
+            f"(utilization {utilization:.2f}, queue wait {queue_wait:.2f}s)"
+        )
+        self.current = self.tiers[level]
+        self.transitions += 1
+
+    def image(self, width, height, steps):
+        """(tier, width, height, steps, requested) to render an image request at under the current load.
+
+        requested holds the original parameters when the tier lowered them, else None.
+        """
+        tier = self.select()
+        if not tier.level:
+            return tier, width, height, steps, None
+        capped_width, capped_height = fit_size(width, height, tier.max_side)
+        capped_steps = min(int(steps), tier.max_steps)
+        if (capped_width, capped_height, capped_steps) == (int(width), int(height), int(steps)):
+            return tier, width, height, steps, None
+        emit('degraded', tier=tier.name, width=capped_width, height=capped_height, steps=capped_steps)
+        return tier, capped_width, capped_height, capped_steps, {'width': width, 'height': height, 'steps': steps}
+
+    @contextlib.contextmanager
+    def hold(self, units):
+        """Count image work from its tier decision until it finishes"""
+        self._in_flight += units
+        try:
+            yield
+        finally:
+            self._in_flight -= units
+
+    def video(self):
+        """The tier a video runs at; raises AdmissionRejected while videos are being shed"""
+        tier = self.select()
+        # Background jobs already wait in their own queue instead of being turned away
+        if tier.reject_video and not in_background():
+            self.rejected_videos += 1
+            REQUESTS.inc('videoInference', 'rejected')
+            raise AdmissionRejected(
+                f'Service is under heavy load ({tier.name}), video generation is paused', 503,
+                admission.retry_after('videoInference')
+            )
+        return tier
+
+    def finish(self, operation, result, tier, requested=None):
+        """Count a finished request at its tier and tag its response"""
+        self.served += 1
+        REQUESTS.inc(operation, tier.name)
+        if not result.get('success') or 'metadata' not in result:
+            return result
+        if requested is not None:
+            # Counted only once the work was admitted and done, unlike the decision to degrade
+            self.degraded += 1
+        return tag(result, tier, requested)
+
+def tag(result, tier, requested=None):
+    """Copy of a response with its quality tier (and the parameters asked for, if degraded) in metadata"""
+    if not result.get('success') or 'metadata' not in result:
+        return result
+    metadata = {**result['metadata'], 'qualityTier': tier.name}
+    if requested is not None:
+        metadata['requested'] = requested
+    return {**result, 'metadata': metadata}
+
+# Global instance
+load_shedder = LoadShedder()
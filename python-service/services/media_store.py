@@ -0,0 +1,274 @@
+import concurrent.futures
+import hashlib
+import logging
+import mimetypes
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Derived WebP renditions of cached images: name -> longest side in pixels
+VARIANT_SIZES = {
+    'thumbnail': int(os.getenv('MEDIA_THUMBNAIL_SIZE', 256)),
+    'preview': int(os.getenv('MEDIA_PREVIEW_SIZE', 1024))
+}
+
+# Access times are only rewritten when older than this, so reads rarely write
+ACCESS_RESOLUTION = 60
+
+# Read size while streaming a download to disk
+CHUNK_SIZE = 256 * 1024
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS media ('
+    'uuid TEXT PRIMARY KEY, source_url TEXT NOT NULL, digest TEXT, created_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS media_digest ON media (digest)',
+    'CREATE TABLE IF NOT EXISTS objects ('
+    'digest TEXT PRIMARY KEY, content_type TEXT NOT NULL, size INTEGER NOT NULL, '
+    'variants TEXT NOT NULL, bytes INTEGER NOT NULL, accessed_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS objects_accessed ON objects (accessed_at)'
+)
+
+class MediaTooLarge(Exception):
+    """A download exceeded the per-object size limit"""
+
+class MediaStore:
+    """Content-addressed on-disk cache of generated media with WebP renditions.
+
+    submit() records where a result lives and hands the download to a small
+    thread pool, so results are returned without waiting for it. Each file is
+    stored once under its SHA-256, with thumbnail and preview WebPs for
+    images, and the least recently served objects are evicted once the store
+    grows past MEDIA_CACHE_MAX_BYTES. Until a download lands, lookups return
+    the upstream URL so callers can redirect to it.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('MEDIA_CACHE_ENABLED', 'True').lower() == 'true'
+        self.root = os.getenv('MEDIA_CACHE_DIR', 'media_cache')
+        self.max_bytes = int(os.getenv('MEDIA_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+        self.max_object_bytes = int(os.getenv('MEDIA_MAX_OBJECT_BYTES', 200 * 1024 * 1024))
+        self.download_timeout = float(os.getenv('MEDIA_DOWNLOAD_TIMEOUT', 60))
+        self.webp_quality = int(os.getenv('MEDIA_WEBP_QUALITY', 80))
+        self.workers = max(1, int(os.getenv('MEDIA_DOWNLOAD_WORKERS', 4)))
+        # Guards the index; download threads hold it across SQLite writes and eviction
+        self._lock = threading.Lock()
+        # Guards only _pending and the executor, so submit() on the event loop never waits on disk
+        self._pending_lock = threading.Lock()
+        self._conn = None
+        self._executor = None
+        self._pid = None
+        self._pending = set()
+        self.bytes = 0
+        self.downloads = 0
+        self.download_bytes = 0
+        self.failures = 0
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Download, hit and eviction counters plus disk usage (as of the last download) for /health"""
+        return {
+            'enabled': self.enabled,
+            'bytes': self.bytes,
+            'maxBytes': self.max_bytes,
+            'pending': len(self._pending),
+            'downloads': self.downloads,
+            'downloadBytes': self.download_bytes,
+            'failures': self.failures,
+            'evictions': self.evictions,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    @property
+    def conn(self):
+        """Index connection, opened (and the store directory created) on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    @property
+    def executor(self):
+        # A forked worker inherits the executor object but none of its threads
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix='media-download')
+            self._pending = set()
+            self._pid = os.getpid()
+        return self._executor
+
+    def path(self, digest, variant=None):
+        name = digest if variant is None else f'{digest}.{variant}.webp'
+        return os.path.join(self.root, 'objects', digest[:2], name)
+
+    def submit(self, uuid, url):
+        """Remember a result's upstream URL and download it in the background"""
+        if not self.enabled or not uuid or not url:
+            return
+        self._schedule(uuid, url)
+
+    def _schedule(self, uuid, url):
+        with self._pending_lock:
+            executor = self.executor
+            if uuid in self._pending:
+                return
+            self._pending.add(uuid)
+        executor.submit(self._fetch, uuid, url)
+
+    def _fetch(self, uuid, url):
+        try:
+            with self._lock:
+                self.conn.execute(
+                    'INSERT OR IGNORE INTO media (uuid, source_url, created_at) VALUES (?, ?, ?)',
+                    (uuid, url, time.time())
+                )
+            digest, content_type, size = self._download(url)
+            variants = self._render_variants(digest, content_type)
+            total = size + sum(os.path.getsize(self.path(digest, variant)) for variant in variants)
+            with self._lock:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO objects (digest, content_type, size, variants, bytes, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (digest, content_type, size, ','.join(variants), total, time.time())
+                )
+                self.conn.execute('UPDATE media SET digest = ? WHERE uuid = ?', (digest, uuid))
+                self.downloads += 1
+                self.download_bytes += size
+            self._evict(keep=digest)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Media download failed for {uuid}: {str(e)}")
+        finally:
+            with self._pending_lock:
+                self._pending.discard(uuid)
+
+    def _download(self, url):
+        """Stream a URL to a temp file while hashing it, then move it under its digest"""
+        hasher = hashlib.sha256()
+        size = 0
+        objects = os.path.join(self.root, 'objects')
+        with urllib.request.urlopen(url, timeout=self.download_timeout) as response:
+            content_type = response.headers.get_content_type()
+            if content_type in ('application/octet-stream', 'text/plain'):
+                content_type = mimetypes.guess_type(url)[0] or content_type
+            with tempfile.NamedTemporaryFile(dir=objects, delete=False) as temp:
+                try:
+                    while chunk := response.read(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_object_bytes:
+                            raise MediaTooLarge(f"Larger than {self.max_object_bytes} bytes")
+                        hasher.update(chunk)
+                        temp.write(chunk)
+                except BaseException:
+                    temp.close()
+                    os.unlink(temp.name)
+                    raise
+
+        digest = hasher.hexdigest()
+        target = self.path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Atomic, and identical content from another worker simply replaces itself
+        os.replace(temp.name, target)
+        return digest, content_type, size
+
+    def _render_variants(self, digest, content_type):
+        """Write WebP renditions for images; returns the variant names written"""
+        if not content_type.startswith('image/'):
+            return []
+        written = []
+        with Image.open(self.path(digest)) as source:
+            source.load()
+            for variant, longest_side in VARIANT_SIZES.items():
+                image = source.copy()
+                image.thumbnail((longest_side, longest_side))
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+                target = self.path(digest, variant)
+                temp = f'{target}.{os.getpid()}.tmp'
+                image.save(temp, 'WEBP', quality=self.webp_quality)
+                os.replace(temp, target)
+                written.append(variant)
+        return written
+
+    def _evict(self, keep):
+        """Drop least recently served objects, never keep, until the store fits in max_bytes"""
+        with self._lock:
+            used = self.bytes = self.conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM objects').fetchone()[0]
+            if used <= self.max_bytes:
+                return
+            victims = []
+            for digest, variants, total in self.conn.execute(
+                'SELECT digest, variants, bytes FROM objects WHERE digest != ? ORDER BY accessed_at', (keep,)
+            ):
+                if used <= self.max_bytes:
+                    break
+                victims.append((digest, variants))
+                used -= total
+            for digest, _ in victims:
+                self.conn.execute('DELETE FROM objects WHERE digest = ?', (digest,))
+                self.conn.execute('UPDATE media SET digest = NULL WHERE digest = ?', (digest,))
+            self.bytes = used
+            self.evictions += len(victims)
+
+        for digest, variants in victims:
+            for variant in [None, *filter(None, variants.split(','))]:
+                try:
+                    os.unlink(self.path(digest, variant))
+                except FileNotFoundError:
+                    pass
+        logger.info(f"Evicted {len(victims)} cached media objects")
+
+    def lookup(self, uuid, variant=None):
+        """Where to serve a result from, as a dict with either 'path' or 'url'; None if unknown"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT media.source_url, objects.digest, objects.content_type, objects.variants, objects.accessed_at '
+                'FROM media LEFT JOIN objects ON objects.digest = media.digest WHERE media.uuid = ?',
+                (uuid,)
+            ).fetchone()
+            if row is None:
+                return None
+            source_url, digest, content_type, variants, accessed_at = row
+            if digest is not None and variant is not None and not content_type.startswith('image/'):
+                # Videos have no renditions
+                return None
+            missing = digest is None or (variant is not None and variant not in variants.split(','))
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if time.time() - accessed_at > ACCESS_RESOLUTION:
+                    self.conn.execute('UPDATE objects SET accessed_at = ? WHERE digest = ?', (time.time(), digest))
+
+        if missing:
+            if digest is None:
+                # Evicted, or a download lost to a restart: fetch it again for next time
+                self._schedule(uuid, source_url)
+            return {'url': source_url}
+
+        if variant is not None:
+            return {'path': self.path(digest, variant), 'mimetype': 'image/webp', 'etag': f'{digest}-{variant}'}
+        return {'path': self.path(digest), 'mimetype': content_type, 'etag': digest}
+
+    def close(self):
+        """Stop accepting downloads; queued ones are dropped and refetched on demand"""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Global instance
+media_store = MediaStore()
@@ -0,0 +1,217 @@
+import contextlib
+import os
+import re
+import threading
+import time
+
+# Seconds; spans cache hits through long video generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Models reported by name in metric labels; any other model string a client sends is reported as 'other'
+METRICS_MODELS = frozenset(
+    model.strip() for model in os.getenv(
+        'METRICS_MODELS', 'runware:101@1,runware:100@1,civitai:102438@133677,klingai:5@3,bytedance:1@1'
+    ).split(',') if model.strip()
+)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base for labelled metrics; one series per distinct label tuple"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple(str(label) for label in labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, value in series:
+            lines.extend(self._render_series(labels, value))
+        return lines
+
+    def _render_series(self, labels, value):
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}']
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextlib.contextmanager
+    def track(self, *labels):
+        """Count the enclosed block as in flight"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        """Observe the duration of the enclosed block on the monotonic clock"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def _render_series(self, labels, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series['counts']):
+            cumulative += count
+            bucket_labels = _format_labels(self.label_names, labels, [('le', _format_value(bound))])
+            lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+        plain = _format_labels(self.label_names, labels)
+        lines.append(f'{self.name}_sum{plain} {_format_value(series["sum"])}')
+        lines.append(f'{self.name}_count{plain} {series["count"]}')
+        return lines
+
+def model_label(model):
+    """The model as a metric label, so client-supplied strings cannot create unbounded series"""
+    if not model:
+        return ''
+    return model if model in METRICS_MODELS else 'other'
+
+def _snake_case(name):
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, prefix, stats):
+        """Export a component's numeric stats() values as gauges at scrape time"""
+        self._collectors.append((prefix, stats))
+
+    def _collect(self):
+        lines = []
+        for prefix, stats in self._collectors:
+            for key, value in stats().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f'{prefix}_{_snake_case(key)}'
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {_format_value(value)}')
+        return lines
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.extend(self._collect())
+        return '\n'.join(lines) + '\n'
+
+# Global instance
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    'runware_stage_duration_seconds',
+    'Time spent per request stage (preprocess, admission_wait, connect, queue_wait, upstream, response_build)',
+    ('operation', 'model', 'stage')
+)
+UPSTREAM_IN_FLIGHT = metrics.gauge(
+    'runware_upstream_in_flight', 'Runware tasks currently awaiting a response', ('operation',)
+)
+UPSTREAM_ERRORS = metrics.counter(
+    'runware_upstream_errors_total', 'Failed Runware calls by exception type', ('operation', 'type')
+)
+SERVICE_ERRORS = metrics.counter(
+    'image_service_errors_total', 'Operations that returned an error, by exception type', ('operation', 'type')
+)
+HTTP_REQUESTS = metrics.counter(
+    'http_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status')
+)
+HTTP_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'End-to-end request handling time', ('endpoint', 'method')
+)
+HTTP_IN_FLIGHT = metrics.gauge(
+    'http_requests_in_flight', 'Requests currently being handled', ('endpoint',)
+)
+HTTP_REQUEST_BYTES = metrics.counter(
+    'http_request_bytes_total', 'Request body bytes received', ('endpoint',)
+)
+HTTP_RESPONSE_BYTES = metrics.counter(
+    'http_response_bytes_total', 'Response body bytes sent', ('endpoint',)
+)
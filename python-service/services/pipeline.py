@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import time
+
+from .admission import AdmissionRejected
+from .image_service import ImageService, parse_scale_factor
+from .preprocess import ImageRejected
+
+logger = logging.getLogger(__name__)
+
+MAX_STEPS = int(os.getenv('PIPELINE_MAX_STEPS', 10))
+
+class PipelineError(ValueError):
+    """Raised for an invalid pipeline definition"""
+
+def _generate_image(image, params):
+    return ImageService.generate_image(
+        params.get('prompt', ''),
+        params.get('model', 'runware:101@1'),
+        params.get('width', 1024),
+        params.get('height', 1024),
+        params.get('steps', 20),
+        params.get('cfgScale', 7),
+        params.get('seed')
+    )
+
+def _remove_background(image, params):
+    return ImageService.remove_background(image)
+
+def _upscale_image(image, params):
+    return ImageService.upscale_image(image, params['scaleFactor'])
+
+def _caption_image(image, params):
+    return ImageService.caption_image(image)
+
+# op name -> (runner, needs an input image, produces an output image)
+OPERATIONS = {
+    'generateImage': (_generate_image, False, True),
+    'removeBackground': (_remove_background, True, True),
+    'upscaleImage': (_upscale_image, True, True),
+    'captionImage': (_caption_image, True, False),
+}
+
+class PipelineService:
+    @staticmethod
+    def parse_steps(steps, initial_image=None):
+        """Validate steps and resolve each step's input to an earlier step id (or the request image).
+
+        A step without an explicit 'input' reads the output of the step before it,
+        so a plain list runs as a chain; naming an earlier step starts a branch.
+        """
+        if not isinstance(steps, list) or not steps:
+            raise PipelineError('steps must be a non-empty list')
+        if len(steps) > MAX_STEPS:
+            raise PipelineError(f'A pipeline can have at most {MAX_STEPS} steps')
+        if initial_image is not None and not isinstance(initial_image, str):
+            raise PipelineError("'image' must be a base64 string, an image URL or an image UUID")
+
+        parsed = []
+        produces_image = {}
+        for index, step in enumerate(steps):
+            if not isinstance(step, dict):
+                raise PipelineError(f'Step {index} must be an object')
+
+            step_id = str(step.get('id', f'step{index + 1}'))
+            op = step.get('op')
+            if step_id in produces_image:
+                raise PipelineError(f"Duplicate step id '{step_id}'")
+            if op not in OPERATIONS:
+                raise PipelineError(f"Step '{step_id}' has unknown op '{op}'")
+
+            _, needs_input, produces = OPERATIONS[op]
+            source = None
+            if needs_input:
+                source = step.get('input')
+                if source is None:
+                    source = parsed[-1]['id'] if parsed else None
+                if source is None:
+                    if not initial_image:
+                        raise PipelineError(f"Step '{step_id}' needs an input image")
+                elif source not in produces_image:
+                    raise PipelineError(f"Step '{step_id}' input '{source}' must name an earlier step")
+                elif not produces_image[source]:
+                    raise PipelineError(f"Step '{step_id}' input '{source}' does not produce an image")
+
+            params = step.get('params') or {}
+            if not isinstance(params, dict):
+                raise PipelineError(f"Step '{step_id}' params must be an object")
+            if op == 'upscaleImage':
+                try:
+                    params = {**params, 'scaleFactor': parse_scale_factor(params.get('scaleFactor', 2))}
+                except ValueError as e:
+                    raise PipelineError(f"Step '{step_id}': {str(e)}") from e
+
+            parsed.append({'id': step_id, 'op': op, 'input': source, 'params': params})
+            produces_image[step_id] = produces
+        return parsed
+
+    @staticmethod
+    async def run(steps, initial_image=None):
+        """Run every step as soon as its input is ready; independent branches run concurrently"""
+        parsed = PipelineService.parse_steps(steps, initial_image)
+        pipeline_start = time.perf_counter()
+        tasks = {}
+        reports = {}
+
+        async def run_step(step):
+            report = {'id': step['id'], 'op': step['op'], 'input': step['input']}
+            reports[step['id']] = report
+
+            image = initial_image
+            if step['input'] is not None:
+                upstream = await tasks[step['input']]
+                if upstream is None:
+                    report['status'] = 'skipped'
+                    report['error'] = f"Input step '{step['input']}' failed"
+                    return None
+                image = upstream
+
+            runner = OPERATIONS[step['op']][0]
+            started = time.perf_counter()
+            try:
+                result = await runner(image, step['params'])
+            except AdmissionRejected as e:
+                result = {'success': False, 'error': str(e), 'retryAfter': e.retry_after}
+            except ImageRejected as e:
+                result = {'success': False, 'error': str(e)}
+            except Exception as e:
+                # Fail only this step; raising would abandon sibling steps still running upstream
+                logger.error(f"Pipeline step '{step['id']}' error: {str(e)}")
+                result = {'success': False, 'error': str(e)}
+            finished = time.perf_counter()
+
+            report['startedAtMs'] = round((started - pipeline_start) * 1000, 1)
+            report['durationMs'] = round((finished - started) * 1000, 1)
+            report['status'] = 'completed' if result.get('success') else 'failed'
+            report['result'] = result
+            if not result.get('success'):
+                report['error'] = result.get('error')
+                return None
+
+            # Pass the uuid downstream so the image never leaves Runware
+            output = result.get('image') or {}
+            return output.get('uuid') or output.get('url')
+
+        for step in parsed:
+            tasks[step['id']] = asyncio.ensure_future(run_step(step))
+        await asyncio.gather(*tasks.values())
+
+        ordered = [reports[step['id']] for step in parsed]
+        total_time = time.perf_counter() - pipeline_start
+        logger.info(f"Pipeline of {len(parsed)} steps finished in {total_time:.2f}s")
+        return {
+            'success': all(report['status'] == 'completed' for report in ordered),
+            'steps': ordered,
+            'metadata': {
+                'timestamp': time.time(),
+                'processingTime': round(total_time, 2)
+            }
+        }
@@ -0,0 +1,201 @@
+import base64
+import binascii
+import io
+import logging
+import os
+import time
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from utils.uploads import ImageFile, ImageRejected, is_image_reference, to_data_uri
+
+from .event_loop import run_blocking
+from .metrics import STAGE_SECONDS, metrics
+
+logger = logging.getLogger(__name__)
+
+# Largest input accepted at all, checked from the header before decoding pixels
+MAX_INPUT_PIXELS = int(os.getenv('PREPROCESS_MAX_INPUT_PIXELS', 50_000_000))
+
+# Upscale inputs are capped so the output stays within this longest side
+UPSCALE_MAX_OUTPUT_SIDE = int(os.getenv('PREPROCESS_UPSCALE_MAX_OUTPUT_SIDE', 4096))
+
+# operation -> (longest input side Runware needs, encoding sent upstream)
+OPERATIONS = {
+    'imageCaption': (int(os.getenv('PREPROCESS_CAPTION_MAX_SIDE', 1024)), 'WEBP'),
+    'imageBackgroundRemoval': (int(os.getenv('PREPROCESS_BACKGROUND_MAX_SIDE', 2048)), 'WEBP'),
+    # Lossless, since compression artifacts would be upscaled too
+    'imageUpscale': (UPSCALE_MAX_OUTPUT_SIDE, 'PNG'),
+    # One registered copy feeds every tool, so keep up to the largest side an upscale accepts
+    'imageUpload': (UPSCALE_MAX_OUTPUT_SIDE, 'WEBP'),
+}
+
+MIMETYPES = {'WEBP': 'image/webp', 'PNG': 'image/png'}
+
+# Source formats sent as-is when they already fit, per target encoding (never lossy to lossless)
+PASSTHROUGH_FORMATS = {'WEBP': ('JPEG', 'WEBP'), 'PNG': ('PNG', 'JPEG', 'WEBP')}
+
+# The registered copy is shared by every tool, upscales included, so any input that fits is kept as sent
+UPLOAD_PASSTHROUGH_FORMATS = ('PNG', 'JPEG', 'WEBP')
+
+# Image.info keys that carry metadata rather than pixels; the ICC profile is kept for color
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+INPUT_BYTES = metrics.counter(
+    'preprocess_input_bytes_total', 'Decoded input image bytes received by the tools', ('operation',)
+)
+OUTPUT_BYTES = metrics.counter(
+    'preprocess_output_bytes_total', 'Image bytes sent upstream after preprocessing', ('operation',)
+)
+REJECTED = metrics.counter(
+    'preprocess_rejected_total', 'Input images rejected before reaching Runware', ('operation', 'reason')
+)
+
+def decode_data(image_data):
+    """Raw bytes of a base64 image or data URI; raises ImageRejected when malformed"""
+    payload = image_data.split(',', 1)[1] if image_data.startswith('data:') else image_data
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ImageRejected('Image data is not valid base64') from e
+
+class Preprocessor:
+    """Right-sizes tool inputs before they are registered or sent to Runware.
+
+    Each image is decoded once, validated, rotated upright, stripped of
+    EXIF/XMP metadata, downsampled to the longest side its operation needs
+    (captioning does not need 12 MP, and an upscale output is capped at
+    PREPROCESS_UPSCALE_MAX_OUTPUT_SIDE) and re-encoded compactly. Inputs that
+    are already small, clean and compact are passed through untouched. UUIDs
+    and URLs are left to Runware. Input is base64 data or an ImageFile;
+    prepare() returns a string to send inline and prepare_file() an
+    ImageFile to upload.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('PREPROCESS_ENABLED', 'True').lower() == 'true'
+        self.webp_quality = int(os.getenv('PREPROCESS_WEBP_QUALITY', 90))
+        self.processed = 0
+        self.resized = 0
+        self.passed_through = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def stats(self):
+        """Image and byte counters for /health"""
+        return {
+            'enabled': self.enabled,
+            'processed': self.processed,
+            'resized': self.resized,
+            'passedThrough': self.passed_through,
+            'rejected': self.rejected,
+            'bytesIn': self.bytes_in,
+            'bytesOut': self.bytes_out,
+            'bytesSaved': self.bytes_in - self.bytes_out
+        }
+
+    def max_side(self, operation, scale_factor=1):
+        max_side, _ = OPERATIONS[operation]
+        return max(1, max_side // max(1, scale_factor))
+
+    async def prepare(self, operation, image_data, scale_factor=1):
+        """Image data to send inline for operation, resized and re-encoded off the event loop"""
+        if is_image_reference(image_data):
+            return image_data
+        if not self.enabled or operation not in OPERATIONS:
+            return await run_blocking(to_data_uri, image_data) if isinstance(image_data, ImageFile) else image_data
+        return await self._run(operation, image_data, scale_factor, as_file=False)
+
+    async def prepare_file(self, operation, image_data):
+        """ImageFile to upload for operation; image_data itself when it is a file that needs no changes"""
+        if not self.enabled or operation not in OPERATIONS:
+            return image_data if isinstance(image_data, ImageFile) else await run_blocking(ImageFile.from_data, image_data)
+        return await self._run(operation, image_data, 1, as_file=True)
+
+    async def _run(self, operation, image_data, scale_factor, as_file):
+        start = time.perf_counter()
+        try:
+            prepared = await run_blocking(self._prepare, operation, image_data, scale_factor, as_file)
+        except ImageRejected as e:
+            self.rejected += 1
+            REJECTED.inc(operation, 'too_large' if e.status_code == 413 else 'invalid')
+            raise
+        STAGE_SECONDS.observe(operation, '', 'preprocess', value=time.perf_counter() - start)
+        return prepared
+
+    def _prepare(self, operation, image_data, scale_factor, as_file):
+        if isinstance(image_data, ImageFile):
+            source_file, size_in = open(image_data.path, 'rb'), image_data.size
+        else:
+            raw = decode_data(image_data)
+            source_file, size_in = io.BytesIO(raw), len(raw)
+        max_side = self.max_side(operation, scale_factor)
+        _, encoding = OPERATIONS[operation]
+
+        try:
+            with source_file, Image.open(source_file) as source:
+                width, height = source.size
+                if width * height > MAX_INPUT_PIXELS:
+                    raise ImageRejected(
+                        f'Image is {width}x{height}; at most {MAX_INPUT_PIXELS} pixels are accepted', 413
+                    )
+                has_metadata = any(key in source.info for key in METADATA_KEYS)
+                fits = max(width, height) <= max_side
+                passthrough = UPLOAD_PASSTHROUGH_FORMATS if operation == 'imageUpload' else PASSTHROUGH_FORMATS[encoding]
+                if fits and not has_metadata and source.format in passthrough:
+                    # Already fine as sent; re-encoding would only cost time
+                    self._count(operation, size_in, size_in, resized=False, passed=True)
+                    return self._unchanged(image_data, as_file)
+
+                image = ImageOps.exif_transpose(source)
+                image.load()
+                icc_profile = source.info.get('icc_profile')
+        except ImageRejected:
+            raise
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+            raise ImageRejected(f'Invalid image: {str(e)}') from e
+
+        if not fits:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        output = io.BytesIO()
+        options = {'icc_profile': icc_profile} if icc_profile else {}
+        if encoding == 'WEBP':
+            options['quality'] = self.webp_quality
+        else:
+            options['optimize'] = True
+        image.save(output, encoding, **options)
+        encoded = output.getvalue()
+        if fits and not has_metadata and len(encoded) >= size_in:
+            self._count(operation, size_in, size_in, resized=False, passed=True)
+            return self._unchanged(image_data, as_file)
+
+        self._count(operation, size_in, len(encoded), resized=not fits, passed=False)
+        logger.info(
+            f"Preprocessed {operation} input {width}x{height} ({size_in} bytes) "
+            f"to {image.width}x{image.height} {encoding} ({len(encoded)} bytes)"
+        )
+        if as_file:
+            return ImageFile.from_chunks([encoded], MIMETYPES[encoding])
+        return f"data:{MIMETYPES[encoding]};base64,{base64.b64encode(encoded).decode('ascii')}"
+
+    def _unchanged(self, image_data, as_file):
+        """image_data in the form the caller asked for, when preprocessing leaves it as sent"""
+        if as_file:
+            return image_data if isinstance(image_data, ImageFile) else ImageFile.from_data(image_data)
+        return to_data_uri(image_data)
+
+    def _count(self, operation, bytes_in, bytes_out, resized, passed):
+        self.processed += 1
+        self.resized += int(resized)
+        self.passed_through += int(passed)
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        INPUT_BYTES.inc(operation, amount=bytes_in)
+        OUTPUT_BYTES.inc(operation, amount=bytes_out)
+
+# Global instance
+preprocessor = Preprocessor()
@@ -0,0 +1,24 @@
+import contextlib
+import contextvars
+
+# Callback receiving (event, fields) for the operation running in this context
+_listener = contextvars.ContextVar('progress_listener', default=None)
+
+def emit(event, **fields):
+    """Report a progress event to whoever is streaming the current request, if anyone"""
+    listener = _listener.get()
+    if listener is not None:
+        listener(event, fields)
+
+def current_listener():
+    """The listener emit() would reach from here, or None"""
+    return _listener.get()
+
+@contextlib.contextmanager
+def listen(listener):
+    """Route emit() calls made by work started inside this block to listener"""
+    token = _listener.set(listener)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from collections import deque
+
+from runware.utils import RunwareAPIError
+from websockets.exceptions import WebSocketException
+
+from .deadlines import DeadlineExceeded, current_deadline
+from .metrics import metrics
+from .progress import emit
+
+logger = logging.getLogger(__name__)
+
+# Runware error codes that describe the request itself; retrying cannot help
+CLIENT_ERROR_PREFIXES = ('invalid', 'unsupported', 'missing', 'insufficient')
+
+# Successful attempt durations kept per operation for the hedging delay
+LATENCY_WINDOW = 200
+
+# Samples needed before the hedging percentile is trusted
+MIN_HEDGE_SAMPLES = 20
+
+RETRIES = metrics.counter(
+    'runware_retries_total', 'Upstream attempts retried after a transient error', ('operation', 'type')
+)
+HEDGES = metrics.counter(
+    'runware_hedged_requests_total', 'Hedged calls answered, by which attempt finished first', ('operation', 'winner')
+)
+BREAKER_OPEN = metrics.gauge(
+    'runware_circuit_open', '1 while the operation\'s circuit breaker fails fast', ('operation',)
+)
+
+def _operations(value):
+    return {item.strip() for item in (value or '').split(',') if item.strip()}
+
+def is_retryable(error):
+    """True for errors a later attempt may not hit: dropped sockets, timeouts, upstream faults"""
+    if isinstance(error, (CircuitOpen, DeadlineExceeded)):
+        return False
+    if isinstance(error, RunwareAPIError):
+        code = str(error.code or '')
+        return not code.startswith(CLIENT_ERROR_PREFIXES)
+    if isinstance(error, (ConnectionError, TimeoutError, OSError, RuntimeError, WebSocketException)):
+        return True
+    # The SDK reports a missing response as a bare Exception
+    return type(error) is Exception
+
+class CircuitOpen(Exception):
+    """Raised instead of calling Runware while an operation's breaker is open"""
+
+    def __init__(self, operation, retry_after):
+        super().__init__(f"Runware {operation} is unavailable (circuit open), retry in {retry_after}s")
+        self.operation = operation
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one operation.
+
+    After failure_threshold transient failures in a row the breaker opens and
+    calls fail fast for reset_timeout seconds. It then lets a single probe
+    through (half open): success closes it, failure opens it again.
+    """
+
+    def __init__(self, operation, failure_threshold, reset_timeout):
+        self.operation = operation
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._opened_at + self.reset_timeout - time.monotonic()))
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go upstream now"""
+        if self.failure_threshold <= 0 or self.state == 'closed':
+            return
+        if self.state == 'open':
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpen(self.operation, self._retry_after())
+            self.state = 'half_open'
+            logger.info(f"Circuit for {self.operation} half open, probing Runware")
+        if self._probing:
+            raise CircuitOpen(self.operation, 1)
+        self._probing = True
+
+    def record(self, error=None):
+        """Account for a finished call; errors that are not transient leave the state alone"""
+        self._probing = False
+        if error is None:
+            if self.state != 'closed':
+                logger.info(f"Circuit for {self.operation} closed")
+                BREAKER_OPEN.set(self.operation, value=0)
+            self.state = 'closed'
+            self.failures = 0
+        elif is_retryable(error):
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self._open()
+
+    def abandon(self):
+        """A cancelled call says nothing about upstream health; just free the probe"""
+        self._probing = False
+
+    def _open(self):
+        if self.state != 'open':
+            self.opened += 1
+            logger.warning(f"Circuit for {self.operation} opened after {self.failures} failures")
+        self.state = 'open'
+        self._opened_at = time.monotonic()
+        BREAKER_OPEN.set(self.operation, value=1)
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutiveFailures': self.failures,
+            'timesOpened': self.opened,
+            'retryAfter': self._retry_after() if self.state == 'open' else 0
+        }
+
+class ResiliencePolicy:
+    """Retry, hedging and circuit breaking around single Runware calls.
+
+    Transient failures are retried with full-jitter exponential backoff, never
+    past the request deadline. Short operations listed in
+    RUNWARE_HEDGE_OPERATIONS start a second attempt once the first has run
+    longer than the recent p95, taking whichever finishes first. A breaker per
+    operation fails fast while Runware keeps failing, instead of sending every
+    request into another doomed connect.
+    """
+
+    def __init__(self):
+        self.retry_attempts = int(os.getenv('RUNWARE_RETRY_ATTEMPTS', 2))
+        self.retry_backoff = float(os.getenv('RUNWARE_RETRY_BACKOFF', 0.25))
+        self.retry_backoff_max = float(os.getenv('RUNWARE_RETRY_BACKOFF_MAX', 4))
+        # Long or costly tasks are not retried by default
+        self.no_retry = _operations(os.getenv('RUNWARE_RETRY_EXCLUDE', 'videoInference'))
+        self.hedge_operations = _operations(os.getenv('RUNWARE_HEDGE_OPERATIONS', 'imageCaption'))
+        self.hedge_percentile = float(os.getenv('RUNWARE_HEDGE_PERCENTILE', 0.95))
+        self.hedge_min_delay = float(os.getenv('RUNWARE_HEDGE_MIN_DELAY', 0.5))
+        self.hedge_max_ratio = float(os.getenv('RUNWARE_HEDGE_MAX_RATIO', 0.1))
+        self.breaker_failures = int(os.getenv('RUNWARE_BREAKER_FAILURES', 5))
+        self.breaker_reset = float(os.getenv('RUNWARE_BREAKER_RESET', 30))
+        self._breakers = {}
+        self._latencies = {}
+        self._calls = {}
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def stats(self):
+        """Retry and hedge counters plus breaker state per operation for /health"""
+        return {
+            'retries': self.retries,
+            'hedged': self.hedged,
+            'hedgeWins': self.hedge_wins,
+            'openCircuits': sum(1 for breaker in self._breakers.values() if breaker.state == 'open'),
+            'hedgeDelays': {
+                operation: round(delay, 3)
+                for operation in sorted(self.hedge_operations)
+                if (delay := self.hedge_delay(operation)) is not None
+            },
+            'breakers': {operation: breaker.stats() for operation, breaker in self._breakers.items()}
+        }
+
+    def breaker(self, operation):
+        breaker = self._breakers.get(operation)
+        if breaker is None:
+            breaker = self._breakers[operation] = CircuitBreaker(
+                operation, self.breaker_failures, self.breaker_reset
+            )
+        return breaker
+
+    def hedge_delay(self, operation):
+        """Seconds to wait before hedging, from recent latencies; None until there are enough"""
+        samples = self._latencies.get(operation)
+        if not samples or len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        rank = max(1, math.ceil(self.hedge_percentile * len(ordered)))
+        return max(self.hedge_min_delay, ordered[rank - 1])
+
+    async def call(self, operation, attempt):
+        """Run attempt() under the operation's breaker, hedging and retry policy"""
+        retries = 0 if operation in self.no_retry else self.retry_attempts
+        backoff = self.retry_backoff
+        for number in range(retries + 1):
+            try:
+                return await self._hedged(operation, attempt)
+            except Exception as e:
+                if number == retries or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(backoff, self.retry_backoff_max))
+                deadline = current_deadline.get()
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                self.retries += 1
+                RETRIES.inc(operation, type(e).__name__)
+                emit('retrying', operation=operation, attempt=number + 1, delay=round(delay, 2), error=str(e))
+                logger.warning(f"Runware {operation} failed ({str(e)}), retry {number + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                backoff *= 2
+
+    async def _guarded(self, operation, attempt):
+        """One upstream attempt, checked against and recorded in the breaker"""
+        breaker = self.breaker(operation)
+        breaker.before_call()
+        start = time.perf_counter()
+        try:
+            result = await attempt()
+        except Exception as e:
+            breaker.record(e)
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        breaker.record()
+        self._latencies.setdefault(operation, deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter() - start)
+        return result
+
+    def _may_hedge(self, operation):
+        calls = self._calls[operation] = self._calls.get(operation, 0) + 1
+        if operation not in self.hedge_operations or self.breaker(operation).state != 'closed':
+            return None
+        delay = self.hedge_delay(operation)
+        # Budget: hedges stay a small fraction of calls so they cannot double upstream load
+        if delay is None or self.hedged >= self.hedge_max_ratio * calls:
+            return None
+        return delay
+
+    async def _hedged(self, operation, attempt):
+        delay = self._may_hedge(operation)
+        if delay is None:
+            return await self._guarded(operation, attempt)
+
+        loop = asyncio.get_running_loop()
+        primary = loop.create_task(self._guarded(operation, attempt))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.hedged += 1
+            logger.info(f"Runware {operation} slower than {delay:.2f}s, sending a hedge request")
+            hedge = loop.create_task(self._guarded(operation, attempt))
+            pending.add(hedge)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = 'hedge' if task is hedge else 'primary'
+                        HEDGES.inc(operation, winner)
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,180 @@
+import asyncio
+import base64
+import binascii
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.uploads import ImageFile
+
+logger = logging.getLogger(__name__)
+
+# Base64 characters decoded per step when hashing; a multiple of 4
+DIGEST_CHUNK = 4 * 64 * 1024
+
+def image_digest(image_data):
+    """Hash image input by content, so the same bytes match regardless of data URI prefix"""
+    if isinstance(image_data, ImageFile):
+        # Hashed while it was written to disk
+        return image_data.digest
+    start = image_data.index(',') + 1 if image_data.startswith('data:') else 0
+    digest = hashlib.sha256()
+    try:
+        # Decode in slices so hashing never holds a second full copy of the image
+        for offset in range(start, len(image_data), DIGEST_CHUNK):
+            digest.update(base64.b64decode(image_data[offset:offset + DIGEST_CHUNK], validate=True))
+    except (binascii.Error, ValueError):
+        # URLs and image UUIDs are hashed as-is
+        return hashlib.sha256(image_data.encode()).hexdigest()
+    return digest.hexdigest()
+
+def cache_key(operation, **params):
+    """Canonical hash of an operation and its normalized parameters"""
+    normalized = json.dumps({'operation': operation, 'params': params}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+class SQLiteCacheTier:
+    """Shared on-disk tier so every worker process benefits from one cache"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS result_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    def get(self, key):
+        """(value, expires_at) for a live entry, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM result_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute('DELETE FROM result_cache WHERE key = ?', (key,))
+                return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO result_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + ttl)
+            )
+            self._conn.execute('DELETE FROM result_cache WHERE expires_at < ?', (time.time(),))
+
+class ResultCache:
+    """In-process LRU cache with TTL and byte-size eviction, plus an optional SQLite tier"""
+
+    def __init__(self):
+        self.enabled = os.getenv('RESULT_CACHE_ENABLED', 'True').lower() == 'true'
+        self.ttl = float(os.getenv('RESULT_CACHE_TTL', 3600))
+        self.max_bytes = int(os.getenv('RESULT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+        self.sqlite_path = os.getenv('RESULT_CACHE_SQLITE_PATH', '')
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def disk(self):
+        if self._disk is None and self.sqlite_path:
+            try:
+                self._disk = SQLiteCacheTier(self.sqlite_path)
+            except sqlite3.Error as e:
+                logger.error(f"Result cache SQLite tier disabled: {str(e)}")
+                self.sqlite_path = ''
+        return self._disk
+
+    def stats(self):
+        """Hit/miss counters and memory usage for /health"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'maxBytes': self.max_bytes,
+            'sqlite': bool(self.sqlite_path),
+            'hits': self.hits,
+            'diskHits': self.disk_hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _get_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, value = entry
+        if expires_at < time.time():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key, value, expires_at):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    async def get(self, key):
+        """Return a copy of the cached result, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        value = self._get_memory(key)
+        if value is None and self.disk is not None:
+            try:
+                stored = await asyncio.get_running_loop().run_in_executor(None, self.disk.get, key)
+            except (sqlite3.Error, ValueError) as e:
+                # A locked or damaged shared file costs a miss, never the request
+                logger.error(f"Result cache SQLite read failed: {str(e)}")
+                stored = None
+            if stored is not None:
+                value, expires_at = stored
+                self.disk_hits += 1
+                # Keep the stored expiry, so reads from other workers never extend an entry's life
+                self._set_memory(key, value, expires_at)
+
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    async def set(self, key, value):
+        """Store a successful result in every tier"""
+        if not self.enabled:
+            return
+        value = copy.deepcopy(value)
+        self._set_memory(key, value, time.time() + self.ttl)
+        if self.disk is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.disk.set, key, value, self.ttl)
+            except sqlite3.Error as e:
+                logger.error(f"Result cache SQLite write failed: {str(e)}")
+
+# Global instance
+result_cache = ResultCache()
@@ -1,62 +1,312 @@
+import asyncio
+import contextlib
 import logging
 import os
+import time
 
 from runware import IImageBackgroundRemoval, IImageCaption, IImageInference, IImageUpscale, IVideoInference, Runware
 
+from .deadlines import check_deadline
+from .metrics import STAGE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT, model_label
+from .progress import emit
+from .resilience import ResiliencePolicy
+
 logger = logging.getLogger(__name__)
 
+class PooledConnection:
+    """One Runware client in the pool together with its in-flight counter"""
+
+    def __init__(self, index):
+        self.index = index
+        self.client = None
+        self.in_flight = 0
+        self.completed = 0
+        self.replace_task = None
+
+    @property
+    def healthy(self):
+        """True while the websocket is open and authenticated"""
+        client = self.client
+        return client is not None and client.connected() and client.isAuthenticated()
+
+    @property
+    def replacing(self):
+        return self.replace_task is not None and not self.replace_task.done()
+
+    def stats(self):
+        return {
+            'index': self.index,
+            'connected': self.healthy,
+            'inFlight': self.in_flight,
+            'completed': self.completed
+        }
+
 class RunwareClientService:
+    """Pool of long-lived Runware clients bound to the shared event loop.
+
+    Every operation borrows the least-loaded healthy connection. Connections
+    that break are evicted and reconnected in the background with backoff.
+    Calls go through a ResiliencePolicy (retries, hedging, circuit breakers).
+    """
+
     def __init__(self):
-        self.client = None
-        self.connected = False
+        self.client_factory = Runware
+        self.last_error = None
+        self.ws_url = os.getenv('RUNWARE_WS_URL', '')
+        self.pool_size = max(1, int(os.getenv('RUNWARE_POOL_SIZE', 2)))
+        self.max_in_flight = int(os.getenv('RUNWARE_POOL_MAX_IN_FLIGHT', 16))
+        self.liveness_interval = float(os.getenv('RUNWARE_LIVENESS_INTERVAL', 15))
+        self.reconnect_attempts = int(os.getenv('RUNWARE_RECONNECT_ATTEMPTS', 3))
+        self.reconnect_backoff = float(os.getenv('RUNWARE_RECONNECT_BACKOFF', 0.5))
+        self.reconnect_backoff_max = float(os.getenv('RUNWARE_RECONNECT_BACKOFF_MAX', 10))
+        self.resilience = ResiliencePolicy()
+        self._members = []
+        self._waiting = 0
+        self._loop = None
+        self._available = None
+        self._monitor_task = None
+
+    @property
+    def connected(self):
+        """True while at least one pooled connection is usable"""
+        return any(member.healthy for member in self._members)
 
-    async def connect(self):
-        """Initialize and connect to Runware"""
+    def stats(self):
+        """Pool size, busy count and queue depth for /health"""
+        return {
+            'size': self.pool_size,
+            'connected': sum(1 for member in self._members if member.healthy),
+            'busy': sum(member.in_flight for member in self._members),
+            'queueDepth': self._waiting,
+            'maxInFlightPerConnection': self.max_in_flight,
+            'connections': [member.stats() for member in self._members]
+        }
+
+    async def _open_client(self):
+        """Create and authenticate a new Runware client"""
         try:
             api_key = os.getenv('RUNWARE_API_KEY')
             if not api_key:
                 raise ValueError("RUNWARE_API_KEY environment variable is not set")
-            self.client = Runware(api_key=api_key)
-            await self.client.connect()
-            self.connected = True
+            # RUNWARE_WS_URL points the service at another endpoint, e.g. benchmarks/fake_runware.py
+            options = {'url': self.ws_url} if self.ws_url else {}
+            client = self.client_factory(api_key=api_key, **options)
+            await client.connect()
+            if not client.isAuthenticated():
+                raise ConnectionError("Runware authentication failed")
+
+            self.last_error = None
             logger.info("Runware client connected successfully")
-            return True
+            return client
         except Exception as e:
             logger.error(f"Failed to connect to Runware: {str(e)}")
-            self.connected = False
-            return False
+            self.last_error = str(e)
+            return None
+
+    async def _close_client(self, client):
+        """Disconnect an evicted client, ignoring errors from an already dead socket"""
+        if client is None:
+            return
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logger.debug(f"Error while closing stale Runware client: {str(e)}")
+
+    async def _connect_with_backoff(self):
+        """Open a client with exponential backoff between failed attempts"""
+        delay = self.reconnect_backoff
+        for attempt in range(1, self.reconnect_attempts + 1):
+            client = await self._open_client()
+            if client is not None:
+                return client
+            if attempt < self.reconnect_attempts:
+                logger.warning(f"Runware connect attempt {attempt} failed, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_backoff_max)
+        return None
+
+    def _bind_loop(self):
+        """Reset per-loop state when running on a different loop (e.g. after a fork)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._available = asyncio.Condition()
+            self._monitor_task = None
+            self._waiting = 0
+            self._members = [PooledConnection(index) for index in range(self.pool_size)]
+
+    async def _replace(self, member):
+        """Evict a member's client and connect a fresh one in its place"""
+        client, member.client = member.client, None
+        await self._close_client(client)
+        member.client = await self._connect_with_backoff()
+        async with self._available:
+            self._available.notify_all()
+        return member.client is not None
+
+    def _schedule_replace(self, member):
+        if not member.replacing:
+            member.replace_task = self._loop.create_task(self._replace(member))
+        return member.replace_task
+
+    def _fill_pool(self):
+        """Reconnect every member that is down, in the background"""
+        for member in self._members:
+            if not member.healthy:
+                self._schedule_replace(member)
 
     async def ensure_connected(self):
-        """Ensure client is connected, connect if needed"""
-        # Always create a fresh connection to avoid event loop issues
-        self.connected = False
-        self.client = None
-        success = await self.connect()
-        if not success or not self.client:
-            raise RuntimeError("Failed to establish connection to Runware")
+        """Return a connected client, reconnecting only when the whole pool is down"""
+        self._bind_loop()
+        self._start_monitor()
+        if not self.connected:
+            first = self._members[0]
+            self._fill_pool()
+            await asyncio.shield(first.replace_task)
+            if not self.connected:
+                raise RuntimeError("Failed to establish connection to Runware")
+        return self._least_loaded(ignore_limit=True).client
 
-    async def generate_image(self, prompt, model="runware:101@1", width=1024, height=1024, steps=20, cfg_scale=7):
-        """Generate image using Runware API"""
+    def _least_loaded(self, ignore_limit=False):
+        candidates = [
+            member for member in self._members
+            if member.healthy and (ignore_limit or self.max_in_flight <= 0 or member.in_flight < self.max_in_flight)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda member: member.in_flight)
+
+    async def _acquire(self, operation='unknown', model=''):
+        start = time.perf_counter()
         await self.ensure_connected()
-        assert self.client is not None
+        connected = time.perf_counter()
+        STAGE_SECONDS.observe(operation, model_label(model), 'connect', value=connected - start)
+        async with self._available:
+            self._waiting += 1
+            try:
+                while True:
+                    member = self._least_loaded()
+                    if member is not None:
+                        break
+                    if not self.connected and not any(m.replacing for m in self._members):
+                        raise RuntimeError("Failed to establish connection to Runware")
+                    await self._available.wait()
+            finally:
+                self._waiting -= 1
+            member.in_flight += 1
+        STAGE_SECONDS.observe(operation, model_label(model), 'queue_wait', value=time.perf_counter() - connected)
+        return member
+
+    async def _release(self, member):
+        async with self._available:
+            member.in_flight -= 1
+            member.completed += 1
+            self._available.notify()
 
+    @contextlib.asynccontextmanager
+    async def connection(self, operation='unknown', model=''):
+        """Borrow the least-loaded healthy client for one upstream call, timing each stage"""
+        check_deadline()
+        try:
+            member = await self._acquire(operation, model)
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(operation, type(e).__name__)
+            raise
+        try:
+            # The wait for a connection may have used up the caller's deadline
+            check_deadline()
+        except Exception:
+            await self._release(member)
+            raise
+        start = time.perf_counter()
+        emit('started', operation=operation, model=model)
+        UPSTREAM_IN_FLIGHT.inc(operation)
+        try:
+            yield member.client
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(operation, type(e).__name__)
+            if not member.healthy:
+                logger.warning(f"Evicting broken Runware connection {member.index}")
+                self._schedule_replace(member)
+            raise
+        finally:
+            UPSTREAM_IN_FLIGHT.dec(operation)
+            STAGE_SECONDS.observe(operation, model_label(model), 'upstream', value=time.perf_counter() - start)
+            await self._release(member)
+
+    async def call(self, operation, model, invoke):
+        """Run invoke(client) on a pooled connection under the resilience policy"""
+        async def attempt():
+            async with self.connection(operation, model) as client:
+                return await invoke(client)
+
+        return await self.resilience.call(operation, attempt)
+
+    def _start_monitor(self):
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = self._loop.create_task(self._monitor())
+
+    async def _monitor(self):
+        """Periodically check liveness and replace dead connections in the background"""
+        while True:
+            await asyncio.sleep(self.liveness_interval)
+            for member in self._members:
+                if not member.healthy and not member.replacing:
+                    logger.warning(f"Runware connection {member.index} lost, reconnecting")
+                    self._schedule_replace(member)
+
+    async def ping(self, timeout=5):
+        """Websocket round-trip seconds per healthy connection, None for ones that did not answer.
+
+        A protocol-level ping costs no Runware task or credit. The SDK keeps its
+        websocket private and has no ping of its own with a reply to time.
+        """
+        self._bind_loop()
+
+        async def ping_member(member):
+            start = time.perf_counter()
+            try:
+                pong = await member.client._ws.ping()
+                await asyncio.wait_for(pong, timeout)
+            except Exception as e:
+                logger.warning(f"Runware connection {member.index} did not answer ping: {str(e) or type(e).__name__}")
+                # A busy socket may just be slow to answer; an idle one that stays silent is dead
+                if member.in_flight == 0:
+                    self._schedule_replace(member)
+                return None
+            return time.perf_counter() - start
+
+        return await asyncio.gather(*(ping_member(member) for member in self._members if member.healthy))
+
+    async def close(self):
+        """Stop the liveness monitor and disconnect every pooled client"""
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        for member in self._members:
+            if member.replacing:
+                member.replace_task.cancel()
+            client, member.client = member.client, None
+            await self._close_client(client)
+
+    async def generate_image(self, prompt, model="runware:101@1", width=1024, height=1024, steps=20, cfg_scale=7, number_results=1, seed=None):
+        """Generate image using Runware API"""
         request_obj = IImageInference(
             positivePrompt=prompt,
             model=model,
             width=width,
             height=height,
-            numberResults=1,
+            numberResults=number_results,
             steps=steps,
-            CFGScale=cfg_scale
+            CFGScale=cfg_scale,
+            seed=seed,
+            includeCost=True
         )
 
-        images = await self.client.imageInference(requestImage=request_obj)
-        return images
+        return await self.call('imageInference', model, lambda client: client.imageInference(requestImage=request_obj))
 
     async def generate_video(self, prompt, model="bytedance:1@1", duration=5, width=1024, height=576):
         """Generate video using Runware API"""
-        await self.ensure_connected()
-
         request_obj = IVideoInference(
             positivePrompt=prompt,
             model=model,
@@ -67,51 +317,41 @@ class RunwareClientService:
             includeCost=True
         )
 
-        assert self.client is not None
-        videos = await self.client.videoInference(requestVideo=request_obj)
-        return videos
+        return await self.call('videoInference', model, lambda client: client.videoInference(requestVideo=request_obj))
 
     async def remove_background(self, image_data):
         """Remove background from image"""
-        await self.ensure_connected()
-
         request_obj = IImageBackgroundRemoval(
             inputImage=image_data
         )
 
-        assert self.client is not None
-        results = await self.client.imageBackgroundRemoval(removeImageBackgroundPayload=request_obj)
-        return results
+        return await self.call('imageBackgroundRemoval', '', lambda client: client.imageBackgroundRemoval(
+            removeImageBackgroundPayload=request_obj
+        ))
 
     async def upscale_image(self, image_data, scale_factor=2):
         """Upscale image"""
-        await self.ensure_connected()
-
         request_obj = IImageUpscale(
             inputImage=image_data,
             upscaleFactor=scale_factor
         )
 
-        assert self.client is not None
-        results = await self.client.imageUpscale(upscaleGanPayload=request_obj)
-        return results
+        return await self.call('imageUpscale', '', lambda client: client.imageUpscale(upscaleGanPayload=request_obj))
 
     async def caption_image(self, image_data):
         """Generate caption for image"""
-        await self.ensure_connected()
-
         request_obj = IImageCaption(
             inputImage=image_data
         )
 
-        assert self.client is not None
-        result = await self.client.imageCaption(requestImageToText=request_obj)
-        return result
+        return await self.call('imageCaption', '', lambda client: client.imageCaption(requestImageToText=request_obj))
+
+    async def upload_image(self, file_path):
+        """Upload a local image file and return its Runware image UUID and URL"""
+        return await self.call('imageUpload', '', lambda client: client.uploadImage(file_path))
 
     async def test_connection(self):
         """Test connection with a simple generation"""
-        await self.ensure_connected()
-
         test_request = IImageInference(
             positivePrompt="test connection",
             model="runware:101@1",
@@ -120,9 +360,10 @@ class RunwareClientService:
             numberResults=1
         )
 
-        assert self.client is not None
-        images = await self.client.imageInference(requestImage=test_request)
+        # Deliberately outside the resilience policy, so the test reports the raw outcome
+        async with self.connection('testConnection', test_request.model) as client:
+            images = await client.imageInference(requestImage=test_request)
         return images
 
 # Global instance
-runware_service = RunwareClientService()
\ No newline at end of file
+runware_service = RunwareClientService()
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import copy
+import logging
+import os
+
+from .progress import current_listener, listen
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Collapses concurrent identical calls onto one shared upstream task.
+
+    The first caller for a key starts the task; callers arriving while it runs
+    await the same task. The key is released as soon as the task finishes, so a
+    failure reaches every waiter but never affects the next call.
+
+    The task runs in a fresh context rather than the first caller's, so it has
+    no request deadline of its own (each waiter's deadline bounds only that
+    waiter, and the task is cancelled once no waiter is left) and its progress
+    events reach every waiter's stream.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def stats(self):
+        """Deduplication counters for /health"""
+        return {
+            'enabled': self.enabled,
+            'inFlight': len(self._calls),
+            'leaders': self.leaders,
+            'shared': self.shared
+        }
+
+    async def do(self, key, produce):
+        """Run produce() once per key among concurrent callers"""
+        if not self.enabled or key is None:
+            return await produce()
+
+        call = self._calls.get(key)
+        if call is None:
+            self.leaders += 1
+            call = {'waiters': 0, 'listeners': []}
+            # A fresh context: the first caller must not lend the shared call its deadline or stream
+            task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run(call, produce))
+            call['task'] = task
+            self._calls[key] = call
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.shared += 1
+            logger.info("Joining in-flight request for identical parameters")
+
+        listener = current_listener()
+        if listener is not None:
+            call['listeners'].append(listener)
+        call['waiters'] += 1
+        try:
+            # Shielded so one waiter giving up does not cancel the call for the others
+            result = await asyncio.shield(call['task'])
+        except asyncio.CancelledError:
+            if call['waiters'] == 1 and not call['task'].done():
+                # The last waiter is gone, so nobody needs the upstream result any more
+                call['task'].cancel()
+            raise
+        finally:
+            call['waiters'] -= 1
+            if listener is not None:
+                call['listeners'].remove(listener)
+        return copy.deepcopy(result)
+
+    @staticmethod
+    async def _run(call, produce):
+        def fan_out(event, fields):
+            for listener in list(call['listeners']):
+                listener(event, fields)
+
+        with listen(fan_out):
+            return await produce()
+
+    def _release(self, key, task):
+        call = self._calls.get(key)
+        if call is not None and call['task'] is task:
+            del self._calls[key]
+
+# Global instance
+single_flight = SingleFlight()
@@ -0,0 +1,70 @@
+import json
+import os
+import queue
+import time
+
+from .admission import AdmissionRejected
+from .deadlines import ClientDisconnected, DeadlineExceeded, guard_request
+from .event_loop import event_loop
+from .progress import listen
+
+# Seconds between progress events while nothing else happens; keeps proxies from timing out
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', 5))
+
+# Response headers for an event stream that intermediaries must not buffer or cache
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def sse(event, data):
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(coro, operation, environ, endpoint):
+    """Start coro on the shared loop now and return a generator of its progress as SSE.
+
+    Emits queued straight away, then started/retrying/progress as the work
+    moves through admission and Runware, a progress heartbeat every
+    SSE_HEARTBEAT_INTERVAL seconds, and finally completed (with the same body
+    the non-streaming endpoint returns) or error. Closing the stream cancels
+    the work.
+    """
+    events = queue.Queue()
+    start = time.perf_counter()
+
+    with listen(lambda event, fields: events.put((event, fields))):
+        future = event_loop.submit(guard_request(coro, environ, endpoint))
+    future.add_done_callback(lambda done: events.put((None, None)))
+
+    def elapsed():
+        return round(time.perf_counter() - start, 2)
+
+    def generate():
+        try:
+            yield sse('queued', {'operation': operation, 'elapsed': elapsed()})
+            while True:
+                try:
+                    event, fields = events.get(timeout=SSE_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield sse('progress', {'operation': operation, 'elapsed': elapsed()})
+                    continue
+                if event is None:
+                    break
+                yield sse(event, {**fields, 'elapsed': elapsed()})
+
+            try:
+                result = future.result()
+            except AdmissionRejected as e:
+                yield sse('error', {'success': False, 'error': str(e), 'status': e.status_code,
+                                    'retryAfter': e.retry_after})
+            except DeadlineExceeded as e:
+                yield sse('error', {'success': False, 'error': str(e), 'status': 504})
+            except ClientDisconnected:
+                return
+            except Exception as e:
+                yield sse('error', {'success': False, 'error': str(e), 'status': 500})
+            else:
+                yield sse('completed' if result.get('success') else 'error', result)
+        finally:
+            # The client went away mid-stream: nobody is left to read the result
+            future.cancel()
+
+    return generate()
@@ -0,0 +1,178 @@
+import base64
+import binascii
+import hashlib
+import itertools
+import mimetypes
+import tempfile
+import uuid
+
+from flask import request
+
+# Read size for streaming; a multiple of 3 so base64 chunks concatenate cleanly
+CHUNK_SIZE = 3 * 64 * 1024
+# Base64 characters decoded per step, the encoded length of one CHUNK_SIZE read
+BASE64_CHUNK = CHUNK_SIZE // 3 * 4
+
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+class ImageRejected(Exception):
+    """Raised for an input image that cannot or should not be sent upstream"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ImageFile:
+    """An input image kept in a temp file instead of a base64 string.
+
+    Binary uploads stay on disk from the request body to the Runware upload,
+    so a request never holds the whole image in memory. The file is deleted
+    on close(), or once the last reference to it is gone.
+    """
+
+    def __init__(self, file, digest, mimetype, size):
+        self._file = file
+        self.path = file.name
+        self.digest = digest
+        self.mimetype = mimetype
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self._file.close()
+
+    @classmethod
+    def from_chunks(cls, chunks, declared_mimetype=None):
+        """Write byte chunks to a temp file, hashing as they go; None when there are none"""
+        chunks = iter(chunks)
+        head = next(chunks, b'')
+        if not head:
+            return None
+
+        mimetype = sniff_mimetype(head, declared_mimetype)
+        suffix = mimetypes.guess_extension(mimetype) or '.png'
+        file = tempfile.NamedTemporaryFile(prefix='upload-', suffix=suffix)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for chunk in itertools.chain([head], chunks):
+                file.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            file.flush()
+        except BaseException:
+            file.close()
+            raise
+        return cls(file, digest.hexdigest(), mimetype, size)
+
+    @classmethod
+    def from_stream(cls, stream, declared_mimetype=None):
+        """Copy a request body stream to a temp file without buffering it whole"""
+        return cls.from_chunks(iter(lambda: stream.read(CHUNK_SIZE), b''), declared_mimetype)
+
+    @classmethod
+    def from_data(cls, image_data):
+        """Decode base64 image data or a data URI to a temp file, one slice at a time"""
+        start = image_data.index(',') + 1 if image_data.startswith('data:') else 0
+        declared = image_data[5:image_data.index(';')] if image_data.startswith('data:') else None
+
+        def decoded():
+            for offset in range(start, len(image_data), BASE64_CHUNK):
+                try:
+                    yield base64.b64decode(image_data[offset:offset + BASE64_CHUNK], validate=True)
+                except (binascii.Error, ValueError) as e:
+                    raise ImageRejected('Image data is not valid base64') from e
+
+        image = cls.from_chunks(decoded(), declared)
+        if image is None:
+            raise ImageRejected('Image data is empty')
+        return image
+
+def is_image_reference(image_data):
+    """True for inputs Runware resolves itself: image UUIDs and URLs"""
+    if not isinstance(image_data, str):
+        return False
+    if image_data.startswith(('http://', 'https://')):
+        return True
+    try:
+        uuid.UUID(image_data)
+        return True
+    except ValueError:
+        return False
+
+def sniff_mimetype(head, declared=None):
+    """Detect the image type from its first bytes, falling back to the declared type"""
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if declared and declared.startswith('image/'):
+        return declared
+    return 'image/png'
+
+def encode_data_uri(fileobj, declared_mimetype=None):
+    """Base64-encode a file object into a data URI, one chunk at a time"""
+    head = fileobj.read(CHUNK_SIZE)
+    if not head:
+        return ''
+
+    parts = [f"data:{sniff_mimetype(head, declared_mimetype)};base64,", base64.b64encode(head).decode('ascii')]
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        parts.append(base64.b64encode(chunk).decode('ascii'))
+    return ''.join(parts)
+
+def to_data_uri(image_data):
+    """The image as a string Runware accepts inline; only an ImageFile needs encoding.
+
+    Only a tool call that sends its input inline without preprocessing it
+    (PREPROCESS_ENABLED=False, or a small input passed through) pays for this.
+    """
+    if not isinstance(image_data, ImageFile):
+        return image_data
+    with open(image_data.path, 'rb') as file:
+        return encode_data_uri(file, image_data.mimetype)
+
+def read_image_request():
+    """Parse an image tool request.
+
+    Accepts a JSON body with a base64 'image' field, a multipart/form-data
+    upload with an 'image' file part, or a raw binary body (options in the
+    query string). Binary uploads are streamed to an ImageFile; JSON images
+    stay strings. Returns (image_data, fields); fields is None when the
+    request carried no data at all.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not data:
+            return '', None
+        image_data = data.get('image', '')
+        if not isinstance(image_data, str):
+            raise ImageRejected("'image' must be a base64 string, an image URL or an image UUID")
+        return image_data, data
+
+    if request.mimetype == 'multipart/form-data':
+        fields = request.form.to_dict()
+        upload = request.files.get('image')
+        if upload is None:
+            return fields.get('image', ''), fields or None
+        try:
+            return ImageFile.from_stream(upload.stream, upload.mimetype) or '', fields
+        finally:
+            upload.close()
+
+    image_data = ImageFile.from_stream(request.stream, request.mimetype) or ''
+    fields = request.args.to_dict()
+    if not image_data and not fields:
+        return '', None
+    return image_data, fields
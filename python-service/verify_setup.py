@@ -52,6 +52,13 @@ def verify_setup():
         print("✗ Flask-CORS not installed")
         return False
 
+    try:
+        import PIL
+        print("✓ Pillow installed")
+    except ImportError:
+        print("✗ Pillow not installed")
+        return False
+
     print("\n✓ All components verified successfully!")
     print("Ready to start the Python service!")
     return True
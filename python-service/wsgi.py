@@ -0,0 +1,49 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py calls warm_up() in every worker once it has forked and
+shutdown() when it exits, so each worker owns its own event loop and Runware
+connections and never inherits them from the master.
+"""
+
+import logging
+
+from app import app
+from services.event_loop import event_loop
+from services.health_prober import health_prober
+from services.history import history
+from services.jobs import CANCEL_GRACE, job_manager
+from services.media_store import media_store
+from services.runware_client import runware_service
+
+logger = logging.getLogger(__name__)
+
+def _log_warm_up(future):
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.warning(f"Runware warm-up failed, connecting on first request instead: {str(error)}")
+
+def warm_up():
+    """Connect this worker's Runware pool and start its health prober in the background"""
+    future = event_loop.submit(runware_service.ensure_connected())
+    future.add_done_callback(_log_warm_up)
+    health_prober.ensure_started()
+
+def shutdown(timeout=30):
+    """Let running background jobs finish (failing any that do not), then close Runware connections and stop the loop"""
+    try:
+        event_loop.run(job_manager.drain(timeout), timeout + CANCEL_GRACE + 1)
+        event_loop.run(runware_service.close(), 5)
+    except Exception as e:
+        logger.warning(f"Error during worker shutdown: {str(e)}")
+    finally:
+        event_loop.stop()
+        # Write out history entries still waiting for the next batch
+        history.close()
+        media_store.close()
+
+__all__ = ['app', 'shutdown', 'warm_up']